@@ -0,0 +1,29 @@
+# itiproject/renderers.py
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional speedup, the stock renderer is used without it
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Drop-in JSONRenderer encoding with orjson when it is installed.
+
+    dicts, lists, strings, numbers and UUIDs are encoded natively; Decimal,
+    datetime and anything else orjson does not know goes through DRF's own
+    encoder, so the output matches JSONRenderer byte for byte apart from
+    whitespace. Indented (browsable) output still uses the stock renderer.
+    """
+    options = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+    _fallback = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=self._fallback.default, option=self.options)
+        # same escaping as JSONRenderer: U+2028/U+2029 are not valid in JavaScript strings
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
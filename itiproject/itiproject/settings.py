@@ -98,7 +98,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.middleware.cache.UpdateCacheMiddleware',
+    # br/gzip for bodies above COMPRESSION_MIN_SIZE, must wrap everything that edits the body
+    'itiproject.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -107,7 +108,6 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.cache.FetchFromCacheMiddleware',
 ]
 
 # Redis cache configuration
@@ -117,14 +117,14 @@ CACHES = {
         'LOCATION': 'redis://127.0.0.1:6379/1',
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            # a Redis outage degrades to cache misses instead of failing writes
+            'IGNORE_EXCEPTIONS': True,
         }
     }
 }
 
-# Cache middleware settings
-CACHE_MIDDLEWARE_ALIAS = 'default'
-CACHE_MIDDLEWARE_SECONDS = 600  # 10 minutes
-CACHE_MIDDLEWARE_KEY_PREFIX = 'jumia'
+# Catalog responses are cached per view and invalidated by tag (products/response_cache.py)
+# instead of the site-wide cache middleware
 
 # Use Redis for session storage
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
@@ -135,10 +135,22 @@ REST_FRAMEWORK = {
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        # orjson-backed JSONRenderer, falls back to the stock encoder without orjson
+        'itiproject.renderers.FastJSONRenderer',
     ),
 }
 
+# Response compression (itiproject/middleware.py); brotli is used when the Brotli package is installed
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Seconds a process keeps its flash-sale index (products/flash_sales.py) when no sale starts or ends;
+# bounds how long flash sale edits made in another process take to show up
+FLASH_SALE_INDEX_MAX_AGE = 60
+# Seconds flash sale units stay held for a buyer before release_flash_sale_reservations returns them
+FLASH_SALE_RESERVATION_SECONDS = 600
+
 ROOT_URLCONF = 'itiproject.urls'
 
 TEMPLATES = [
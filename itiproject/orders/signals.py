@@ -0,0 +1,53 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from products.cache import invalidate_tags
+from products.response_cache import vendor_tag
+from products.vendor_stats import item_contribution, adjust_vendor_sales
+from .models import OrderItem
+
+
+def _contribution(item):
+    # legacy items without unit_price fall back to the product price (one query, only for them)
+    product_price = item.product.price if item.unit_price is None and item.product_id else None
+    return item_contribution(item.vendor_id, item.quantity, item.unit_price, item.status, product_price)
+
+
+def _apply(*changes):
+    """Apply (sign, contribution) pairs with one adjustment per vendor"""
+    deltas = {}
+    for sign, (vendor_id, units, revenue) in changes:
+        if vendor_id is not None:
+            total_units, total_revenue = deltas.get(vendor_id, (0, 0))
+            deltas[vendor_id] = (total_units + sign * units, total_revenue + sign * revenue)
+    for vendor_id, (units, revenue) in deltas.items():
+        if units or revenue:
+            adjust_vendor_sales(vendor_id, units, revenue)
+            # the vendor dashboard response carries these figures
+            invalidate_tags(vendor_tag(vendor_id))
+
+
+@receiver(pre_save, sender=OrderItem)
+def remember_previous_contribution(sender, instance, **kwargs):
+    """Units and revenue the item counted for before this save"""
+    previous = None
+    if not instance._state.adding:
+        row = OrderItem.objects.filter(pk=instance.pk).values_list(
+            'vendor_id', 'quantity', 'unit_price', 'status', 'product__price'
+        ).first()
+        previous = item_contribution(*row) if row else None
+    instance._previous_contribution = previous
+
+
+@receiver(post_save, sender=OrderItem)
+def update_vendor_sales_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_contribution', None)
+    current = _contribution(instance)
+    if previous != current:
+        _apply((-1, previous or (None, 0, 0)), (1, current))
+
+
+@receiver(post_delete, sender=OrderItem)
+def update_vendor_sales_on_delete(sender, instance, **kwargs):
+    _apply((-1, _contribution(instance)))
@@ -11,6 +11,7 @@ from django.conf import settings  # ✅ Required
 
 
 from products.models import Product
+from products.flash_sales import claim_flash_sale_price
 from .models import *
 
 class CheckoutView(APIView):
@@ -56,10 +57,10 @@ class CheckoutView(APIView):
         try:
             with transaction.atomic():
                 for vendor, items in vendor_map.items():
-                    total_price = sum(
-                        (i["product"].sale_price if i["product"].sale_price else i["product"].price) * i["quantity"]
-                        for i in items
-                    )
+                    for i in items:
+                        # the price paid is kept on the item, later price changes must not rewrite revenue
+                        i["unit_price"] = claim_flash_sale_price(i["product"], i["quantity"], user)
+                    total_price = sum(i["unit_price"] * i["quantity"] for i in items)
 
                     order = Order.objects.create(
                         user=user,
@@ -76,6 +77,7 @@ class CheckoutView(APIView):
                             order=order,
                             product=i["product"],
                             quantity=i["quantity"],
+                            unit_price=i["unit_price"],
                             vendor=vendor,
                             status="pending"
                         )
@@ -7,6 +7,7 @@ from .models import (
     Category, Brand, Product, ProductImage, 
     Size, Color, FlashSale, FlashSaleItem
 )
+from .response_cache import invalidate_product_ids
 
 # ==================== INLINES ====================
 
@@ -30,7 +31,8 @@ class ProductImageInline(admin.TabularInline):
 
 class FlashSaleItemInline(admin.TabularInline):
     model = FlashSaleItem
-    fields = ['product', 'discount_percentage', 'quantity_limit', 'quantity_sold']
+    fields = ['product', 'discount_percentage', 'quantity_limit', 'quantity_sold', 'quantity_reserved']
+    readonly_fields = ['quantity_sold', 'quantity_reserved']
     extra = 1
     show_change_link = True
     autocomplete_fields = ['product']
@@ -60,9 +62,13 @@ class CategoryAdmin(admin.ModelAdmin):
         })
     )
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(direct_products=models.Count('products'))
+
     def product_count(self, obj):
-        return obj.products.count()
+        return obj.direct_products
     product_count.short_description = 'Products'
+    product_count.admin_order_field = 'direct_products'
 
     def display_image(self, obj):
         if obj.image:
@@ -94,10 +100,6 @@ class BrandAdmin(admin.ModelAdmin):
         })
     )
     
-    def product_count(self, obj):
-        return obj.products.count()
-    product_count.short_description = 'Products'
-    
     def display_image(self, obj):
         if obj.image:
             return format_html('<img src="{}" style="max-height: 200px; max-width: 200px;" />', obj.image.url)
@@ -109,9 +111,13 @@ class SizeAdmin(admin.ModelAdmin):
     list_display = ['name', 'product_count']
     search_fields = ['name']
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(used_in=models.Count('products'))
+
     def product_count(self, obj):
-        return obj.products.count()
+        return obj.used_in
     product_count.short_description = 'Used in Products'
+    product_count.admin_order_field = 'used_in'
 
 @admin.register(Color)
 class ColorAdmin(admin.ModelAdmin):
@@ -122,9 +128,13 @@ class ColorAdmin(admin.ModelAdmin):
         return format_html('<div style="background-color: {}; width: 30px; height: 30px; border: 1px solid #000;"></div>', obj.name)
     color_preview.short_description = 'Color'
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(used_in=models.Count('products'))
+
     def product_count(self, obj):
-        return obj.products.count()
+        return obj.used_in
     product_count.short_description = 'Used in Products'
+    product_count.admin_order_field = 'used_in'
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -211,12 +221,17 @@ class ProductAdmin(admin.ModelAdmin):
     
     actions = ['mark_featured', 'mark_not_featured']
     
+    # queryset.update() skips the save signals, so listings are invalidated here
     def mark_featured(self, request, queryset):
+        product_ids = list(queryset.values_list('id', flat=True))
         queryset.update(is_featured=True)
+        invalidate_product_ids(product_ids)
     mark_featured.short_description = "Mark selected products as featured"
     
     def mark_not_featured(self, request, queryset):
+        product_ids = list(queryset.values_list('id', flat=True))
         queryset.update(is_featured=False)
+        invalidate_product_ids(product_ids)
     mark_not_featured.short_description = "Mark selected products as not featured"
 
 @admin.register(ProductImage)
@@ -261,7 +276,8 @@ class FlashSaleAdmin(admin.ModelAdmin):
 
 @admin.register(FlashSaleItem)
 class FlashSaleItemAdmin(admin.ModelAdmin):
-    list_display = ['product', 'flash_sale', 'discount_percentage', 'quantity_limit', 'quantity_sold']
+    list_display = ['product', 'flash_sale', 'discount_percentage', 'quantity_limit', 'quantity_sold', 'quantity_reserved']
     list_filter = ['flash_sale']
     search_fields = ['product__name', 'flash_sale__name']
-    autocomplete_fields = ['product', 'flash_sale']
\ No newline at end of file
+    autocomplete_fields = ['product', 'flash_sale']
+    readonly_fields = ['quantity_sold', 'quantity_reserved']
\ No newline at end of file
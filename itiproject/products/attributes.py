@@ -0,0 +1,149 @@
+# products/attributes.py
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.text import slugify
+from .models import Product, ProductAttribute
+
+# Query string prefix of specification filters: ?spec.ram=8-gb,16-gb
+ATTRIBUTE_PARAM_PREFIX = 'spec.'
+# Longer values are free text (ingredients, descriptions), not filterable
+ATTRIBUTE_VALUE_MAX_LENGTH = 100
+# Keys with more distinct values in a listing are left out of its facets
+ATTRIBUTE_FACET_MAX_VALUES = 50
+
+
+def normalize_key(key):
+    return slugify(str(key))[:100]
+
+
+def normalize_value(value):
+    """Slug form of a specification value, the spelling filters use; None if not indexable"""
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    if isinstance(value, (int, float, Decimal)):
+        value = format(Decimal(str(value)).normalize(), 'f')
+    if not isinstance(value, str):
+        return None
+    # keep decimal points: 6.1 inch and 61 inch must not collide
+    normalized = slugify(value.replace('.', '_')).replace('_', '.')
+    if not normalized or len(value) > ATTRIBUTE_VALUE_MAX_LENGTH:
+        return None
+    return normalized
+
+
+def attribute_rows(product_id, specifications):
+    """ProductAttribute rows of one product; list values give one row per item"""
+    rows = {}
+    if not isinstance(specifications, dict):
+        return []
+    for key_label, values in specifications.items():
+        key = normalize_key(key_label)
+        if not key:
+            continue
+        for value in values if isinstance(values, list) else [values]:
+            normalized = normalize_value(value)
+            if normalized is not None and (key, normalized) not in rows:
+                rows[key, normalized] = ProductAttribute(
+                    product_id=product_id, key=key, value=normalized,
+                    key_label=str(key_label)[:100], value_label=str(value).strip()[:100],
+                )
+    return list(rows.values())
+
+
+def sync_product_attributes(product):
+    """Bring the index rows of a product in line with its specifications.
+
+    One read when nothing changed; otherwise only the pairs that changed
+    are deleted or inserted.
+    """
+    wanted = {
+        (row.key, row.value, row.key_label, row.value_label): row
+        for row in attribute_rows(product.pk, product.specifications)
+    }
+    current = {
+        tuple(row[1:]): row[0] for row in ProductAttribute.objects.filter(product_id=product.pk).values_list(
+            'id', 'key', 'value', 'key_label', 'value_label'
+        )
+    }
+    stale = [pk for pair, pk in current.items() if pair not in wanted]
+    missing = [row for pair, row in wanted.items() if pair not in current]
+    if not stale and not missing:
+        return
+    with transaction.atomic():
+        if stale:
+            ProductAttribute.objects.filter(pk__in=stale).delete()
+        ProductAttribute.objects.bulk_create(missing)
+
+
+def rebuild_product_attributes(batch_size=500):
+    """Re-index the specifications of every product; returns the number of rows written"""
+    written = 0
+    products = Product.objects.order_by('pk').values_list('pk', 'specifications')
+    batch = []
+    for product in products.iterator(chunk_size=batch_size):
+        batch.append(product)
+        if len(batch) == batch_size:
+            written += _rebuild_batch(batch)
+            batch = []
+    if batch:
+        written += _rebuild_batch(batch)
+    return written
+
+
+def _rebuild_batch(products):
+    rows = [row for pk, specifications in products for row in attribute_rows(pk, specifications)]
+    with transaction.atomic():
+        ProductAttribute.objects.filter(product_id__in=[pk for pk, _ in products]).delete()
+        ProductAttribute.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def parse_attribute_filters(params):
+    """Sorted ((key, (value, ...)), ...) from the ``spec.<key>=a,b`` parameters of a request"""
+    selected = {}
+    for name in params:
+        if not name.startswith(ATTRIBUTE_PARAM_PREFIX):
+            continue
+        key = normalize_key(name[len(ATTRIBUTE_PARAM_PREFIX):])
+        values = {normalize_value(value) for value in (params.get(name) or '').split(',')}
+        values.discard(None)
+        if key and values:
+            selected.setdefault(key, set()).update(values)
+    return tuple(sorted((key, tuple(sorted(values))) for key, values in selected.items()))
+
+
+def attribute_counts(product_ids, keys=None, exclude_keys=()):
+    """{key: {'name', 'values': {value: (label, count)}}} over the products of a subquery, one grouped query"""
+    rows = ProductAttribute.objects.filter(product_id__in=product_ids)
+    if keys is not None:
+        rows = rows.filter(key__in=keys)
+    if exclude_keys:
+        rows = rows.exclude(key__in=exclude_keys)
+    rows = rows.order_by().values('key', 'value').annotate(
+        count=Count('id'), key_label=Max('key_label'), value_label=Max('value_label')
+    )
+    counts = {}
+    for row in rows:
+        facet = counts.setdefault(row['key'], {'name': row['key_label'], 'values': {}})
+        facet['values'][row['value']] = (row['value_label'], row['count'])
+    return counts
+
+
+def build_attribute_facets(counts, selected=()):
+    """Facet list in the shape of the brand/color/size facets, selected keys always kept"""
+    selected = dict(selected)
+    facets = []
+    for key in sorted(counts):
+        values = counts[key]['values']
+        if len(values) > ATTRIBUTE_FACET_MAX_VALUES and key not in selected:
+            continue
+        facets.append({
+            'key': key,
+            'name': counts[key]['name'],
+            'values': [
+                {'name': label, 'slug': value, 'count': count}
+                for value, (label, count) in sorted(values.items())
+            ],
+        })
+    return facets
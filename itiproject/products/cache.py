@@ -0,0 +1,62 @@
+# products/cache.py
+import time
+from django.core.cache import cache
+
+# Version counters live in the shared cache forever; entries that depend on
+# them embed the version in their key so a bump makes them unreachable.
+VERSION_KEY = 'version:{}'
+
+
+def get_version(name):
+    """Current value of a named version counter"""
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never falls back to a
+        # value whose cached entries may still be around
+        version = int(time.time() * 1000)
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(name):
+    """Invalidate everything cached under the given version counter"""
+    key = VERSION_KEY.format(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(key, version, None)
+        return version
+
+
+def get_versions(names):
+    """Current values of several version counters with one round trip"""
+    keys = {VERSION_KEY.format(name): name for name in names}
+    found = cache.get_many(list(keys))
+    return {name: found[key] if key in found else get_version(name) for key, name in keys.items()}
+
+
+# ==================== TAGGED ENTRIES ====================
+# A tagged entry stores the version of every tag it depends on; it is a hit
+# only while none of those tags has been bumped since it was built.
+
+def get_tagged(key):
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    if get_versions(entry['tags']) != entry['tags']:
+        return None
+    return entry['value']
+
+
+def set_tagged(key, value, versions, timeout):
+    """``versions`` should be read before the value is built, so a write
+    racing the build leaves the entry already stale"""
+    cache.set(key, {'tags': versions, 'value': value}, timeout)
+
+
+def invalidate_tags(*tags):
+    for tag in set(tags):
+        bump_version(tag)
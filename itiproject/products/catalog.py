@@ -0,0 +1,55 @@
+# products/catalog.py
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from .cache import get_version
+from .models import Category
+
+CATALOG_VERSION = 'catalog'
+CATEGORY_TREE_KEY = 'category_tree:{}'
+CATEGORY_TREE_TIMEOUT = 60 * 60 * 24
+
+
+def build_category_tree():
+    """Load every active category in one query and nest it in memory.
+
+    Produces the same shape as ``CategoryListSerializer`` (with relative
+    image URLs); children of inactive categories are left out.
+    """
+    rows = Category.objects.filter(is_active=True).order_by('id').values(
+        'id', 'name', 'slug', 'image', 'product_count', 'description', 'parent_id'
+    )
+    nodes = {}
+    parents = {}
+    for row in rows:
+        parents[row['id']] = row.pop('parent_id')
+        row['image'] = default_storage.url(row['image']) if row['image'] else None
+        row['children'] = []
+        nodes[row['id']] = row
+
+    roots = []
+    for category_id, node in nodes.items():
+        parent_id = parents[category_id]
+        if parent_id is None:
+            roots.append(node)
+        elif parent_id in nodes:
+            nodes[parent_id]['children'].append(node)
+    return roots
+
+
+def get_category_tree(request=None):
+    """Category tree cached under the current catalog version"""
+    key = CATEGORY_TREE_KEY.format(get_version(CATALOG_VERSION))
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_category_tree()
+        cache.set(key, tree, CATEGORY_TREE_TIMEOUT)
+    if request is not None:
+        _absolutize_images(tree, request)
+    return tree
+
+
+def _absolutize_images(nodes, request):
+    for node in nodes:
+        if node['image']:
+            node['image'] = request.build_absolute_uri(node['image'])
+        _absolutize_images(node['children'], request)
@@ -0,0 +1,144 @@
+# products/facets.py
+from decimal import Decimal, InvalidOperation
+from django.db.models import Q, Count, Min, Max
+from .models import Product
+
+# Lower edges of the fixed price buckets; the last bucket is open-ended
+PRICE_BUCKETS = [0, 100, 250, 500, 1000, 2500, 5000, 10000, 25000]
+# "N stars & up" buckets, same semantics as the min_stars filter
+RATING_BUCKETS = [4, 3, 2, 1]
+
+
+def parse_decimal(value):
+    try:
+        return Decimal(value) if value not in (None, '') else None
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def parse_slugs(value):
+    return frozenset(slug for slug in (value or '').split(',') if slug)
+
+
+def bucket_bounds(index):
+    upper = PRICE_BUCKETS[index + 1] if index + 1 < len(PRICE_BUCKETS) else None
+    return PRICE_BUCKETS[index], upper
+
+
+def price_bucket_q(index, prefix=''):
+    """Q matching the prices of one PRICE_BUCKETS bucket"""
+    lower, upper = bucket_bounds(index)
+    if upper is None:
+        return Q(**{f'{prefix}price__gte': lower})
+    return Q(**{f'{prefix}price__gte': lower, f'{prefix}price__lt': upper})
+
+
+class FacetEngine:
+    """Facet counts for a filtered product set, computed in the database.
+
+    ``base_queryset`` carries every filter that is not a facet (category,
+    discount, featured, ...). Each facet is counted with conditional
+    aggregation over all *other* selections, so multi-select values within a
+    facet keep their counts (OR inside a facet, AND across facets) and values
+    the other selections rule out are listed with a zero count. Four grouped
+    queries regardless of the size of the set: brands, colors, sizes, and one
+    aggregate for the total, the price buckets, the price range and the
+    rating buckets.
+    """
+
+    FACETS = ('brand', 'color', 'size', 'price', 'rating')
+
+    def __init__(self, base_queryset, brands=frozenset(), colors=frozenset(), sizes=frozenset(),
+                 min_price=None, max_price=None, min_stars=None):
+        self.base_queryset = base_queryset
+        self.brands = brands
+        self.colors = colors
+        self.sizes = sizes
+        self.min_price = min_price
+        self.max_price = max_price
+        self.min_stars = min_stars
+
+    def _selection_q(self, facet, prefix=''):
+        """Q of the selection of one facet on Product, or on a model pointing at it via ``prefix``"""
+        q = Q()
+        if facet == 'brand' and self.brands:
+            q = Q(**{f'{prefix}brand__slug__in': self.brands})
+        elif facet == 'color' and self.colors:
+            q = Q(**{f'{prefix}id__in': Product.colors.through.objects.filter(
+                color__slug__in=self.colors).values('product_id')})
+        elif facet == 'size' and self.sizes:
+            q = Q(**{f'{prefix}id__in': Product.sizes.through.objects.filter(
+                size__slug__in=self.sizes).values('product_id')})
+        elif facet == 'price':
+            if self.min_price is not None:
+                q &= Q(**{f'{prefix}price__gte': self.min_price})
+            if self.max_price is not None:
+                q &= Q(**{f'{prefix}price__lte': self.max_price})
+        elif facet == 'rating' and self.min_stars is not None:
+            q = self._stars_q(self.min_stars, prefix)
+        return q
+
+    @staticmethod
+    def _stars_q(stars, prefix=''):
+        # sponsored products pass any rating filter
+        return Q(**{f'{prefix}is_sponsored': True}) | Q(**{f'{prefix}rating_average__gte': stars})
+
+    def _others_q(self, facet, prefix=''):
+        """The selections of every facet except ``facet`` (all of them for None)"""
+        q = Q()
+        for other in self.FACETS:
+            if other != facet:
+                q &= self._selection_q(other, prefix)
+        return q
+
+    @staticmethod
+    def _count(field, q):
+        return Count(field, filter=q or None)
+
+    def _pair_counts(self, through, value, facet):
+        """(slug, name, count) of the colors or sizes of the set, counted under the other selections"""
+        return (
+            through.objects.filter(product_id__in=self.base_queryset.order_by().values('id')).order_by()
+            .values_list(f'{value}__slug', f'{value}__name')
+            .annotate(count=self._count('product_id', self._others_q(facet, prefix='product__')))
+            .order_by(f'{value}__slug')
+        )
+
+    def compute(self):
+        base = self.base_queryset.order_by()
+        brands = (
+            base.filter(brand__isnull=False).values_list('brand__slug', 'brand__name', 'brand__image')
+            .annotate(count=self._count('id', self._others_q('brand')))
+            .order_by('brand__name')
+        )
+        colors = self._pair_counts(Product.colors.through, 'color', 'color')
+        sizes = self._pair_counts(Product.sizes.through, 'size', 'size')
+
+        price_q, rating_q = self._others_q('price'), self._others_q('rating')
+        aggregates = {
+            'count': self._count('id', self._others_q(None)),
+            'min_price': Min('price', filter=price_q or None),
+            'max_price': Max('price', filter=price_q or None),
+        }
+        for index in range(len(PRICE_BUCKETS)):
+            aggregates[f'price_{index}'] = self._count('id', price_q & price_bucket_q(index))
+        for stars in RATING_BUCKETS:
+            aggregates[f'rating_{stars}'] = self._count('id', rating_q & self._stars_q(stars))
+        totals = base.aggregate(**aggregates)
+
+        return {
+            'count': totals['count'],
+            'brands': [
+                {'name': name, 'slug': slug, 'image': image, 'count': count}
+                for slug, name, image, count in brands
+            ],
+            'colors': [{'name': name, 'slug': slug, 'count': count} for slug, name, count in colors],
+            'sizes': [{'name': name, 'slug': slug, 'count': count} for slug, name, count in sizes],
+            'price': [
+                {'min': bucket_bounds(index)[0], 'max': bucket_bounds(index)[1], 'count': totals[f'price_{index}']}
+                for index in range(len(PRICE_BUCKETS)) if totals[f'price_{index}']
+            ],
+            'rating': [{'stars': stars, 'count': totals[f'rating_{stars}']} for stars in RATING_BUCKETS],
+            'min_price': totals['min_price'],
+            'max_price': totals['max_price'],
+        }
@@ -0,0 +1,257 @@
+# products/flash_sales.py
+import hashlib
+import threading
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, F, Min
+from django.utils import timezone
+from .models import FlashSale, FlashSaleItem, FlashSaleReservation
+
+# One active flash-sale item; the highest discount wins when sales overlap.
+# ``modified_at`` is the persisted moment the entry took its current form:
+# the sale start or the last edit of the sale or the item, whichever is later.
+FlashSaleEntry = namedtuple(
+    'FlashSaleEntry', 'item_id flash_sale_id slug discount_percentage quantity_limit ends_at modified_at'
+)
+
+
+def available_q(quantity):
+    """Q over FlashSaleItem: ``quantity`` more units fit under the limit, reservations included"""
+    return Q(quantity_limit__lte=0) | Q(quantity_limit__gte=F('quantity_sold') + F('quantity_reserved') + quantity)
+
+
+def active_items_q(at):
+    """Q over FlashSaleItem: the sale is running at ``at`` and the item is not sold out"""
+    return (
+        Q(flash_sale__is_active=True, flash_sale__start_time__lte=at, flash_sale__end_time__gt=at) &
+        available_q(1)
+    )
+
+
+def running_sale_ids(at):
+    """Subquery of the sales running at ``at``.
+
+    Used as ``flash_sale_id__in`` so conditional updates of FlashSaleItem stay
+    single-table: the quantity predicates are then re-checked against the
+    locked row by the database, which a join (turned into ``pk IN (...)`` by
+    Django) would not guarantee.
+    """
+    return FlashSale.objects.filter(is_active=True, start_time__lte=at, end_time__gt=at).values('id')
+
+
+def flash_sale_pricing(product, entry):
+    """(effective_price, discount_percentage) of a product with an active flash-sale entry.
+
+    The flash discount applies to the regular price; a better regular sale
+    price keeps winning. Same rounding as ``Product.refresh_pricing``.
+    """
+    price = Decimal(product.price or 0)
+    effective_price = Decimal(product.effective_price)
+    if entry is not None:
+        discounted = (price * (100 - entry.discount_percentage) / 100).quantize(Decimal('0.01'))
+        effective_price = min(effective_price, discounted)
+    discount = Decimal(0)
+    if price > 0 and effective_price < price:
+        discount = ((price - effective_price) / price * 100).quantize(Decimal('0.01'))
+    return effective_price, discount
+
+
+class FlashSaleIndex:
+    """In-process index of the flash-sale items running now, keyed by product id.
+
+    Loaded with two queries and kept until the next boundary (the earliest
+    end of a loaded sale or start of an upcoming one), a flash-sale write in
+    this process, or ``FLASH_SALE_INDEX_MAX_AGE`` seconds for writes made by
+    other processes. Lookups in between are dict reads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._valid_until = None
+        self._generation = ''
+
+    def invalidate(self):
+        """Reload on next use (flash sale writes in this process)"""
+        self._valid_until = None
+
+    def entries(self, now=None):
+        now = now or timezone.now()
+        valid_until = self._valid_until
+        if valid_until is None or now >= valid_until:
+            self._load(now)
+        return self._entries
+
+    def get(self, product_id):
+        return self.entries().get(product_id)
+
+    def generation(self):
+        """Fingerprint of the loaded entries; cached responses that embed flash prices key on it"""
+        self.entries()
+        return self._generation
+
+    def _load(self, now):
+        rows = FlashSaleItem.objects.filter(active_items_q(now)).values_list(
+            'id', 'product_id', 'flash_sale_id', 'flash_sale__slug', 'discount_percentage', 'quantity_limit',
+            'flash_sale__end_time', 'flash_sale__start_time', 'flash_sale__updated_at', 'updated_at'
+        )
+        entries = {}
+        for item_id, product_id, flash_sale_id, slug, discount, limit, ends_at, *moments in rows:
+            current = entries.get(product_id)
+            if current is None or discount > current.discount_percentage:
+                entries[product_id] = FlashSaleEntry(
+                    item_id, flash_sale_id, slug, discount, limit, ends_at, max(moments)
+                )
+        next_start = FlashSale.objects.filter(is_active=True, start_time__gt=now).aggregate(
+            next_start=Min('start_time')
+        )['next_start']
+
+        max_age = getattr(settings, 'FLASH_SALE_INDEX_MAX_AGE', 60)
+        boundaries = [entry.ends_at for entry in entries.values()] + [now + timedelta(seconds=max_age)]
+        if next_start is not None:
+            boundaries.append(next_start)
+        raw = '|'.join(sorted(f'{product_id}:{entry.item_id}:{entry.discount_percentage}:{entry.ends_at.isoformat()}'
+                              for product_id, entry in entries.items()))
+        generation = hashlib.sha1(raw.encode()).hexdigest()[:12] if entries else ''
+        with self._lock:
+            self._entries, self._generation, self._valid_until = entries, generation, min(boundaries)
+
+
+flash_sale_index = FlashSaleIndex()
+
+
+def _take_units(item_id, quantity, at, **counters):
+    """Conditional F() update of one item's counters; True when the units fit"""
+    return bool(FlashSaleItem.objects.filter(
+        available_q(quantity), pk=item_id, flash_sale_id__in=running_sale_ids(at)
+    ).update(**{name: F(name) + delta for name, delta in counters.items()}))
+
+
+def reserve_flash_sale_units(entry, user, quantity, at=None):
+    """Hold ``quantity`` units of a running flash-sale item for a buyer.
+
+    Returns the reservation, or None when the units are not available. A
+    held reservation of the same buyer for the item is replaced. Units of
+    expired reservations are released before giving up.
+    """
+    at = at or timezone.now()
+    quantity = int(quantity)
+    if quantity <= 0:
+        return None
+    held = FlashSaleReservation.objects.filter(user=user, item_id=entry.item_id, status=FlashSaleReservation.HELD)
+    for reservation in held:
+        release_reservation(reservation)
+    ttl = timedelta(seconds=getattr(settings, 'FLASH_SALE_RESERVATION_SECONDS', 600))
+
+    for attempt in range(2):
+        with transaction.atomic():
+            if _take_units(entry.item_id, quantity, at, quantity_reserved=quantity):
+                return FlashSaleReservation.objects.create(
+                    item_id=entry.item_id, user=user, quantity=quantity,
+                    # a reservation never outlives its sale
+                    expires_at=min(at + ttl, entry.ends_at),
+                )
+        if attempt or not release_expired_reservations(at, item_id=entry.item_id):
+            break
+    if entry.quantity_limit > 0:
+        # sold out: stop advertising the flash price in this process
+        flash_sale_index.invalidate()
+    return None
+
+
+def _return_units(reservations):
+    """Give the units of reservations that just left HELD back to their items"""
+    returned = {}
+    for item_id, quantity in reservations:
+        returned[item_id] = returned.get(item_id, 0) + quantity
+    for item_id, quantity in returned.items():
+        FlashSaleItem.objects.filter(pk=item_id).update(quantity_reserved=F('quantity_reserved') - quantity)
+
+
+def release_reservation(reservation, status=FlashSaleReservation.RELEASED):
+    """Return a held reservation's units; False when it was no longer held"""
+    with transaction.atomic():
+        released = FlashSaleReservation.objects.filter(
+            pk=reservation.pk, status=FlashSaleReservation.HELD
+        ).update(status=status)
+        if released:
+            _return_units([(reservation.item_id, reservation.quantity)])
+    return bool(released)
+
+
+def release_expired_reservations(at=None, item_id=None, batch_size=1000):
+    """Expire held reservations past ``expires_at``; returns the number released.
+
+    Rows are locked with SKIP LOCKED where supported, so concurrent sweeps
+    (or a sweep racing a checkout) never return the same units twice.
+    """
+    at = at or timezone.now()
+    with transaction.atomic():
+        expired = FlashSaleReservation.objects.select_for_update(skip_locked=True).filter(
+            status=FlashSaleReservation.HELD, expires_at__lte=at
+        )
+        if item_id is not None:
+            expired = expired.filter(item_id=item_id)
+        rows = list(expired.values_list('id', 'item_id', 'quantity')[:batch_size])
+        if not rows:
+            return 0
+        FlashSaleReservation.objects.filter(
+            pk__in=[pk for pk, _, _ in rows], status=FlashSaleReservation.HELD
+        ).update(status=FlashSaleReservation.EXPIRED)
+        _return_units((item, quantity) for _, item, quantity in rows)
+    return len(rows)
+
+
+def _claim_reservation(reservation, quantity, at):
+    """Turn a held reservation into sold units; any units not bought go back"""
+    claimed = FlashSaleReservation.objects.filter(
+        pk=reservation.pk, status=FlashSaleReservation.HELD, expires_at__gt=at
+    ).update(status=FlashSaleReservation.CLAIMED)
+    if claimed:
+        FlashSaleItem.objects.filter(pk=reservation.item_id).update(
+            quantity_reserved=F('quantity_reserved') - reservation.quantity,
+            quantity_sold=F('quantity_sold') + quantity,
+        )
+    return bool(claimed)
+
+
+def claim_flash_sale_price(product, quantity, user=None, at=None):
+    """Unit price to charge at checkout, claiming flash-sale units when a sale applies.
+
+    A held reservation of the buyer that covers the quantity is claimed;
+    otherwise the units are taken directly with a conditional update that
+    re-checks the window and the limit (reservations included), so a stale
+    index never sells below price or past the limit. Call inside the
+    checkout transaction.
+    """
+    # the stored price honours the sale window, same base as ``flash_sale_pricing``
+    regular = Decimal(product.effective_price)
+    entry = flash_sale_index.get(product.pk)
+    if entry is None:
+        return regular
+    at = at or timezone.now()
+    quantity = int(quantity)
+    discounted = (Decimal(product.price) * (100 - entry.discount_percentage) / 100).quantize(Decimal('0.01'))
+    if discounted >= regular:
+        return regular
+
+    claimed = False
+    if user is not None:
+        held = FlashSaleReservation.objects.filter(
+            user=user, item_id=entry.item_id, status=FlashSaleReservation.HELD, expires_at__gt=at
+        ).first()
+        if held is not None:
+            if held.quantity >= quantity:
+                claimed = _claim_reservation(held, quantity, at)
+            else:
+                # a smaller hold does not cover the line: its units go back before a direct claim
+                release_reservation(held)
+    if not claimed:
+        claimed = _take_units(entry.item_id, quantity, at, quantity_sold=quantity)
+    if not claimed or entry.quantity_limit > 0:
+        # sold out or ended since the index was loaded, or limited stock moved: reload on next use
+        flash_sale_index.invalidate()
+    return discounted if claimed else regular
@@ -0,0 +1,60 @@
+import gzip
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import resolve
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from itiproject.middleware import brotli
+from itiproject.renderers import FastJSONRenderer, orjson
+from products.models import Category, Product
+
+
+def catalog_endpoints():
+    endpoints = [('product list', '/api/products/'), ('reference data', '/api/vendor/')]
+    category = Category.objects.filter(parent__isnull=True).values_list('slug', flat=True).first()
+    if category:
+        endpoints.append(('category page', f'/api/category/{category}/products/'))
+    product = Product.objects.values_list('pk', flat=True).first()
+    if product:
+        endpoints.append(('product detail', f'/api/products/{product}/'))
+    return endpoints
+
+
+class Command(BaseCommand):
+    help = 'Compares JSON encode time and bytes on the wire of the catalog endpoints per renderer and encoding'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Renders timed per endpoint and renderer')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed, FastJSONRenderer uses the stock encoder'))
+        hosts = [host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and not host.startswith('.')]
+        factory = APIRequestFactory(SERVER_NAME=hosts[0] if hosts else 'localhost')
+        renderers = [('JSONRenderer', JSONRenderer()), ('FastJSONRenderer', FastJSONRenderer())]
+
+        for name, path in catalog_endpoints():
+            match = resolve(path)
+            response = match.func(factory.get(path), *match.args, **match.kwargs)
+            if response.status_code != 200:
+                raise CommandError(f'{path} answered {response.status_code}')
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name} ({path})'))
+            for renderer_name, renderer in renderers:
+                started = time.perf_counter()
+                for _ in range(options['iterations']):
+                    body = renderer.render(response.data)
+                elapsed = (time.perf_counter() - started) / options['iterations'] * 1000
+                self.stdout.write(f'  {renderer_name:<18} {elapsed:8.3f} ms/encode')
+
+            sizes = [('identity', len(body)),
+                     ('gzip', len(gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL)))]
+            if brotli:
+                sizes.append(('br', len(brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY))))
+            for encoding, size in sizes:
+                self.stdout.write(f'  {encoding:<18} {size:8d} bytes')
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished'))
+
+# use the command python manage.py benchmark_catalog_rendering --iterations 500 against a populated database
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from products.models import Product, Category, Brand
+from products.pagination import KEYSET_ORDERINGS
+from products.query import ProductQuery, ProductQuerySpec, SEARCH_ICONTAINS
+
+# Plan fragments that mean the database read the whole table or sorted in a temp structure
+FULL_SCAN_MARKERS = {
+    'sqlite': ('SCAN products_product', 'USE TEMP B-TREE'),
+    'postgresql': ('Seq Scan on products_product', 'Sort'),
+}
+PAGE_SIZE = 12
+
+
+def canonical_query_shapes():
+    """The listing queries served by products/views.py, compiled by ProductQuery like the views do"""
+    category = Category.objects.filter(products__isnull=False).first()
+    brand = Brand.objects.filter(products__isnull=False).values_list('slug', flat=True).first()
+    seller = Product.objects.exclude(seller=None).values_list('seller_id', flat=True).first()
+
+    specs = []
+    for ordering in KEYSET_ORDERINGS:
+        specs.append((f'list ordered by {ordering}', ProductQuerySpec(ordering=ordering)))
+    specs.append(('sponsored by popularity', ProductQuerySpec(sponsored=True)))
+    if category is not None:
+        # category pages filter on the closure descendants of the category
+        descendants = frozenset(category.get_descendant_ids())
+        for ordering in KEYSET_ORDERINGS:
+            specs.append((f'category ordered by {ordering}', ProductQuerySpec(
+                category_ids=descendants, search=None, ordering=ordering
+            )))
+    if brand is not None:
+        specs.append(('brand by popularity', ProductQuerySpec(brands=frozenset([brand]))))
+    if seller is not None:
+        specs.append(('vendor by newest', ProductQuerySpec(
+            seller_id=seller, search=SEARCH_ICONTAINS, ordering='newest'
+        )))
+    return [(name, ProductQuery(spec).queryset()[:PAGE_SIZE]) for name, spec in specs]
+
+
+def plan_problems(plan, vendor=None):
+    vendor = vendor or connection.vendor
+    problems = []
+    for line in plan.splitlines():
+        for marker in FULL_SCAN_MARKERS.get(vendor, ()):
+            # an index-backed SCAN is an ordered index walk, not a full scan
+            if marker in line and 'USING INDEX' not in line and 'USING COVERING INDEX' not in line:
+                problems.append(line.strip())
+    return problems
+
+
+class Command(BaseCommand):
+    help = 'Runs EXPLAIN on every canonical catalog query and reports full scans and temp sorts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose', action='store_true', help='Print the full plan of every query')
+        parser.add_argument('--strict', action='store_true', help='Exit with an error when a query is flagged')
+
+    def handle(self, *args, **options):
+        flagged = 0
+        for name, queryset in canonical_query_shapes():
+            plan = queryset.explain()
+            problems = plan_problems(plan)
+            if problems:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f'{name}: ' + '; '.join(problems)))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: ok'))
+            if options['verbose']:
+                self.stdout.write(plan)
+
+        if flagged and options['strict']:
+            raise CommandError(f'{flagged} catalog queries fall back to a full scan or sort')
+        self.stdout.write(self.style.SUCCESS(f'Checked catalog query plans, {flagged} flagged'))
+
+# use the command python manage.py explain_catalog_queries --verbose after changing Product.Meta.indexes
@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from redis.exceptions import RedisError
+from products.recently_viewed import flush_dirty_histories
+
+class Command(BaseCommand):
+    help = 'Copies recently viewed products tracked in Redis into the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Users written per batch')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running and flush every N seconds (0 flushes once)')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                flushed = flush_dirty_histories(options['batch_size'])
+            except RedisError as e:
+                raise CommandError(f'Redis unavailable: {e}')
+            self.stdout.write(self.style.SUCCESS(f'Flushed recently viewed products of {flushed} users'))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+# use the command python manage.py flush_recently_viewed every minute from cron, or --interval 30 as a worker
@@ -0,0 +1,123 @@
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+from products.flash_sales import flash_sale_index, reserve_flash_sale_units
+from products.models import Category, Product, FlashSale, FlashSaleItem, FlashSaleReservation
+
+User = get_user_model()
+
+
+def create_fixture(buyers, limit):
+    """A running flash sale with one limited item and ``buyers`` throwaway users"""
+    tag = uuid.uuid4().hex[:8]
+    now = timezone.now()
+    category = Category.objects.create(name=f'Load test {tag}', slug=f'load-test-{tag}')
+    product = Product.objects.create(
+        name=f'Load test {tag}', sku=f'LOAD-{tag}', category=category, price=100, stock_quantity=limit,
+        description='-'
+    )
+    sale = FlashSale.objects.create(
+        name=f'Load test {tag}', slug=f'load-test-{tag}', start_time=now - timedelta(minutes=1),
+        end_time=now + timedelta(hours=1)
+    )
+    item = FlashSaleItem.objects.create(flash_sale=sale, product=product, discount_percentage=50, quantity_limit=limit)
+    users = User.objects.bulk_create([
+        User(username=f'load-{tag}-{n}', email=f'load-{tag}-{n}@example.com', password='!')
+        for n in range(buyers)
+    ])
+    users = list(User.objects.filter(username__startswith=f'load-{tag}-'))
+    return category, product, sale, item, users
+
+
+class Command(BaseCommand):
+    help = ('Simulates concurrent buyers reserving the same flash sale item; fails if more units are held '
+            'than the limit and reports throughput')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=500, help='Buyers, one reservation attempt each')
+        parser.add_argument('--limit', type=int, default=100, help='quantity_limit of the flash sale item')
+        parser.add_argument('--quantity', type=int, default=1, help='Units each buyer tries to reserve')
+        parser.add_argument('--workers', type=int, default=32,
+                            help='Threads, each with its own database connection (keep below max_connections)')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated sale, product and users')
+
+    def handle(self, *args, **options):
+        buyers, quantity = options['buyers'], options['quantity']
+        workers = max(1, min(options['workers'], buyers))
+        category, product, sale, item, users = create_fixture(buyers, options['limit'])
+        try:
+            flash_sale_index.invalidate()
+            entry = flash_sale_index.get(product.pk)
+            start = threading.Event()
+
+            def buy(users):
+                """One worker: its share of the buyers one after another, on one connection"""
+                results = []
+                start.wait()
+                try:
+                    for user in users:
+                        started = time.perf_counter()
+                        try:
+                            reserved = reserve_flash_sale_units(entry, user, quantity) is not None
+                            results.append((reserved, time.perf_counter() - started, None))
+                        except Exception as e:
+                            results.append((False, time.perf_counter() - started, e))
+                finally:
+                    connection.close()
+                return results
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(buy, users[index::workers]) for index in range(workers)]
+                started = time.perf_counter()
+                start.set()
+                results = [result for future in futures for result in future.result()]
+                elapsed = time.perf_counter() - started
+
+            self.report(results, elapsed, item, options['limit'], quantity)
+        finally:
+            if not options['keep']:
+                sale.delete()
+                product.delete()
+                category.delete()
+                User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def report(self, results, elapsed, item, limit, quantity):
+        item.refresh_from_db()
+        successes = sum(1 for ok, _, _ in results if ok)
+        errors = [error for _, _, error in results if error is not None]
+        held = FlashSaleReservation.objects.filter(
+            item=item, status=FlashSaleReservation.HELD
+        ).aggregate(units=Sum('quantity'))['units'] or 0
+        latencies = sorted(latency * 1000 for _, latency, _ in results)
+
+        self.stdout.write(f'buyers            {len(results)}')
+        self.stdout.write(f'reserved          {successes} ({successes * quantity} units of {limit})')
+        self.stdout.write(f'sold out          {len(results) - successes - len(errors)}')
+        self.stdout.write(f'errors            {len(errors)}')
+        self.stdout.write(f'elapsed           {elapsed:.3f} s')
+        self.stdout.write(f'throughput        {len(results) / elapsed:.1f} attempts/s')
+        self.stdout.write(f'latency p50/p95   {statistics.median(latencies):.1f} / '
+                          f'{latencies[int(len(latencies) * 0.95) - 1]:.1f} ms')
+        for error in set(map(repr, errors[:5])):
+            self.stdout.write(self.style.WARNING(f'  {error}'))
+
+        if item.quantity_reserved + item.quantity_sold > limit:
+            raise CommandError(f'Oversold: {item.quantity_reserved + item.quantity_sold} units held of {limit}')
+        if errors:
+            # failed attempts never competed for the units, the run proves nothing
+            raise CommandError(f'{len(errors)} of {len(results)} attempts failed')
+        if item.quantity_reserved != held or held != successes * quantity:
+            raise CommandError(f'Counter drift: item holds {item.quantity_reserved}, reservations {held}, '
+                               f'successful buyers {successes * quantity}')
+        self.stdout.write(self.style.SUCCESS('No overselling'))
+
+# use the command python manage.py load_test_flash_sale --buyers 500 --limit 100 against PostgreSQL
+# (SQLite serializes writers, expect "database is locked" errors there beyond a few threads)
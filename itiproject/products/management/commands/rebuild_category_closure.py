@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from products.models import CategoryClosure
+
+class Command(BaseCommand):
+    help = 'Rebuilds the category closure table from Category.parent'
+
+    def handle(self, *args, **options):
+        count = CategoryClosure.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt category closure table ({count} links)'))
+
+# use the command python manage.py rebuild_category_closure after bulk imports that bypass Category.save()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from products.price_summary import rebuild_price_summaries
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored per-category price range and histogram from the products table'
+
+    def handle(self, *args, **options):
+        summarized = rebuild_price_summaries()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt price summaries ({summarized} categories with products)'))
+
+# use the command python manage.py rebuild_price_summaries after bulk product imports or raw SQL updates
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from products.attributes import rebuild_product_attributes
+
+class Command(BaseCommand):
+    help = 'Rebuilds the specification attribute index (filters and facets) from Product.specifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Products re-indexed per transaction')
+
+    def handle(self, *args, **options):
+        written = rebuild_product_attributes(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {written} product attributes'))
+
+# use the command python manage.py rebuild_product_attributes once after migrating, and after bulk imports
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from products.search import get_search_backend
+
+class Command(BaseCommand):
+    help = 'Rebuilds the product full-text search index'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} products with {backend.__class__.__name__}'))
+
+# use the command python manage.py rebuild_search_index after bulk imports that bypass Product.save()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from products.vendor_stats import rebuild_vendor_stats
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored vendor dashboard stats from the products and order items tables'
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_vendor_stats()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt vendor stats ({rebuilt} vendors)'))
+
+# use the command python manage.py rebuild_vendor_stats after bulk imports or raw SQL updates
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from products.models import Brand
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored per-brand product counts'
+
+    def handle(self, *args, **options):
+        fixed = Brand.recount_products()
+        self.stdout.write(self.style.SUCCESS(f'Reconciled brand product counts ({fixed} brands updated)'))
+
+# use the command python manage.py reconcile_brand_counts after bulk product imports or raw SQL updates
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from products.models import Category
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored per-category product counts (including descendants)'
+
+    def handle(self, *args, **options):
+        fixed = Category.recount_products()
+        self.stdout.write(self.style.SUCCESS(f'Reconciled category product counts ({fixed} categories updated)'))
+
+# use the command python manage.py reconcile_category_counts after bulk product imports or raw SQL updates
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from products.models import Product
+from products.response_cache import invalidate_product_ids
+
+class Command(BaseCommand):
+    help = 'Re-syncs stored effective prices and discounts of products whose sale window opened or closed'
+
+    def handle(self, *args, **options):
+        changed = Product.refresh_stale_pricing()
+        # bulk_update sends no signals, drop the cached listings showing the old prices
+        # (the changed products are loaded with .only(), their placement is read in one query)
+        invalidate_product_ids(product.pk for product in changed)
+        self.stdout.write(self.style.SUCCESS(f'Refreshed pricing of {len(changed)} products'))
+
+# use the command python manage.py refresh_product_prices from cron, or run_sale_scheduler for exact boundaries
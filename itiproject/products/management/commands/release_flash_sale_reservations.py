@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from products.flash_sales import release_expired_reservations
+
+class Command(BaseCommand):
+    help = 'Returns the units of expired flash sale reservations to their items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Reservations expired per transaction')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running and sweep every N seconds (0 sweeps once)')
+
+    def handle(self, *args, **options):
+        while True:
+            released = total = release_expired_reservations(batch_size=options['batch_size'])
+            while released == options['batch_size']:
+                released = release_expired_reservations(batch_size=options['batch_size'])
+                total += released
+            self.stdout.write(self.style.SUCCESS(f'Released {total} expired reservations'))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+# use the command python manage.py release_flash_sale_reservations every minute from cron, or --interval 15 as a worker
@@ -0,0 +1,42 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from products.flash_sales import release_expired_reservations
+from products.models import Product
+from products.response_cache import invalidate_product_ids
+from products.sale_scheduler import SaleScheduler
+
+class Command(BaseCommand):
+    help = ('Worker that recomputes prices and purges the cached pages of the affected products '
+            'exactly when sale and flash sale windows open or close')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizon', type=int, default=60, help='Minutes of upcoming boundaries kept in memory')
+        parser.add_argument('--reload-interval', type=int, default=60,
+                            help='Seconds between reloads of the upcoming boundaries (picks up edited sales)')
+
+    def handle(self, *args, **options):
+        # catch up on windows that moved while the worker was down
+        changed = Product.refresh_stale_pricing()
+        invalidate_product_ids(product.pk for product in changed)
+        release_expired_reservations()
+        self.stdout.write(self.style.SUCCESS(f'Caught up pricing of {len(changed)} products'))
+
+        scheduler = SaleScheduler(
+            horizon=timedelta(minutes=options['horizon']),
+            reload_interval=timedelta(seconds=options['reload_interval']),
+        )
+        while True:
+            result = scheduler.tick()
+            if result is not None:
+                repriced, flash_product_ids = result
+                self.stdout.write(
+                    f'{scheduler.processed_until:%Y-%m-%d %H:%M:%S}: repriced {len(repriced)} products, '
+                    f'{len(flash_product_ids)} flash sale products changed'
+                )
+            delay = (scheduler.next_wakeup() - timezone.now()).total_seconds()
+            if delay > 0:
+                time.sleep(delay)
+
+# use the command python manage.py run_sale_scheduler as a long running worker next to the web processes
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-17 20:37
+
+from django.db import migrations, models
+
+
+def count_products(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    CategoryClosure = apps.get_model('products', 'CategoryClosure')
+    counts = (
+        CategoryClosure.objects.values('ancestor_id')
+        .annotate(total=models.Count('descendant__products'))
+        .values_list('ancestor_id', 'total')
+    )
+    for category_id, total in counts:
+        Category.objects.filter(pk=category_id).update(product_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_category_closure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_products, migrations.RunPython.noop),
+    ]
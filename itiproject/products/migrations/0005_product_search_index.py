@@ -0,0 +1,71 @@
+from django.db import migrations
+
+
+SQLITE_FORWARD = [
+    'CREATE TABLE IF NOT EXISTS products_product_search ('
+    'rowid INTEGER PRIMARY KEY AUTOINCREMENT, product_id char(32) NOT NULL UNIQUE)',
+    'CREATE VIRTUAL TABLE IF NOT EXISTS products_product_fts USING fts5('
+    "name, description, brand, category, tokenize = 'unicode61 remove_diacritics 2')",
+]
+SQLITE_BACKWARD = [
+    'DROP TABLE IF EXISTS products_product_fts',
+    'DROP TABLE IF EXISTS products_product_search',
+]
+POSTGRES_FORWARD = [
+    'ALTER TABLE products_product ADD COLUMN IF NOT EXISTS search_vector tsvector',
+    'CREATE INDEX IF NOT EXISTS products_product_search_vector_idx '
+    'ON products_product USING GIN (search_vector)',
+]
+# Initial indexing of existing catalogs in plain SQL, so this migration does not
+# depend on the current models or products.search; later writes are incremental
+SQLITE_BACKFILL = [
+    'INSERT OR IGNORE INTO products_product_search (product_id) SELECT id FROM products_product',
+    'INSERT INTO products_product_fts (rowid, name, description, brand, category) '
+    "SELECT s.rowid, p.name, p.description, coalesce(b.name, ''), coalesce(c.name, '') "
+    'FROM products_product_search s JOIN products_product p ON p.id = s.product_id '
+    'LEFT JOIN products_brand b ON b.id = p.brand_id '
+    'LEFT JOIN products_category c ON c.id = p.category_id',
+]
+POSTGRES_BACKFILL = [
+    'UPDATE products_product p SET search_vector = '
+    "setweight(to_tsvector('simple', coalesce(p.name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce("
+    "(SELECT b.name FROM products_brand b WHERE b.id = p.brand_id), '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce("
+    "(SELECT c.name FROM products_category c WHERE c.id = p.category_id), '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(p.description, '')), 'C')",
+]
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS products_product_search_vector_idx',
+    'ALTER TABLE products_product DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = SQLITE_FORWARD + SQLITE_BACKFILL
+    elif vendor == 'postgresql':
+        statements = POSTGRES_FORWARD + POSTGRES_BACKFILL
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_category_product_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
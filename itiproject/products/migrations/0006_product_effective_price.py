@@ -0,0 +1,55 @@
+# Generated by Django 5.1.7 on 2026-10-17 20:44
+
+from django.conf import settings
+from decimal import Decimal
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_effective_prices(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    now = timezone.now()
+    products = []
+    for product in Product.objects.only('id', 'price', 'sale_price', 'sale_start_date', 'sale_end_date').iterator():
+        price = product.price or Decimal(0)
+        active = (
+            product.sale_price is not None and product.sale_price < price and
+            (product.sale_start_date is None or product.sale_start_date <= now) and
+            (product.sale_end_date is None or product.sale_end_date > now)
+        )
+        product.effective_price = product.sale_price if active else price
+        product.discount_percentage = (
+            ((price - product.sale_price) / price * 100).quantize(Decimal('0.01')) if active else Decimal(0)
+        )
+        products.append(product)
+    Product.objects.bulk_update(products, ['effective_price', 'discount_percentage'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='discount_percentage',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.RunPython(fill_effective_prices, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['effective_price'], name='products_pr_effecti_8ce082_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['discount_percentage'], name='products_pr_discoun_97bfb8_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.1.7 on 2026-10-17 20:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def clear_null_quantity_sold(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Product.objects.filter(quantity_sold__isnull=True).update(quantity_sold=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_effective_price'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_null_quantity_sold, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='product',
+            name='quantity_sold',
+            field=models.IntegerField(blank=True, default=0),
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='products_pr_effecti_8ce082_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['effective_price', 'id'], name='products_pr_effecti_5873d8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-quantity_sold', '-id'], name='products_pr_quantit_3b86a8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-created_at', '-id'], name='products_pr_created_e6f9fc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-rating_average', '-id'], name='products_pr_rating__ecbfc2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', '-quantity_sold', '-id'], name='products_pr_categor_ad433b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='products_pr_categor_86f1d3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'effective_price', 'id'], name='products_pr_categor_8b6288_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', '-rating_average', '-id'], name='products_pr_categor_74a1c3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['brand', '-quantity_sold', '-id'], name='products_pr_brand_i_d05618_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['seller', '-created_at', '-id'], name='products_pr_seller__c16a41_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_sponsored', True)), fields=['-quantity_sold', '-id'], name='product_sponsored_popular_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:01
+
+from django.db import migrations, models
+
+
+def count_products(apps, schema_editor):
+    Brand = apps.get_model('products', 'Brand')
+    counts = Brand.objects.annotate(total=models.Count('products')).values_list('pk', 'total')
+    for brand_id, total in counts:
+        Brand.objects.filter(pk=brand_id).update(product_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='brand',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# facets.PRICE_BUCKETS at the time of this migration
+PRICE_BUCKETS = [0, 100, 250, 500, 1000, 2500, 5000, 10000, 25000]
+
+
+def summarize_prices(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    CategoryPriceSummary = apps.get_model('products', 'CategoryPriceSummary')
+    summaries = {}
+    for category_id, price in Product.objects.values_list('category_id', 'price').iterator():
+        summary = summaries.get(category_id)
+        if summary is None:
+            summary = summaries[category_id] = CategoryPriceSummary(
+                category_id=category_id, min_price=price, max_price=price, histogram=[0] * len(PRICE_BUCKETS)
+            )
+        summary.product_count += 1
+        summary.min_price = min(summary.min_price, price)
+        summary.max_price = max(summary.max_price, price)
+        summary.histogram[max(i for i, edge in enumerate(PRICE_BUCKETS) if price >= edge)] += 1
+    CategoryPriceSummary.objects.bulk_create(summaries.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_brand_product_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryPriceSummary',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='price_summary', serialize=False, to='products.category')),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('histogram', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Category price summaries',
+            },
+        ),
+        migrations.RunPython(summarize_prices, migrations.RunPython.noop),
+    ]
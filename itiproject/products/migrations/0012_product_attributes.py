@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_flash_sale_reservations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductAttribute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100)),
+                ('value', models.CharField(max_length=100)),
+                ('key_label', models.CharField(max_length=100)),
+                ('value_label', models.CharField(max_length=100)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attributes', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'value', 'product'], name='products_pr_key_e6945f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'key', 'value'), name='product_attribute_unique')],
+            },
+        ),
+    ]
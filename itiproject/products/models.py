@@ -4,8 +4,11 @@ from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
 from django.db.models import Avg
+from django.utils import timezone
+from decimal import Decimal
 import uuid
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from users.models import User
 
 User = get_user_model()
@@ -28,6 +31,8 @@ class Category(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     description = models.TextField(blank=True)
+    # Denormalized rollup: products in this category and all of its descendants
+    product_count = models.PositiveIntegerField(default=0, editable=False)
     class Meta:
         verbose_name_plural = 'Categories'
         indexes = [
@@ -53,11 +58,161 @@ class Category(models.Model):
                 parent = parent.parent
 
     def save(self, *args, **kwargs):
-        """Ensure validation runs when saving"""
+        """Ensure validation runs when saving and keep the closure table current"""
         self.clean()
         if not self.slug:
             self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+
+        is_new = self._state.adding
+        old_parent_id = None
+        if not is_new:
+            if kwargs.get('update_fields') is None:
+                # product_count is maintained with F() updates, never write back a stale copy
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name != 'product_count'
+                ]
+            old_parent_id = Category.objects.filter(pk=self.pk).values_list('parent_id', flat=True).first()
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                CategoryClosure.insert_node(self)
+            elif old_parent_id != self.parent_id:
+                CategoryClosure.move_subtree(self)
+
+    def get_descendant_ids(self, include_self=True):
+        """IDs of every category below this one, read from the closure table"""
+        links = CategoryClosure.objects.filter(ancestor_id=self.pk)
+        if not include_self:
+            links = links.filter(depth__gt=0)
+        return list(links.values_list('descendant_id', flat=True))
+
+    def get_descendants(self, include_self=True):
+        """Categories below this one in a single indexed query"""
+        # conditions on the same closure row must share a single filter() call
+        filters = {'ancestor_links__ancestor_id': self.pk}
+        if not include_self:
+            filters['ancestor_links__depth__gt'] = 0
+        return Category.objects.filter(**filters)
+
+    def get_ancestors(self, include_self=False):
+        """Categories above this one, ordered from the root down"""
+        filters = {'descendant_links__descendant_id': self.pk}
+        if not include_self:
+            filters['descendant_links__depth__gt'] = 0
+        return Category.objects.filter(**filters).order_by('-descendant_links__depth')
+
+    @staticmethod
+    def adjust_product_count(category_id, delta):
+        """Add ``delta`` to the rollup count of a category and all of its ancestors"""
+        if category_id is None or not delta:
+            return
+        Category.objects.filter(descendant_links__descendant_id=category_id).update(
+            product_count=models.F('product_count') + delta
+        )
+
+    @staticmethod
+    def recount_products():
+        """Reconcile every stored rollup with the products table; returns the number of fixed rows"""
+        counts = dict(
+            CategoryClosure.objects.values('ancestor_id')
+            .annotate(total=models.Count('descendant__products'))
+            .values_list('ancestor_id', 'total')
+        )
+        stale = []
+        for category in Category.objects.only('id', 'product_count'):
+            total = counts.get(category.id, 0)
+            if category.product_count != total:
+                category.product_count = total
+                stale.append(category)
+        Category.objects.bulk_update(stale, ['product_count'], batch_size=500)
+        return len(stale)
+
+
+class CategoryClosure(models.Model):
+    """Materialized ancestor/descendant pairs of the category tree (closure table).
+
+    Every category has a depth-0 row pointing at itself plus one row per
+    ancestor, so descendant and ancestor lookups are a single indexed query
+    instead of a recursive walk over ``children``.
+    """
+    ancestor = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='descendant_links'
+    )
+    descendant = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='ancestor_links'
+    )
+    depth = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = [['ancestor', 'descendant']]
+        indexes = [
+            models.Index(fields=['descendant', 'depth']),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+    @classmethod
+    def insert_node(cls, category):
+        """Add the closure rows of a freshly created leaf category"""
+        links = [cls(ancestor_id=category.pk, descendant_id=category.pk, depth=0)]
+        if category.parent_id:
+            parent_links = cls.objects.filter(descendant_id=category.parent_id).values_list('ancestor_id', 'depth')
+            links.extend(
+                cls(ancestor_id=ancestor_id, descendant_id=category.pk, depth=depth + 1)
+                for ancestor_id, depth in parent_links
+            )
+        cls.objects.bulk_create(links)
+
+    @classmethod
+    def move_subtree(cls, category):
+        """Re-attach the subtree rooted at ``category`` under its current parent"""
+        subtree = list(cls.objects.filter(ancestor_id=category.pk).values_list('descendant_id', 'depth'))
+        subtree_ids = [descendant_id for descendant_id, _ in subtree]
+
+        # The moved subtree's products no longer roll up into its old ancestors
+        subtree_total = Category.objects.filter(pk=category.pk).values_list('product_count', flat=True).first() or 0
+        Category.objects.filter(
+            pk__in=cls.objects.filter(descendant_id=category.pk, depth__gt=0).values('ancestor_id')
+        ).update(product_count=models.F('product_count') - subtree_total)
+
+        # Drop the links between the subtree and its old ancestors
+        cls.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+
+        if category.parent_id:
+            parent_links = list(cls.objects.filter(descendant_id=category.parent_id).values_list('ancestor_id', 'depth'))
+            cls.objects.bulk_create([
+                cls(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + depth + 1)
+                for ancestor_id, ancestor_depth in parent_links
+                for descendant_id, depth in subtree
+            ])
+            Category.objects.filter(pk__in=[ancestor_id for ancestor_id, _ in parent_links]).update(
+                product_count=models.F('product_count') + subtree_total
+            )
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute the whole table from ``Category.parent`` (e.g. after bulk imports)"""
+        parents = dict(Category.objects.values_list('id', 'parent_id'))
+        links = []
+        for category_id in parents:
+            ancestor_id, depth = category_id, 0
+            seen = set()
+            while ancestor_id is not None and ancestor_id not in seen:
+                seen.add(ancestor_id)
+                links.append(cls(ancestor_id=ancestor_id, descendant_id=category_id, depth=depth))
+                ancestor_id = parents.get(ancestor_id)
+                depth += 1
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(links, batch_size=1000)
+        return len(links)
 
 
 class Brand(models.Model):
@@ -67,6 +222,8 @@ class Brand(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     image = models.ImageField(upload_to='brand_images/', blank=True, null=True)
+    # Denormalized: products of this brand, maintained by the product signals
+    product_count = models.PositiveIntegerField(default=0, editable=False)
     class Meta:
         ordering = ['name']
         indexes = [
@@ -76,8 +233,32 @@ class Brand(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # product_count is maintained with F() updates, never write back a stale copy
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'product_count'
+            ]
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def adjust_product_count(brand_id, delta):
+        """Add ``delta`` to the stored product count of a brand"""
+        if brand_id is None or not delta:
+            return
+        Brand.objects.filter(pk=brand_id).update(product_count=models.F('product_count') + delta)
+
+    @staticmethod
+    def recount_products():
+        """Reconcile every stored count with the products table; returns the number of fixed rows"""
+        stale = []
+        for brand in Brand.objects.annotate(total=models.Count('products')).only('id', 'product_count'):
+            if brand.product_count != brand.total:
+                brand.product_count = brand.total
+                stale.append(brand)
+        Brand.objects.bulk_update(stale, ['product_count'], batch_size=500)
+        return len(stale)
+
     def __str__(self):
         return self.name
 
@@ -128,6 +309,16 @@ class Color(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Rows ready for ProductListSerializer: category and brand joined.
+
+        Images, sizes and colors are prefetched by the serializer, only for
+        products whose fragment is not cached (at most three extra queries per
+        page, independent of the page size)"""
+        return self.select_related('category', 'brand')
+
+
 class Product(models.Model):
     """Main product model"""
     # Basic Information
@@ -172,10 +363,14 @@ class Product(models.Model):
     sale_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     sale_start_date = models.DateTimeField(null=True, blank=True)
     sale_end_date = models.DateTimeField(null=True, blank=True)
+    # Derived pricing, stored so filters and sorts can use an index.
+    # Recomputed on save and when a sale window opens or closes.
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    discount_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0, editable=False)
     
     # Inventory
     stock_quantity = models.IntegerField(default=0)
-    quantity_sold = models.IntegerField(default=0, null=True, blank=True)
+    quantity_sold = models.IntegerField(default=0, blank=True)
     track_inventory = models.BooleanField(default=True)
     allow_backorder = models.BooleanField(default=False)
     
@@ -219,6 +414,8 @@ class Product(models.Model):
     sizes = models.ManyToManyField(Size, blank=True, related_name='products')
     colors = models.ManyToManyField(Color, blank=True, related_name='products')
     material = models.CharField(max_length=100, blank=True)
+
+    objects = ProductQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
@@ -228,6 +425,26 @@ class Product(models.Model):
             models.Index(fields=['category']),
             models.Index(fields=['brand']),
             models.Index(fields=['is_featured']),
+            models.Index(fields=['discount_percentage']),
+            # Catalog sort orders (see products/views.py), id is the keyset tiebreaker
+            models.Index(fields=['effective_price', 'id']),
+            models.Index(fields=['-quantity_sold', '-id']),
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['-rating_average', '-id']),
+            # Category pages: filter on category, sort without a temp B-tree
+            models.Index(fields=['category', '-quantity_sold', '-id']),
+            models.Index(fields=['category', '-created_at', '-id']),
+            models.Index(fields=['category', 'effective_price', 'id']),
+            models.Index(fields=['category', '-rating_average', '-id']),
+            # Brand filter and vendor dashboard
+            models.Index(fields=['brand', '-quantity_sold', '-id']),
+            models.Index(fields=['seller', '-created_at', '-id']),
+            # Sponsored products are a small slice of the catalog
+            models.Index(
+                fields=['-quantity_sold', '-id'],
+                condition=models.Q(is_sponsored=True),
+                name='product_sponsored_popular_idx',
+            ),
         ]
 
     def __str__(self):
@@ -236,8 +453,58 @@ class Product(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(f"{self.name}-{self.sku}")
+        self.refresh_pricing()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'effective_price', 'discount_percentage'}
         super().save(*args, **kwargs)
 
+    def sale_is_active(self, at=None):
+        """Whether sale_price applies at the given moment (defaults to now)"""
+        if self.sale_price is None or self.price is None or self.sale_price >= self.price:
+            return False
+        at = at or timezone.now()
+        if self.sale_start_date and at < self.sale_start_date:
+            return False
+        if self.sale_end_date and at >= self.sale_end_date:
+            return False
+        return True
+
+    def refresh_pricing(self, at=None):
+        """Recompute effective_price and discount_percentage; returns True if they changed"""
+        price = Decimal(self.price or 0)
+        effective_price = Decimal(self.sale_price) if self.sale_is_active(at) else price
+        discount = Decimal(0)
+        if price > 0 and effective_price < price:
+            discount = ((price - effective_price) / price * 100).quantize(Decimal('0.01'))
+        changed = (effective_price, discount) != (self.effective_price, self.discount_percentage)
+        self.effective_price, self.discount_percentage = effective_price, discount
+        return changed
+
+    @classmethod
+    def sale_active_q(cls, at=None):
+        """Q matching products whose sale price applies at the given moment"""
+        at = at or timezone.now()
+        return (
+            models.Q(sale_price__isnull=False, sale_price__lt=models.F('price')) &
+            (models.Q(sale_start_date__isnull=True) | models.Q(sale_start_date__lte=at)) &
+            (models.Q(sale_end_date__isnull=True) | models.Q(sale_end_date__gt=at))
+        )
+
+    @classmethod
+    def refresh_stale_pricing(cls, at=None, queryset=None):
+        """Re-sync stored prices of products whose sale window opened or closed; returns the updated products"""
+        at = at or timezone.now()
+        active = cls.sale_active_q(at)
+        queryset = queryset if queryset is not None else cls.objects.all()
+        stale = queryset.filter(
+            (active & ~models.Q(effective_price=models.F('sale_price'))) |
+            (~active & ~models.Q(effective_price=models.F('price')))
+        ).only('id', 'price', 'sale_price', 'sale_start_date', 'sale_end_date',
+               'effective_price', 'discount_percentage')
+        changed = [product for product in stale if product.refresh_pricing(at)]
+        cls.objects.bulk_update(changed, ['effective_price', 'discount_percentage'], batch_size=500)
+        return changed
+
     # def update_rating(self):
     #     """Update cached rating from reviews"""
     #     from reviews.models import Review
@@ -282,6 +549,36 @@ class ProductImage(models.Model):
         super().save(*args, **kwargs)
 
 
+class ProductAttribute(models.Model):
+    """One (key, value) pair of ``Product.specifications``, normalized.
+
+    Kept in sync from product saves (see attributes.py) so specification
+    filters and facets are index lookups instead of decoding every row's
+    JSON. ``key_label`` and ``value_label`` keep the spelling for display.
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='attributes'
+    )
+    key = models.CharField(max_length=100)
+    value = models.CharField(max_length=100)
+    key_label = models.CharField(max_length=100)
+    value_label = models.CharField(max_length=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'key', 'value'], name='product_attribute_unique'),
+        ]
+        indexes = [
+            # filters: product ids for a key and a set of values
+            models.Index(fields=['key', 'value', 'product']),
+        ]
+
+    def __str__(self):
+        return f"{self.key_label}: {self.value_label}"
+
+
 
 class FlashSale(models.Model):
     """Flash sales / time-limited deals"""
@@ -292,6 +589,7 @@ class FlashSale(models.Model):
     end_time = models.DateTimeField()
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-start_time']
@@ -322,14 +620,67 @@ class FlashSaleItem(models.Model):
     )
     quantity_limit = models.IntegerField(default=0, help_text="0 for unlimited")
     quantity_sold = models.IntegerField(default=0)
+    # units held by unexpired reservations; only changed with conditional F() updates
+    quantity_reserved = models.PositiveIntegerField(default=0, editable=False)
+    # not moved by the counter updates, only by edits of the item
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = [['flash_sale', 'product']]
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # the counters move with conditional F() updates under contention, never write back a stale copy
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('quantity_sold', 'quantity_reserved')
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.product.name} - {self.discount_percentage}% off"
 
 
+class FlashSaleReservation(models.Model):
+    """Flash-sale units held for a buyer until checkout or expiry (see flash_sales.py)"""
+    HELD = 'held'
+    CLAIMED = 'claimed'
+    RELEASED = 'released'
+    EXPIRED = 'expired'
+    STATUS_CHOICES = [
+        (HELD, 'Held'),
+        (CLAIMED, 'Claimed'),
+        (RELEASED, 'Released'),
+        (EXPIRED, 'Expired'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    item = models.ForeignKey(
+        FlashSaleItem,
+        on_delete=models.CASCADE,
+        related_name='reservations'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='flash_sale_reservations'
+    )
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=HELD)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # expiry sweep and the buyer's held reservation at checkout
+            models.Index(fields=['status', 'expires_at']),
+            models.Index(fields=['user', 'item', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.item_id} for {self.user_id} ({self.status})"
+
+
 class RecentlyViewedProduct(models.Model):
     """Track recently viewed products by users"""
     user = models.ForeignKey(
@@ -353,4 +704,59 @@ class RecentlyViewedProduct(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.user.username} viewed {self.product.name}"
\ No newline at end of file
+        return f"{self.user.username} viewed {self.product.name}"
+
+class CategoryPriceSummary(models.Model):
+    """Price range and fixed-bucket histogram of the products directly in a category.
+
+    Maintained from product writes (see signals.py) so the price slider of an
+    unfiltered or category-only listing is answered from a handful of rows
+    instead of an aggregate over the products table. ``histogram`` holds one
+    count per ``facets.PRICE_BUCKETS`` bucket.
+    """
+    category = models.OneToOneField(
+        Category,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='price_summary'
+    )
+    product_count = models.PositiveIntegerField(default=0)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    histogram = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Category price summaries'
+
+    def __str__(self):
+        return f"{self.category.name}: {self.min_price} - {self.max_price}"
+
+
+class VendorStats(models.Model):
+    """Dashboard figures of a vendor, so the header is a single-row read.
+
+    The catalog columns are recomputed from the vendor's products when a
+    product is created, deleted, moved to another seller or changes price or
+    in-stock state; units sold and revenue are adjusted from order item events
+    with the unit price actually paid (see vendor_stats.py).
+    """
+    vendor = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='vendor_stats'
+    )
+    product_count = models.PositiveIntegerField(default=0)
+    in_stock_count = models.PositiveIntegerField(default=0)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    units_sold = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Vendor stats'
+
+    def __str__(self):
+        return f"{self.vendor.username}: {self.product_count} products, {self.revenue} revenue"
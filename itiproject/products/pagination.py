@@ -0,0 +1,135 @@
+# products/pagination.py
+import base64
+import json
+from datetime import datetime
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+from .models import Product
+
+# ordering key -> (field, descending); every ordering is tie-broken on id
+KEYSET_ORDERINGS = {
+    'popularity': ('quantity_sold', True),
+    'newest': ('created_at', True),
+    'price_asc': ('effective_price', False),
+    'price_desc': ('effective_price', True),
+    'rating': ('rating_average', True),
+}
+
+
+def use_cursor_pagination(request):
+    """Cursor mode is opt-in: ?pagination=cursor or any ?cursor= value"""
+    return request.GET.get('pagination') == 'cursor' or 'cursor' in request.GET
+
+
+class KeysetPagination:
+    """Constant-time pages for infinite scroll.
+
+    Instead of ``COUNT(*)`` + ``OFFSET`` each page seeks past the last row of
+    the previous one with ``(field, id) < (value, id)``, so deep pages cost the
+    same as the first one. No total count is computed.
+    """
+    page_size = 12
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering, page_size=None):
+        if ordering not in KEYSET_ORDERINGS:
+            raise ValueError(f'Unsupported keyset ordering: {ordering}')
+        self.ordering = ordering
+        self.field, self.descending = KEYSET_ORDERINGS[ordering]
+        if page_size:
+            self.page_size = page_size
+        self.next_cursor = None
+        self.request = None
+
+    def order(self, queryset):
+        column = F(self.field)
+        # NULLS LAST only where needed, it keeps plain column indexes from serving the sort
+        nulls_last = True if Product._meta.get_field(self.field).null else None
+        if self.descending:
+            return queryset.order_by(column.desc(nulls_last=nulls_last), '-id')
+        return queryset.order_by(column.asc(nulls_last=nulls_last), 'id')
+
+    def encode_cursor(self, product):
+        value = getattr(product, self.field)
+        # DjangoJSONEncoder keeps milliseconds only: rows created in the same millisecond would be skipped
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        position = [value, product.pk]
+        raw = json.dumps(position, cls=DjangoJSONEncoder).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            value, pk = json.loads(raw)
+            field = Product._meta.get_field(self.field)
+            value = field.to_python(value) if value is not None else None
+            return value, Product._meta.pk.to_python(pk)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def seek(self, queryset, value, pk):
+        """Rows strictly after (value, pk) in the current ordering (NULLs sort last)"""
+        after, id_after = ('lt', 'lt') if self.descending else ('gt', 'gt')
+        if value is None:
+            return queryset.filter(**{f'{self.field}__isnull': True, f'id__{id_after}': pk})
+        condition = Q(**{f'{self.field}__{after}': value}) | Q(**{self.field: value, f'id__{id_after}': pk})
+        if Product._meta.get_field(self.field).null:
+            condition |= Q(**{f'{self.field}__isnull': True})
+        return queryset.filter(condition)
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        queryset = self.order(queryset)
+        cursor = request.GET.get(self.cursor_query_param)
+        if cursor:
+            queryset = self.seek(queryset, *self.decode_cursor(cursor))
+        page = list(queryset[:self.page_size + 1])
+        if len(page) > self.page_size:
+            page = page[:self.page_size]
+            self.next_cursor = self.encode_cursor(page[-1])
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_pagination_data(self):
+        return {
+            'mode': 'cursor',
+            'count': None,
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'previous': None,
+            'ordering': self.ordering,
+        }
+
+
+def paginate(queryset, request, keyset_ordering=None, page_size=12):
+    """One page of a listing and its pagination data.
+
+    Keyset (cursor) pages when the client asks for them and the ordering has a
+    seek key, page-number pages otherwise.
+    """
+    if keyset_ordering and use_cursor_pagination(request):
+        paginator = KeysetPagination(keyset_ordering, page_size)
+        page = paginator.paginate_queryset(queryset, request)
+        return page, paginator.get_pagination_data()
+
+    paginator = PageNumberPagination()
+    paginator.page_size = page_size
+    page = paginator.paginate_queryset(queryset, request)
+    return page, {
+        'count': paginator.page.paginator.count,
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+        'current_page': paginator.page.number,
+        'total_pages': paginator.page.paginator.num_pages,
+    }
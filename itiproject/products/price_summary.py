@@ -0,0 +1,80 @@
+# products/price_summary.py
+from django.db import transaction
+from django.db.models import Min, Max, Count
+from .facets import PRICE_BUCKETS, bucket_bounds, price_bucket_q
+from .models import Category, CategoryPriceSummary, Product
+
+
+def price_aggregates():
+    """Min, max, count and one conditional count per price bucket, for a single aggregate"""
+    aggregates = {'min_price': Min('price'), 'max_price': Max('price'), 'count': Count('id')}
+    for index in range(len(PRICE_BUCKETS)):
+        aggregates[f'bucket_{index}'] = Count('id', filter=price_bucket_q(index))
+    return aggregates
+
+
+def histogram_from_row(row):
+    return [row[f'bucket_{index}'] or 0 for index in range(len(PRICE_BUCKETS))]
+
+
+def histogram_buckets(counts):
+    """Non-empty buckets in the shape of the ``price`` facet"""
+    return [
+        {'min': bucket_bounds(index)[0], 'max': bucket_bounds(index)[1], 'count': count}
+        for index, count in enumerate(counts) if count
+    ]
+
+
+def refresh_price_summaries(category_ids):
+    """Recompute the summaries of the given categories from their products (one aggregate query)"""
+    category_ids = {category_id for category_id in category_ids if category_id is not None}
+    if not category_ids:
+        return
+    rows = (
+        Product.objects.filter(category_id__in=category_ids).order_by()
+        .values('category_id').annotate(**price_aggregates())
+    )
+    summaries = [
+        CategoryPriceSummary(
+            category_id=row['category_id'], product_count=row['count'],
+            min_price=row['min_price'], max_price=row['max_price'], histogram=histogram_from_row(row),
+        )
+        for row in rows
+    ]
+    empty = category_ids - {summary.category_id for summary in summaries}
+    with transaction.atomic():
+        if empty:
+            CategoryPriceSummary.objects.filter(category_id__in=empty).delete()
+        CategoryPriceSummary.objects.bulk_create(
+            summaries, update_conflicts=True, unique_fields=['category'],
+            update_fields=['product_count', 'min_price', 'max_price', 'histogram', 'updated_at'],
+        )
+
+
+def rebuild_price_summaries():
+    """Recompute every summary; returns the number of categories with products"""
+    refresh_price_summaries(set(Category.objects.values_list('id', flat=True)))
+    return CategoryPriceSummary.objects.count()
+
+
+def combined_price_summary(category_ids=frozenset(), category_slug=''):
+    """Price range and histogram of a set of categories read from the stored summaries.
+
+    No scope means the whole catalog. Same keys as ``ProductQuery.price_range``.
+    """
+    summaries = CategoryPriceSummary.objects.all()
+    if category_ids:
+        summaries = summaries.filter(category_id__in=category_ids)
+    if category_slug:
+        summaries = summaries.filter(category__slug=category_slug)
+
+    min_price = max_price = None
+    counts = [0] * len(PRICE_BUCKETS)
+    for low, high, histogram in summaries.values_list('min_price', 'max_price', 'histogram'):
+        if low is not None and (min_price is None or low < min_price):
+            min_price = low
+        if high is not None and (max_price is None or high > max_price):
+            max_price = high
+        for index, count in enumerate(histogram[:len(counts)]):
+            counts[index] += count
+    return {'min_price': min_price, 'max_price': max_price, 'price_histogram': histogram_buckets(counts)}
@@ -0,0 +1,260 @@
+# products/query.py
+import hashlib
+from dataclasses import dataclass, fields
+from decimal import Decimal
+from django.db.models import Q, Min, Max
+from .attributes import parse_attribute_filters, attribute_counts, build_attribute_facets
+from .facets import FacetEngine, parse_decimal, parse_slugs
+from .models import Product, ProductAttribute
+from .pagination import KeysetPagination, KEYSET_ORDERINGS
+from .price_summary import price_aggregates, histogram_from_row, histogram_buckets, combined_price_summary
+from .search import get_search_backend
+
+RELEVANCE = 'relevance'
+SEARCH_INDEX = 'index'
+SEARCH_ICONTAINS = 'icontains'
+# spec fields that may be set while the stored per-category price summaries still apply
+PRICE_SUMMARY_SCOPE = {'category_ids', 'category', 'search', 'ordering'}
+# same for the stored vendor stats
+VENDOR_STATS_SCOPE = {'seller_id', 'search', 'ordering'}
+
+
+def parse_float(value):
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _key_part(value):
+    if isinstance(value, frozenset):
+        return ','.join(sorted(str(item) for item in value))
+    if isinstance(value, Decimal):
+        return format(value.normalize(), 'f')
+    return '' if value is None else str(value)
+
+
+@dataclass(frozen=True)
+class ProductQuerySpec:
+    """Canonical, hashable form of a product listing request.
+
+    Two requests that differ only in parameter order, spelling of numbers or
+    order of multi-select slugs normalize to the same spec (and cache key).
+    """
+    # scope, set by the view rather than the query string
+    seller_id: object = None
+    category_ids: frozenset = frozenset()
+    # filters
+    q: str = ''
+    search: str = SEARCH_INDEX
+    category: str = ''
+    brands: frozenset = frozenset()
+    colors: frozenset = frozenset()
+    sizes: frozenset = frozenset()
+    min_price: Decimal = None
+    max_price: Decimal = None
+    discount_min: Decimal = None
+    has_discount: bool = False
+    is_featured: bool = False
+    sponsored: bool = False
+    in_stock: bool = False
+    min_stars: float = None
+    # ((key, (value, ...)), ...) from spec.<key>= parameters, sorted
+    attributes: tuple = ()
+    ordering: str = 'popularity'
+
+    @property
+    def cache_key(self):
+        raw = '|'.join(f'{field.name}={_key_part(getattr(self, field.name))}' for field in fields(self))
+        return 'products:' + hashlib.sha1(raw.encode()).hexdigest()
+
+    def narrowed_only_by(self, names):
+        """True when every field outside ``names`` keeps its default"""
+        return all(getattr(self, field.name) == field.default for field in fields(self) if field.name not in names)
+
+    @property
+    def category_only(self):
+        """True when nothing but the category scope narrows the product set"""
+        return self.narrowed_only_by(PRICE_SUMMARY_SCOPE)
+
+    @property
+    def vendor_only(self):
+        """True when the set is a vendor's whole catalog"""
+        return self.narrowed_only_by(VENDOR_STATS_SCOPE)
+
+    @property
+    def keyset_ordering(self):
+        """Ordering usable for cursor pagination (relevance has no stable seek key)"""
+        return self.ordering if self.ordering in KEYSET_ORDERINGS else None
+
+
+class ProductQuery:
+    """Parses listing parameters once and compiles them into a single queryset.
+
+    Used by the product list, category and vendor endpoints so filtering,
+    ordering and aggregates are implemented (and optimized) in one place.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+
+    @classmethod
+    def from_params(cls, params, default_ordering='popularity', search=SEARCH_INDEX, **scope):
+        # search=None ignores ?q= (pages whose aggregates cannot run over a search join)
+        q = (params.get('q') or '').strip() if search else ''
+        ordering = params.get('ordering')
+        if ordering not in KEYSET_ORDERINGS:
+            # search results default to relevance when the index can rank them
+            ordering = RELEVANCE if q and search == SEARCH_INDEX else default_ordering
+        category_ids = scope.pop('category_ids', None)
+        spec = ProductQuerySpec(
+            category_ids=frozenset(category_ids or ()),
+            q=q,
+            search=search,
+            category=params.get('category') or '',
+            brands=parse_slugs(params.get('brand')),
+            colors=parse_slugs(params.get('color')),
+            sizes=parse_slugs(params.get('size')),
+            min_price=parse_decimal(params.get('min_price')),
+            max_price=parse_decimal(params.get('max_price')),
+            discount_min=parse_decimal(params.get('discount_min')),
+            has_discount=bool(params.get('has_discount')),
+            is_featured=bool(params.get('is_featured')),
+            sponsored=bool(params.get('sponsored')),
+            in_stock=bool(params.get('in_stock')),
+            min_stars=parse_float(params.get('min_stars')),
+            attributes=parse_attribute_filters(params),
+            ordering=ordering,
+            **scope
+        )
+        return cls(spec)
+
+    @property
+    def cache_key(self):
+        return self.spec.cache_key
+
+    # ---- compiling ----
+
+    def base_queryset(self, skip_attribute=None):
+        """Scope, search, specification filters and every filter that is not a facet.
+
+        Specification filters apply here so the brand, color, size, price and
+        rating facets are counted within them; ``attribute_facets`` counts a
+        selected key without its own filter via ``skip_attribute``.
+        """
+        spec = self.spec
+        products = Product.objects.for_listing()
+        if spec.seller_id is not None:
+            products = products.filter(seller_id=spec.seller_id)
+        if spec.category_ids:
+            products = products.filter(category_id__in=spec.category_ids)
+        if spec.category:
+            products = products.filter(category__slug=spec.category)
+        if spec.q:
+            if spec.search == SEARCH_INDEX:
+                # full-text index (FTS5 / tsvector), annotates search_rank
+                products = get_search_backend().search(products, spec.q)
+            else:
+                products = products.filter(
+                    Q(name__icontains=spec.q) | Q(description__icontains=spec.q) | Q(sku__icontains=spec.q)
+                )
+        # discount_percentage is stored and indexed on Product
+        if spec.discount_min is not None:
+            products = products.filter(discount_percentage__gte=spec.discount_min)
+        if spec.has_discount:
+            products = products.filter(discount_percentage__gt=0)
+        if spec.is_featured:
+            products = products.filter(is_featured=True)
+        if spec.sponsored:
+            products = products.filter(is_sponsored=True)
+        if spec.in_stock:
+            products = products.filter(stock_quantity__gt=0)
+        # semi-joins on the attribute index: OR inside a key, AND across keys
+        for key, values in spec.attributes:
+            if key != skip_attribute:
+                products = products.filter(
+                    id__in=ProductAttribute.objects.filter(key=key, value__in=values).values('product_id')
+                )
+        return products
+
+    def filter_facets(self, products):
+        spec = self.spec
+        if spec.brands:
+            products = products.filter(brand__slug__in=spec.brands)
+        # m2m filters as semi-joins: no duplicate rows, so no DISTINCT over the listing
+        if spec.colors:
+            products = products.filter(
+                id__in=Product.colors.through.objects.filter(color__slug__in=spec.colors).values('product_id')
+            )
+        if spec.sizes:
+            products = products.filter(
+                id__in=Product.sizes.through.objects.filter(size__slug__in=spec.sizes).values('product_id')
+            )
+        if spec.min_price is not None:
+            products = products.filter(price__gte=spec.min_price)
+        if spec.max_price is not None:
+            products = products.filter(price__lte=spec.max_price)
+        # minimum rating stars unless sponsored
+        if spec.min_stars is not None:
+            products = products.filter(Q(rating_average__gte=spec.min_stars) | Q(is_sponsored=True))
+        return products
+
+    def order(self, products):
+        if self.spec.ordering == RELEVANCE:
+            return products.order_by('-search_rank', '-quantity_sold', '-id')
+        # same (field, id) order as the keyset paginator, served by the catalog indexes
+        return KeysetPagination(self.spec.ordering).order(products)
+
+    def queryset(self):
+        return self.order(self.filter_facets(self.base_queryset()))
+
+    # ---- aggregates ----
+
+    def facet_engine(self):
+        spec = self.spec
+        return FacetEngine(
+            self.base_queryset(), brands=spec.brands, colors=spec.colors, sizes=spec.sizes,
+            min_price=spec.min_price, max_price=spec.max_price, min_stars=spec.min_stars,
+        )
+
+    def attribute_facets(self):
+        """Specification facets of the filtered set, counted on the attribute index.
+
+        One grouped query for the unselected keys plus one per selected key,
+        counted without its own selection so its other values keep their
+        counts (same semantics as ``FacetEngine``). Empty for free-text
+        searches: the search join cannot run inside the facet subqueries,
+        same as the category pages which ignore ?q=.
+        """
+        spec = self.spec
+        if spec.q:
+            return []
+        selected = [key for key, _ in spec.attributes]
+        filtered = self.filter_facets(self.base_queryset()).order_by().values('id')
+        counts = attribute_counts(filtered, exclude_keys=selected)
+        for key in selected:
+            others = self.filter_facets(self.base_queryset(skip_attribute=key)).order_by().values('id')
+            counts.update(attribute_counts(others, keys=[key]))
+        return build_attribute_facets(counts, spec.attributes)
+
+    def summary(self):
+        """Price range of the filtered set in one query"""
+        return self.filter_facets(self.base_queryset()).order_by().aggregate(
+            min_price=Min('price'), max_price=Max('price')
+        )
+
+    def price_range(self):
+        """Slider bounds and price histogram of the filtered set.
+
+        Unfiltered and category-only requests read the stored per-category
+        summaries instead of scanning products; anything else is one aggregate.
+        """
+        spec = self.spec
+        if spec.category_only:
+            return combined_price_summary(spec.category_ids, spec.category)
+        row = self.filter_facets(self.base_queryset()).order_by().aggregate(**price_aggregates())
+        return {
+            'min_price': row['min_price'],
+            'max_price': row['max_price'],
+            'price_histogram': histogram_buckets(histogram_from_row(row)),
+        }
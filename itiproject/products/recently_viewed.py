@@ -0,0 +1,220 @@
+# products/recently_viewed.py
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.core.signals import request_started, request_finished
+from django.db.models import Q
+from django.dispatch import receiver
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from .models import Product, RecentlyViewedProduct
+
+logger = logging.getLogger(__name__)
+
+# Products kept per user
+MAX_RECENTLY_VIEWED = 20
+# Per-user sorted set of product ids scored by view time, and the users with unflushed views
+HISTORY_KEY = 'recently_viewed:{}'
+DIRTY_KEY = 'recently_viewed:dirty'
+# Idle histories expire from Redis; the database copy outlives them
+HISTORY_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def _redis():
+    """Raw Redis client of the default cache, None when the cache is not Redis"""
+    try:
+        return get_redis_connection('default')
+    except NotImplementedError:
+        return None
+
+
+# ==================== DATABASE ====================
+
+def record_view(user_id, product_id):
+    """Move a product to the top of the user's recently viewed list and trim it (database only)"""
+    viewed = RecentlyViewedProduct.objects.filter(user_id=user_id, product_id=product_id)
+    if not viewed.update(viewed_at=timezone.now()):
+        RecentlyViewedProduct.objects.get_or_create(user_id=user_id, product_id=product_id)
+
+    history = RecentlyViewedProduct.objects.filter(user_id=user_id)
+    oldest_kept = history.order_by('-viewed_at', '-id').values_list('viewed_at', 'id')[MAX_RECENTLY_VIEWED - 1:MAX_RECENTLY_VIEWED]
+    for viewed_at, pk in oldest_kept:
+        history.filter(viewed_at__lte=viewed_at).exclude(viewed_at=viewed_at, id__gte=pk).delete()
+
+
+# ==================== WRITE-BEHIND TRACKING ====================
+
+def track_view(user_id, product_id):
+    """Record a view in the user's capped Redis sorted set and mark the user dirty.
+
+    ``flush_recently_viewed`` copies dirty histories to RecentlyViewedProduct
+    in batches. Without Redis the view is written to the database directly.
+    """
+    client = _redis()
+    if client is not None:
+        key = HISTORY_KEY.format(user_id)
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.zadd(key, {str(product_id): time.time()})
+            pipe.zremrangebyrank(key, 0, -MAX_RECENTLY_VIEWED - 1)
+            pipe.expire(key, HISTORY_TIMEOUT)
+            pipe.sadd(DIRTY_KEY, user_id)
+            pipe.execute()
+            return
+        except RedisError:
+            logger.warning('Redis unavailable, recording view of product %s in the database', product_id)
+    record_view(user_id, product_id)
+
+
+# views of the current request, recorded when its response has been sent
+_pending = threading.local()
+
+
+def track_after_response(response, user, product_id):
+    """Record the view once the response has been sent.
+
+    Django sends ``request_finished`` when the server closes the response
+    after writing it, so tracking never delays the product page (and does
+    not depend on whether the page itself was served or answered with a 304).
+    """
+    if user.is_authenticated:
+        if not hasattr(_pending, 'views'):
+            _pending.views = []
+        _pending.views.append((user.pk, product_id))
+    return response
+
+
+@receiver(request_started)
+def _reset_pending_views(sender, **kwargs):
+    _pending.views = []
+
+
+@receiver(request_finished)
+def _track_pending_views(sender, **kwargs):
+    views, _pending.views = getattr(_pending, 'views', []), []
+    for user_id, product_id in views:
+        try:
+            track_view(user_id, product_id)
+        except Exception:
+            logger.exception('Could not record view of product %s', product_id)
+
+
+# ==================== READING ====================
+
+def recently_viewed_ids(user_id, limit):
+    """Product ids the user viewed, most recent first.
+
+    Read from the sorted set; a missing set (expired, or Redis was flushed) is
+    warmed from the database, and without Redis the database answers.
+    """
+    client = _redis()
+    if client is not None:
+        key = HISTORY_KEY.format(user_id)
+        try:
+            members = client.zrevrange(key, 0, limit - 1)
+            if members or client.exists(key):
+                return [Product._meta.pk.to_python(member.decode()) for member in members]
+            rows = list(_database_history(user_id))
+            if rows:
+                pipe = client.pipeline(transaction=False)
+                pipe.zadd(key, {str(product_id): viewed_at.timestamp() for product_id, viewed_at in rows})
+                pipe.expire(key, HISTORY_TIMEOUT)
+                pipe.execute()
+            return [product_id for product_id, _ in rows[:limit]]
+        except RedisError:
+            logger.warning('Redis unavailable, reading recently viewed products from the database')
+    return [product_id for product_id, _ in _database_history(user_id)[:limit]]
+
+
+def _database_history(user_id):
+    return RecentlyViewedProduct.objects.filter(user_id=user_id).order_by('-viewed_at').values_list(
+        'product_id', 'viewed_at'
+    )[:MAX_RECENTLY_VIEWED]
+
+
+# ==================== FLUSHING ====================
+
+def flush_dirty_histories(batch_size=500):
+    """Copy the histories of users with unflushed views into the database.
+
+    Per batch: the current rows, one bulk insert of new views, one bulk update
+    of view times and one trim. Returns the number of users flushed.
+    """
+    client = _redis()
+    if client is None:
+        return 0
+    flushed = 0
+    while True:
+        user_ids = [int(member) for member in client.spop(DIRTY_KEY, batch_size) or []]
+        if not user_ids:
+            return flushed
+        try:
+            histories = _read_histories(client, user_ids)
+            _write_histories(histories)
+        except Exception:
+            # keep them dirty for the next run
+            client.sadd(DIRTY_KEY, *user_ids)
+            raise
+        flushed += len(user_ids)
+
+
+def _read_histories(client, user_ids):
+    pipe = client.pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.zrange(HISTORY_KEY.format(user_id), 0, -1, withscores=True)
+    histories = {}
+    for user_id, members in zip(user_ids, pipe.execute()):
+        histories[user_id] = {
+            Product._meta.pk.to_python(member.decode()): datetime.fromtimestamp(score, tz=dt_timezone.utc)
+            for member, score in members
+        }
+    return histories
+
+
+def _write_histories(histories):
+    product_ids = {product_id for history in histories.values() for product_id in history}
+    # views of products or users deleted since are dropped
+    existing_products = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+    User = RecentlyViewedProduct._meta.get_field('user').related_model
+    existing_users = set(User.objects.filter(id__in=histories).values_list('id', flat=True))
+    histories = {
+        user_id: {pk: viewed_at for pk, viewed_at in history.items() if pk in existing_products}
+        for user_id, history in histories.items() if user_id in existing_users
+    }
+
+    rows = {
+        (row.user_id, row.product_id): row
+        for row in RecentlyViewedProduct.objects.filter(user_id__in=histories, product_id__in=existing_products)
+    }
+    missing = [
+        RecentlyViewedProduct(user_id=user_id, product_id=product_id)
+        for user_id, history in histories.items() for product_id in history
+        if (user_id, product_id) not in rows
+    ]
+    if missing:
+        RecentlyViewedProduct.objects.bulk_create(missing, ignore_conflicts=True)
+        # auto_now stamps new rows with the flush time; re-read them to set the real view time
+        rows.update({
+            (row.user_id, row.product_id): row
+            for row in RecentlyViewedProduct.objects.filter(
+                user_id__in=histories, product_id__in={row.product_id for row in missing}
+            )
+        })
+
+    changed = []
+    for (user_id, product_id), row in rows.items():
+        viewed_at = histories[user_id].get(product_id)
+        if viewed_at is not None and row.viewed_at != viewed_at:
+            row.viewed_at = viewed_at
+            changed.append(row)
+    RecentlyViewedProduct.objects.bulk_update(changed, ['viewed_at'], batch_size=500)
+
+    # full histories replace the database copy, shorter ones only add to it
+    stale = Q()
+    for user_id, history in histories.items():
+        if len(history) >= MAX_RECENTLY_VIEWED:
+            stale |= Q(user_id=user_id) & ~Q(product_id__in=list(history))
+    if stale:
+        RecentlyViewedProduct.objects.filter(stale).delete()
@@ -0,0 +1,73 @@
+# products/reference.py
+import hashlib
+import json
+import threading
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from .cache import get_version
+from .models import Category, Brand, Color, Size
+
+# Bumped by color, size, category and brand writes and by product writes that
+# change a category or brand product count (see signals.py)
+REFERENCE_VERSION = 'reference_data'
+
+
+def _image_url(name):
+    return default_storage.url(name) if name else None
+
+
+def build_reference_data():
+    """Colors, sizes, categories and brands for the vendor dashboard in four queries.
+
+    Same shape as the serializers it replaces: every category (not only the
+    roots) with its nested children, brands with their stored product counts.
+    """
+    colors = list(Color.objects.order_by('id').values('id', 'name'))
+    sizes = list(Size.objects.order_by('id').values('id', 'name'))
+
+    rows = Category.objects.order_by('id').values(
+        'id', 'name', 'slug', 'image', 'product_count', 'description', 'parent_id'
+    )
+    nodes, parents = {}, {}
+    for row in rows:
+        parents[row['id']] = row.pop('parent_id')
+        row['image'] = _image_url(row['image'])
+        row['children'] = []
+        nodes[row['id']] = row
+    for category_id, parent_id in parents.items():
+        if parent_id in nodes:
+            nodes[parent_id]['children'].append(nodes[category_id])
+
+    brands = [
+        dict(brand, image=_image_url(brand['image']))
+        for brand in Brand.objects.values('id', 'name', 'slug', 'image', 'product_count')
+    ]
+    return {'colors': colors, 'sizes': sizes, 'categories': list(nodes.values()), 'brands': brands}
+
+
+class ReferenceData:
+    """In-process copy of the reference bundle and its content-hash ETag.
+
+    Each request costs one shared-cache read of the version counter; the
+    bundle is rebuilt only after a write moved it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._bundle = None
+
+    def get(self):
+        """(data, etag) of the current bundle"""
+        version = get_version(REFERENCE_VERSION)
+        bundle = self._bundle
+        if bundle is None or self._version != version:
+            data = build_reference_data()
+            body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()
+            bundle = (data, '"{}"'.format(hashlib.sha1(body).hexdigest()))
+            with self._lock:
+                self._bundle, self._version = bundle, version
+        return bundle
+
+
+reference_data = ReferenceData()
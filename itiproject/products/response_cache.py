@@ -0,0 +1,143 @@
+# products/response_cache.py
+import hashlib
+from .cache import get_versions, get_tagged, set_tagged, invalidate_tags
+from .flash_sales import flash_sale_index
+from .models import Brand, CategoryClosure, Product
+
+# Entries are invalidated by tag, the TTL only bounds memory use
+LISTING_TIMEOUT = 60 * 60 * 24
+LISTING_KEY = 'listing:{}:{}:{}'
+
+# Every product write bumps PRODUCTS_TAG; listings without a narrower scope depend on it
+PRODUCTS_TAG = 'products'
+# Category, brand, color and size names/images are rendered into listings and facets
+TAXONOMY_TAG = 'taxonomy'
+# Bumped by any flash sale or flash sale item write
+FLASH_SALES_TAG = 'flash_sales'
+
+
+def product_tag(pk):
+    return f'product:{pk}'
+
+
+def category_tag(slug):
+    return f'category:{slug}'
+
+
+def brand_tag(slug):
+    return f'brand:{slug}'
+
+
+def vendor_tag(pk):
+    return f'vendor:{pk}'
+
+
+def listing_tags(spec, category_slug=None):
+    """Tags a listing depends on: its narrowest scope plus the taxonomy.
+
+    A product can only enter or leave a scoped listing through a write that
+    bumps that scope's tag (see ``product_tags``), so the narrowest scope is
+    enough for correctness.
+    """
+    tags = [TAXONOMY_TAG]
+    if spec.seller_id is not None:
+        tags.append(vendor_tag(spec.seller_id))
+    elif category_slug is not None:
+        tags.append(category_tag(category_slug))
+    elif spec.brands:
+        tags.extend(brand_tag(slug) for slug in spec.brands)
+    else:
+        tags.append(PRODUCTS_TAG)
+    return tags
+
+
+def product_tags(rows):
+    """Tags to bump for products given as (id, category_id, brand_id, seller_id) rows.
+
+    Pass both the old and the new row of a moved product so listings it left
+    are invalidated as well as the ones it joined.
+    """
+    tags = {PRODUCTS_TAG}
+    category_ids, brand_ids = set(), set()
+    for pk, category_id, brand_id, seller_id in rows:
+        tags.add(product_tag(pk))
+        if seller_id is not None:
+            tags.add(vendor_tag(seller_id))
+        if category_id is not None:
+            category_ids.add(category_id)
+        if brand_id is not None:
+            brand_ids.add(brand_id)
+    if category_ids:
+        # category pages list their whole subtree
+        ancestors = CategoryClosure.objects.filter(descendant_id__in=category_ids).values_list(
+            'ancestor__slug', flat=True
+        )
+        tags.update(category_tag(slug) for slug in ancestors)
+    if brand_ids:
+        tags.update(brand_tag(slug) for slug in Brand.objects.filter(id__in=brand_ids).values_list('slug', flat=True))
+    return tags
+
+
+def invalidate_products(rows):
+    invalidate_tags(*product_tags(rows))
+
+
+def invalidate_product_ids(product_ids):
+    product_ids = list(product_ids)
+    if product_ids:
+        invalidate_products(
+            Product.objects.filter(id__in=product_ids).values_list('id', 'category_id', 'brand_id', 'seller_id')
+        )
+
+
+def product_validators(product):
+    """(ETag, Last-Modified) of a product page.
+
+    ``updated_at`` moves with every product save, including rating updates,
+    image and variant changes; the tag versions cover what it cannot see
+    (renamed category/brand, flash sale edits, bulk updates) and the product's
+    flash-sale entry covers sale windows opening or closing.
+
+    Last-Modified only comes from persisted moments, so every process agrees
+    on it: the product's ``updated_at`` (stamped by the sale scheduler when a
+    flash sale of the product starts or ends) and the ``modified_at`` of its
+    running flash-sale entry.
+    """
+    versions = get_versions([product_tag(product.pk), TAXONOMY_TAG, FLASH_SALES_TAG])
+    # a flash sale starting or ending changes the page without any write
+    flash_sale = flash_sale_index.get(product.pk)
+    raw = '{}:{}:{}:{}'.format(product.pk, product.updated_at.isoformat(), ':'.join(
+        str(versions[tag]) for tag in sorted(versions)
+    ), flash_sale)
+    last_modified = max(product.updated_at, flash_sale.modified_at) if flash_sale else product.updated_at
+    return '"{}"'.format(hashlib.sha1(raw.encode()).hexdigest()), last_modified
+
+
+def listing_key(name, spec, request, *params):
+    """Cache key of one page of a listing.
+
+    Built from the normalized spec rather than the raw query string, so
+    equivalent requests share an entry. ``params`` are the request parameters
+    that shape the page but are not part of the spec (page, cursor, ...).
+    """
+    # pages embed flash-sale prices: a sale starting or ending moves every listing to new keys
+    extra = '|'.join([request.get_host(), request.scheme, flash_sale_index.generation()] +
+                     [request.GET.get(param, '') for param in params])
+    return LISTING_KEY.format(name, spec.cache_key, hashlib.sha1(extra.encode()).hexdigest())
+
+
+def cached_listing(key, tags, build, items='products'):
+    """Response data of a listing from the tag cache, built with ``build()`` on a miss.
+
+    Returns (data, hit). The stored entry also depends on the product tags of
+    the rows it contains.
+    """
+    data = get_tagged(key)
+    if data is not None:
+        return data, True
+    # read before building: a write during the build makes the entry stale at once
+    versions = get_versions(tags)
+    data = build()
+    versions.update(get_versions([product_tag(product['id']) for product in data.get(items) or []]))
+    set_tagged(key, data, versions, LISTING_TIMEOUT)
+    return data, False
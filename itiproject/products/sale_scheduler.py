@@ -0,0 +1,107 @@
+# products/sale_scheduler.py
+import heapq
+from datetime import timedelta
+from django.db.models import Q
+from django.utils import timezone
+from .flash_sales import flash_sale_index, release_expired_reservations
+from .models import Product, FlashSale, FlashSaleItem
+from .response_cache import invalidate_product_ids
+
+
+def _window_q(fields, start, end):
+    """Q matching rows where any of ``fields`` falls in (start, end]"""
+    q = Q()
+    for field in fields:
+        q |= Q(**{f'{field}__gt': start, f'{field}__lte': end})
+    return q
+
+
+def upcoming_boundaries(start, end):
+    """Distinct sale and flash-sale window boundaries in (start, end]"""
+    boundaries = set()
+    for field in ('sale_start_date', 'sale_end_date'):
+        boundaries.update(
+            Product.objects.filter(_window_q([field], start, end)).order_by()
+            .values_list(field, flat=True).distinct()
+        )
+    for field in ('start_time', 'end_time'):
+        boundaries.update(
+            FlashSale.objects.filter(_window_q([field], start, end), is_active=True).order_by()
+            .values_list(field, flat=True).distinct()
+        )
+    return boundaries
+
+
+def apply_boundaries(start, end):
+    """Act on every sale window that opened or closed in (start, end].
+
+    Products whose own window moved get their stored prices recomputed;
+    products of flash sales that started or ended have their cache tags
+    purged, their ``updated_at`` stamped (the Last-Modified of their pages
+    must move although no row of theirs was edited) and the reservations of
+    ended sales are released. Only the affected products are invalidated.
+    Returns (repriced, flash_product_ids).
+    """
+    repriced = Product.refresh_stale_pricing(
+        at=end, queryset=Product.objects.filter(_window_q(['sale_start_date', 'sale_end_date'], start, end))
+    )
+    flash_product_ids = set(
+        FlashSaleItem.objects.filter(
+            _window_q(['flash_sale__start_time', 'flash_sale__end_time'], start, end)
+        ).values_list('product_id', flat=True)
+    )
+    if flash_product_ids:
+        # web processes reload their own index at the boundary; this one is reloaded for the sweep below
+        flash_sale_index.invalidate()
+        Product.objects.filter(pk__in=flash_product_ids).update(updated_at=end)
+        release_expired_reservations(at=end)
+    # bulk_update sends no signals, drop the cached pages showing the old prices
+    invalidate_product_ids({product.pk for product in repriced} | flash_product_ids)
+    return repriced, flash_product_ids
+
+
+class SaleScheduler:
+    """Min-heap of upcoming sale boundaries, processed as they come due.
+
+    Boundaries up to ``horizon`` ahead are loaded from the database and
+    reloaded every ``reload_interval`` so sales created or edited in the
+    meantime are picked up, including boundaries that passed between two
+    reloads. Due boundaries are processed as one window
+    from the last processed moment, so a late wake-up never skips one.
+    """
+
+    def __init__(self, horizon=timedelta(hours=1), reload_interval=timedelta(minutes=1), now=None):
+        self.horizon, self.reload_interval = horizon, reload_interval
+        self.processed_until = now or timezone.now()
+        self._heap, self._queued = [], set()
+        self._reload_at = None
+
+    def load(self, now):
+        # from the last processed moment: a sale created or edited since the previous
+        # reload may have a boundary that already passed, it still has to fire
+        for boundary in upcoming_boundaries(min(self.processed_until, now), now + self.horizon):
+            if boundary not in self._queued:
+                self._queued.add(boundary)
+                heapq.heappush(self._heap, boundary)
+        self._reload_at = now + self.reload_interval
+
+    def next_wakeup(self):
+        """When ``tick`` has work next: the earliest queued boundary or the next reload"""
+        if self._heap:
+            return min(self._heap[0], self._reload_at)
+        return self._reload_at
+
+    def tick(self, now=None):
+        """Process the boundaries due at ``now``; returns what ``apply_boundaries`` did, or None"""
+        now = now or timezone.now()
+        if self._reload_at is None or now >= self._reload_at:
+            self.load(now)
+        due = False
+        while self._heap and self._heap[0] <= now:
+            self._queued.discard(heapq.heappop(self._heap))
+            due = True
+        if not due:
+            return None
+        result = apply_boundaries(self.processed_until, now)
+        self.processed_until = now
+        return result
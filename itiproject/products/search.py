@@ -0,0 +1,189 @@
+# products/search.py
+import re
+from django.db import connection
+from django.db.models import Q, Value, FloatField
+from .models import Product
+
+# Raw tables created by migration 0005_product_search_index (not Django models)
+SQLITE_FTS_TABLE = 'products_product_fts'
+SQLITE_DOC_TABLE = 'products_product_search'
+POSTGRES_VECTOR_COLUMN = 'search_vector'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _no_results(queryset):
+    # keep the search_rank column so callers can always order by it
+    return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())).none()
+
+
+class IContainsSearchBackend:
+    """Fallback for databases without a full-text index: the original icontains scan"""
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(brand__name__icontains=query) |
+            Q(category__name__icontains=query)
+        ).annotate(search_rank=Value(0.0, output_field=FloatField())).distinct()
+
+    def index_products(self, product_ids):
+        pass
+
+    def remove_products(self, product_ids):
+        pass
+
+    def rebuild(self):
+        return 0
+
+
+class SQLiteFTSSearchBackend:
+    """SQLite FTS5 index, ranked with bm25 (name weighs most, then brand/category)
+
+    ``products_product_search`` maps each product to a stable integer rowid so a
+    single product can be re-indexed without scanning the FTS table.
+    """
+    weights = (10.0, 1.0, 4.0, 4.0)  # name, description, brand, category
+
+    def match_expression(self, query):
+        # Quote every token so user input cannot inject FTS5 syntax; prefix-match each one
+        tokens = TOKEN_RE.findall(query)
+        return ' '.join('"{}"*'.format(token) for token in tokens)
+
+    def search(self, queryset, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return _no_results(queryset)
+        product_table = Product._meta.db_table
+        return queryset.extra(
+            select={'search_rank': '-bm25({}, {})'.format(SQLITE_FTS_TABLE, ', '.join(map(str, self.weights)))},
+            tables=[SQLITE_FTS_TABLE, SQLITE_DOC_TABLE],
+            where=[
+                '{} MATCH %s'.format(SQLITE_FTS_TABLE),
+                '{doc}.rowid = {fts}.rowid'.format(doc=SQLITE_DOC_TABLE, fts=SQLITE_FTS_TABLE),
+                '{doc}.product_id = {product}.id'.format(doc=SQLITE_DOC_TABLE, product=product_table),
+            ],
+            params=[expression],
+        )
+
+    def _documents(self, product_ids):
+        return Product.objects.filter(id__in=product_ids).values_list(
+            'id', 'name', 'description', 'brand__name', 'category__name'
+        )
+
+    def _db_id(self, product_id):
+        return Product._meta.pk.get_db_prep_value(product_id, connection)
+
+    def index_products(self, product_ids):
+        documents = list(self._documents(product_ids))
+        if not documents:
+            return
+        with connection.cursor() as cursor:
+            for product_id, name, description, brand, category in documents:
+                db_id = self._db_id(product_id)
+                cursor.execute(
+                    'INSERT OR IGNORE INTO {} (product_id) VALUES (%s)'.format(SQLITE_DOC_TABLE), [db_id]
+                )
+                cursor.execute('SELECT rowid FROM {} WHERE product_id = %s'.format(SQLITE_DOC_TABLE), [db_id])
+                rowid = cursor.fetchone()[0]
+                cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(SQLITE_FTS_TABLE), [rowid])
+                cursor.execute(
+                    'INSERT INTO {} (rowid, name, description, brand, category) '
+                    'VALUES (%s, %s, %s, %s, %s)'.format(SQLITE_FTS_TABLE),
+                    [rowid, name, description, brand or '', category or '']
+                )
+
+    def remove_products(self, product_ids):
+        db_ids = [self._db_id(product_id) for product_id in product_ids]
+        if not db_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(db_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM {fts} WHERE rowid IN (SELECT rowid FROM {doc} WHERE product_id IN ({ids}))'.format(
+                    fts=SQLITE_FTS_TABLE, doc=SQLITE_DOC_TABLE, ids=placeholders
+                ), db_ids
+            )
+            cursor.execute(
+                'DELETE FROM {} WHERE product_id IN ({})'.format(SQLITE_DOC_TABLE, placeholders), db_ids
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {}'.format(SQLITE_FTS_TABLE))
+            cursor.execute('DELETE FROM {}'.format(SQLITE_DOC_TABLE))
+        product_ids = list(Product.objects.values_list('id', flat=True))
+        for start in range(0, len(product_ids), 500):
+            self.index_products(product_ids[start:start + 500])
+        return len(product_ids)
+
+
+class PostgresSearchBackend:
+    """tsvector column on products_product with a GIN index, ranked with ts_rank"""
+    config = 'simple'
+
+    def search(self, queryset, query):
+        if not TOKEN_RE.search(query):
+            return _no_results(queryset)
+        vector = '{}.{}'.format(Product._meta.db_table, POSTGRES_VECTOR_COLUMN)
+        tsquery = "websearch_to_tsquery('{}', %s)".format(self.config)
+        return queryset.extra(
+            select={'search_rank': 'ts_rank({}, {})'.format(vector, tsquery)},
+            select_params=[query],
+            where=['{} @@ {}'.format(vector, tsquery)],
+            params=[query],
+        )
+
+    def index_products(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE {product} p SET {column} =
+                    setweight(to_tsvector(%s, coalesce(p.name, '')), 'A') ||
+                    setweight(to_tsvector(%s, coalesce(
+                        (SELECT b.name FROM {brand} b WHERE b.id = p.brand_id), '')), 'B') ||
+                    setweight(to_tsvector(%s, coalesce(
+                        (SELECT c.name FROM {category} c WHERE c.id = p.category_id), '')), 'B') ||
+                    setweight(to_tsvector(%s, coalesce(p.description, '')), 'C')
+                WHERE p.id = ANY(%s)
+                """.format(
+                    product=Product._meta.db_table,
+                    column=POSTGRES_VECTOR_COLUMN,
+                    brand=Product.brand.field.related_model._meta.db_table,
+                    category=Product.category.field.related_model._meta.db_table,
+                ),
+                [self.config] * 4 + [product_ids]
+            )
+
+    def remove_products(self, product_ids):
+        # The vector lives on the product row and goes away with it
+        pass
+
+    def rebuild(self):
+        product_ids = list(Product.objects.values_list('id', flat=True))
+        for start in range(0, len(product_ids), 1000):
+            self.index_products(product_ids[start:start + 1000])
+        return len(product_ids)
+
+
+def get_search_backend():
+    """Pick the search backend for the default database"""
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    if connection.vendor == 'sqlite' and _has_table(SQLITE_FTS_TABLE):
+        return SQLiteFTSSearchBackend()
+    return IContainsSearchBackend()
+
+
+_table_cache = {}
+
+
+def _has_table(name):
+    if name not in _table_cache:
+        with connection.cursor() as cursor:
+            _table_cache[name] = name in connection.introspection.table_names(cursor)
+    return _table_cache[name]
@@ -1,16 +1,24 @@
 # products/serializers.py
+import hashlib
+from decimal import Decimal
 from rest_framework import serializers
+from django.core.cache import cache
+from django.db.models import Manager, prefetch_related_objects
 from django.utils.text import slugify
+from .cache import get_versions
+from .flash_sales import flash_sale_index, flash_sale_pricing
+from .response_cache import TAXONOMY_TAG, product_tag
 from .models import (
     Category, Brand, Product, ProductImage, Size, Color,
-    FlashSale, FlashSaleItem, RecentlyViewedProduct
+    FlashSale, FlashSaleItem, FlashSaleReservation, RecentlyViewedProduct
 )
 # ==================== CATEGORY SERIALIZERS ====================
 
 class CategoryListSerializer(serializers.ModelSerializer):
     """Serializer for listing categories"""
     children = serializers.SerializerMethodField()
-    product_count = serializers.SerializerMethodField()
+    # stored rollup, includes products of all descendant categories
+    product_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Category
@@ -21,20 +29,6 @@ class CategoryListSerializer(serializers.ModelSerializer):
         children = obj.children.all()
         # Recursively serialize children
         return CategoryListSerializer(children, many=True).data
-    
-    def get_product_count(self, obj):
-        # Get all descendant categories (including the current category)
-        def get_descendant_categories(category):
-            descendants = [category]
-            for child in category.children.all():
-                descendants.extend(get_descendant_categories(child))
-            return descendants
-        
-        # Get all categories in the hierarchy
-        all_categories = get_descendant_categories(obj)
-        
-        # Count products across all categories
-        return Product.objects.filter(category__in=all_categories).count()
 
 
 class CategoryDetailSerializer(serializers.ModelSerializer):
@@ -42,7 +36,7 @@ class CategoryDetailSerializer(serializers.ModelSerializer):
     parent_name = serializers.CharField(source='parent.name', read_only=True)
     parent_slug = serializers.CharField(source='parent.slug', read_only=True)
     children = CategoryListSerializer(many=True, read_only=True, source='children.all')
-    product_count = serializers.SerializerMethodField()
+    product_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Category
@@ -51,20 +45,6 @@ class CategoryDetailSerializer(serializers.ModelSerializer):
             'image', 'is_active', 'created_at', 'updated_at', 
             'description', 'children', 'product_count'
         ]
-    
-    def get_product_count(self, obj):
-        # Get all descendant categories (including the current category)
-        def get_descendant_categories(category):
-            descendants = [category]
-            for child in category.children.all():
-                descendants.extend(get_descendant_categories(child))
-            return descendants
-        
-        # Get all categories in the hierarchy
-        all_categories = get_descendant_categories(obj)
-        
-        # Count products across all categories
-        return Product.objects.filter(category__in=all_categories).count()
 
 
 class CategoryCreateUpdateSerializer(serializers.ModelSerializer):
@@ -112,19 +92,16 @@ class CategoryCreateUpdateSerializer(serializers.ModelSerializer):
 
 class BrandListSerializer(serializers.ModelSerializer):
     """Serializer for listing brands"""
-    product_count = serializers.SerializerMethodField()
+    product_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Brand
         fields = ['id', 'name', 'slug', 'image', 'product_count']
-    
-    def get_product_count(self, obj):
-        return obj.products.count()
 
 
 class BrandDetailSerializer(serializers.ModelSerializer):
     """Serializer for detailed brand view"""
-    product_count = serializers.SerializerMethodField()
+    product_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Brand
@@ -132,9 +109,6 @@ class BrandDetailSerializer(serializers.ModelSerializer):
             'id', 'name', 'slug', 'image',
             'created_at', 'updated_at', 'product_count'
         ]
-    
-    def get_product_count(self, obj):
-        return obj.products.count()
 
 
 class BrandCreateUpdateSerializer(serializers.ModelSerializer):
@@ -178,12 +152,171 @@ class ColorSerializer(serializers.ModelSerializer):
         model = Color
         fields = ['id', 'name']
 
-class ProductListSerializer(serializers.ModelSerializer):
+# Bump whenever ProductListSerializer output changes so old fragments are never served
+PRODUCT_FRAGMENT_SCHEMA = 3
+PRODUCT_FRAGMENT_KEY = 'product_fragment:{}:{}:{}:{}:{}:{}:{}'
+PRODUCT_FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+
+class SparseFieldsMixin:
+    """Keeps only the fields selected with ``fields=`` / dropped with ``exclude=``"""
+
+    def __init__(self, *args, fields=None, exclude=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in exclude or ():
+            self.fields.pop(name, None)
+
+
+ends_at_field = serializers.DateTimeField(read_only=True)
+
+
+class FlashSalePricingMixin:
+    """Overlays the running flash sale of a product from the in-process index.
+
+    ``base_representation`` is the output with stored prices (what fragments
+    cache); the overlay is a dict lookup per product, so flash prices never
+    need a join against FlashSaleItem.
+    """
+    def base_representation(self, instance):
+        return super().to_representation(instance)
+
+    def to_representation(self, instance):
+        return self.apply_flash_sale(self.base_representation(instance), instance)
+
+    def apply_flash_sale(self, data, instance):
+        entry = flash_sale_index.get(instance.pk)
+        if entry is None:
+            return data
+        effective_price, discount = flash_sale_pricing(instance, entry)
+        if effective_price >= Decimal(instance.effective_price):
+            # the regular sale price is at least as good
+            return data
+        if 'effective_price' in data:
+            data['effective_price'] = self.fields['effective_price'].to_representation(effective_price)
+        if 'discount_percentage' in data:
+            data['discount_percentage'] = round(discount, 0)
+        if 'flash_sale' in data:
+            data['flash_sale'] = {
+                'slug': entry.slug,
+                'discount_percentage': round(entry.discount_percentage, 0),
+                'ends_at': ends_at_field.to_representation(entry.ends_at),
+            }
+        return data
+
+    def get_flash_sale(self, obj):
+        # filled in by apply_flash_sale
+        return None
+
+
+class ProductFieldset:
+    """``?fields=`` / ``?exclude=`` of a product endpoint.
+
+    Besides pruning the serializer output it prunes the queryset: joins,
+    prefetches and large columns that only feed dropped fields are skipped.
+    """
+    # serializer field -> select_related / prefetch_related lookup it needs
+    joins = {'category_name': 'category', 'category_slug': 'category', 'brand_name': 'brand'}
+    prefetches = {'product_images': 'images', 'sizes': 'sizes', 'colors': 'colors'}
+    # columns loaded only when their field is selected
+    deferrable = ('description', 'specifications')
+
+    # always rendered: clients key rows on it and cached listings tag their entries with it
+    required = frozenset({'id'})
+
+    def __init__(self, fields=None, exclude=None):
+        self.fields = frozenset(fields or ()) | self.required if fields else frozenset()
+        self.exclude = frozenset(exclude or ()) - self.required
+
+    @classmethod
+    def from_request(cls, request):
+        def names(param):
+            return [name.strip() for name in request.GET.get(param, '').split(',') if name.strip()]
+        return cls(names('fields'), names('exclude'))
+
+    def selected(self):
+        names = [name for name in ProductListSerializer.Meta.fields if not self.fields or name in self.fields]
+        return [name for name in names if name not in self.exclude]
+
+    def serializer_kwargs(self):
+        kwargs = {}
+        if self.fields:
+            kwargs['fields'] = self.fields
+        if self.exclude:
+            kwargs['exclude'] = self.exclude
+        return kwargs
+
+    def prefetch_lookups(self, selected):
+        return [lookup for name, lookup in self.prefetches.items() if name in selected]
+
+    def optimize(self, queryset):
+        """Drop the joins and columns of unselected fields (prefetching is left to the serializer)"""
+        if not self.fields and not self.exclude:
+            return queryset
+        selected = self.selected()
+        joins = sorted({lookup for name, lookup in self.joins.items() if name in selected})
+        queryset = queryset.select_related(None)
+        if joins:
+            queryset = queryset.select_related(*joins)
+        deferred = [name for name in self.deferrable if name not in selected]
+        return queryset.defer(*deferred) if deferred else queryset
+
+
+class ProductFragmentListSerializer(serializers.ListSerializer):
+    """Assembles product lists from per-product cached fragments.
+
+    A fragment is the serialized dict of one product, keyed by schema,
+    taxonomy version, id, the product's tag version (bulk ``update()`` paths
+    bump it without touching ``updated_at``), ``updated_at`` and effective
+    price (the sale window moves it without a save). One ``get_many`` reads
+    the versions and one fetches a page of fragments; only the misses are
+    prefetched and serialized.
+    """
+    @staticmethod
+    def fragment_key(product, versions, fieldset):
+        return PRODUCT_FRAGMENT_KEY.format(
+            PRODUCT_FRAGMENT_SCHEMA, fieldset, versions[TAXONOMY_TAG], product.pk, versions[product_tag(product.pk)],
+            product.updated_at.timestamp() if product.updated_at else '', product.effective_price
+        )
+
+    def fieldset_key(self):
+        """Sparse fieldsets get fragments of their own"""
+        names = list(self.child.fields)
+        if names == list(self.child.Meta.fields):
+            return 'all'
+        return hashlib.sha1(','.join(sorted(names)).encode()).hexdigest()[:12]
+
+    def to_representation(self, data):
+        products = list(data.all() if isinstance(data, Manager) else data)
+        if not products:
+            return []
+        # category and brand names are part of the fragment
+        versions = get_versions([TAXONOMY_TAG] + [product_tag(product.pk) for product in products])
+        fieldset = self.fieldset_key()
+        keys = [self.fragment_key(product, versions, fieldset) for product in products]
+        fragments = cache.get_many(keys)
+
+        misses = [(key, product) for key, product in zip(keys, products) if key not in fragments]
+        if misses:
+            lookups = ProductFieldset().prefetch_lookups(self.child.fields)
+            if lookups:
+                prefetch_related_objects([product for _, product in misses], *lookups)
+            fresh = {key: self.child.base_representation(product) for key, product in misses}
+            cache.set_many(fresh, PRODUCT_FRAGMENT_TIMEOUT)
+            fragments.update(fresh)
+        # fragments hold stored prices, running flash sales are applied per request
+        return [self.child.apply_flash_sale(dict(fragments[key]), product) for key, product in zip(keys, products)]
+
+
+class ProductListSerializer(SparseFieldsMixin, FlashSalePricingMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     category_slug = serializers.CharField(source='category.slug', read_only=True)
     brand_name = serializers.CharField(source='brand.name', read_only=True)
     product_images = serializers.SerializerMethodField()
     discount_percentage = serializers.SerializerMethodField()
+    flash_sale = serializers.SerializerMethodField()
     sizes = SizeSerializer(many=True, read_only=True)
     colors = ColorSerializer(many=True, read_only=True)
     material = serializers.CharField(read_only=True)
@@ -191,12 +324,13 @@ class ProductListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'slug', 'sku', 'price', 'sale_price', 'seller',
+            'id', 'name', 'slug', 'sku', 'price', 'sale_price', 'effective_price', 'seller',
             'category_name', 'category_slug', 'brand_name', 'product_images',
-            'rating_average', 'rating_count', 'discount_percentage',
+            'rating_average', 'rating_count', 'discount_percentage', 'flash_sale',
             'stock_quantity', 'quantity_sold', 'is_featured', 'is_sponsored', 'sizes', 'colors', 'material',
             'description', 'specifications', 'updated_at'
         ]
+        list_serializer_class = ProductFragmentListSerializer
 
     def get_product_images(self, obj):
         all_images = obj.images.all()
@@ -205,12 +339,12 @@ class ProductListSerializer(serializers.ModelSerializer):
         return None
 
     def get_discount_percentage(self, obj):
-        if obj.sale_price and obj.price > obj.sale_price:
-            discount = ((obj.price - obj.sale_price) / obj.price) * 100
-            return round(discount, 0)
+        # stored on the product, respects the sale window
+        if obj.discount_percentage:
+            return round(obj.discount_percentage, 0)
         return None
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductDetailSerializer(SparseFieldsMixin, FlashSalePricingMixin, serializers.ModelSerializer):
     category = CategoryListSerializer(read_only=True)
     brand = BrandListSerializer(read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
@@ -218,12 +352,13 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     colors = ColorSerializer(many=True, read_only=True)
     material = serializers.CharField(read_only=True)
     discount_percentage = serializers.SerializerMethodField()
+    flash_sale = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = [
             'id', 'sku', 'name', 'slug', 'category', 'brand', 'seller',
-            'description', 'specifications', 'price', 'sale_price',
+            'description', 'specifications', 'price', 'sale_price', 'effective_price', 'flash_sale',
             'sale_start_date', 'sale_end_date', 'stock_quantity',
             'track_inventory', 'allow_backorder', 'weight', 'length', 
             'width', 'height', 'is_featured', 'meta_title',
@@ -233,9 +368,9 @@ class ProductDetailSerializer(serializers.ModelSerializer):
         ]
 
     def get_discount_percentage(self, obj):
-        if obj.sale_price and obj.price > obj.sale_price:
-            discount = ((obj.price - obj.sale_price) / obj.price) * 100
-            return round(discount, 0)
+        # stored on the product, respects the sale window
+        if obj.discount_percentage:
+            return round(obj.discount_percentage, 0)
         return None
 
 class ProductCreateUpdateSerializer(serializers.ModelSerializer):
@@ -386,6 +521,16 @@ class FlashSaleItemSerializer(serializers.ModelSerializer):
         return None
 
 
+class FlashSaleReservationSerializer(serializers.ModelSerializer):
+    """Serializer for flash sale units held for a buyer"""
+    product = serializers.UUIDField(source='item.product_id', read_only=True)
+    flash_sale = serializers.IntegerField(source='item.flash_sale_id', read_only=True)
+
+    class Meta:
+        model = FlashSaleReservation
+        fields = ['id', 'product', 'flash_sale', 'quantity', 'status', 'expires_at']
+
+
 class FlashSaleListSerializer(serializers.ModelSerializer):
     """Serializer for listing flash sales"""
     item_count = serializers.SerializerMethodField()
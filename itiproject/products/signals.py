@@ -0,0 +1,305 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from .attributes import sync_product_attributes
+from .cache import bump_version, invalidate_tags
+from .catalog import CATALOG_VERSION
+from .reference import REFERENCE_VERSION
+from .price_summary import refresh_price_summaries
+from .flash_sales import flash_sale_index
+from .vendor_stats import refresh_vendor_stats
+from django.utils import timezone
+from .models import Category, Brand, Product, ProductImage, Color, Size, FlashSale, FlashSaleItem
+from .response_cache import TAXONOMY_TAG, FLASH_SALES_TAG, invalidate_products, invalidate_product_ids
+from .search import get_search_backend
+from .suggestions import suggestion_index
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_category(sender, instance, **kwargs):
+    """Keep the placement, price, stock and search document the product had before this save"""
+    previous = None
+    if not instance._state.adding:
+        previous = Product.objects.filter(pk=instance.pk).values_list(
+            'category_id', 'brand_id', 'seller_id', 'price', 'stock_quantity', 'name', 'description'
+        ).first()
+    instance._previous_placement = previous[:3] if previous else None
+    instance._previous_category_id = previous[0] if previous else None
+    instance._previous_price = previous[3] if previous else None
+    instance._previous_stock = previous[4] if previous else None
+    instance._previous_document = _search_document(*previous[5:], *previous[:2]) if previous else None
+
+
+@receiver(post_save, sender=Product)
+def update_category_counts_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous_category_id = getattr(instance, '_previous_category_id', None)
+    if created:
+        Category.adjust_product_count(instance.category_id, 1)
+        bump_version(CATALOG_VERSION)
+    elif previous_category_id != instance.category_id:
+        Category.adjust_product_count(previous_category_id, -1)
+        Category.adjust_product_count(instance.category_id, 1)
+        bump_version(CATALOG_VERSION)
+
+
+@receiver(post_delete, sender=Product)
+def update_category_counts_on_delete(sender, instance, **kwargs):
+    Category.adjust_product_count(instance.category_id, -1)
+    bump_version(CATALOG_VERSION)
+
+
+def _adjust_brand_count(instance, delta):
+    Brand.adjust_product_count(instance.brand_id, delta)
+    # keep a brand instance the caller already holds in step with the row
+    if instance.brand_id is not None and Product.brand.is_cached(instance):
+        instance.brand.product_count += delta
+
+
+@receiver(post_save, sender=Product)
+def update_brand_counts_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        _adjust_brand_count(instance, 1)
+        return
+    previous = getattr(instance, '_previous_placement', None)
+    if previous and previous[1] != instance.brand_id:
+        Brand.adjust_product_count(previous[1], -1)
+        _adjust_brand_count(instance, 1)
+
+
+@receiver(post_delete, sender=Product)
+def update_brand_counts_on_delete(sender, instance, **kwargs):
+    _adjust_brand_count(instance, -1)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree(sender, **kwargs):
+    """Any category write makes the cached menu unreachable"""
+    bump_version(CATALOG_VERSION)
+
+
+# ==================== PRICE SUMMARIES ====================
+
+@receiver(post_save, sender=Product)
+def update_price_summary_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_placement', None)
+    if created or previous is None:
+        refresh_price_summaries([instance.category_id])
+    elif previous[0] != instance.category_id or getattr(instance, '_previous_price', None) != instance.price:
+        refresh_price_summaries([previous[0], instance.category_id])
+
+
+@receiver(post_delete, sender=Product)
+def update_price_summary_on_delete(sender, instance, **kwargs):
+    refresh_price_summaries([instance.category_id])
+
+
+# ==================== VENDOR STATS ====================
+
+@receiver(post_save, sender=Product)
+def update_vendor_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_placement', None)
+    if created or previous is None:
+        refresh_vendor_stats([instance.seller_id], sales=False)
+    elif previous[2] != instance.seller_id:
+        refresh_vendor_stats([previous[2], instance.seller_id], sales=False)
+    else:
+        was_in_stock = (instance._previous_stock or 0) > 0
+        is_in_stock = int(instance.stock_quantity or 0) > 0
+        if instance._previous_price != instance.price or was_in_stock != is_in_stock:
+            refresh_vendor_stats([instance.seller_id], sales=False)
+
+
+@receiver(post_delete, sender=Product)
+def update_vendor_stats_on_delete(sender, instance, **kwargs):
+    refresh_vendor_stats([instance.seller_id], sales=False)
+
+
+# ==================== RESPONSE CACHE ====================
+
+def _placement(instance):
+    return (instance.pk, instance.category_id, instance.brand_id, instance.seller_id)
+
+
+@receiver(post_save, sender=Product)
+def invalidate_product_listings(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    rows = [_placement(instance)]
+    previous = getattr(instance, '_previous_placement', None)
+    if previous:
+        # listings the product moved out of
+        rows.append((instance.pk,) + tuple(previous))
+    invalidate_products(rows)
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_deleted_product_listings(sender, instance, **kwargs):
+    invalidate_products([_placement(instance)])
+
+
+def _product_content_changed(product_ids):
+    """Images and variants are part of the product page: move updated_at
+    (its Last-Modified) and drop the cached listings"""
+    Product.objects.filter(id__in=product_ids).update(updated_at=timezone.now())
+    invalidate_product_ids(product_ids)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_product_images(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _product_content_changed([instance.product_id])
+
+
+@receiver(m2m_changed, sender=Product.sizes.through)
+@receiver(m2m_changed, sender=Product.colors.through)
+def invalidate_product_variants(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        _product_content_changed([instance.pk])
+    elif pk_set:
+        _product_content_changed(pk_set)
+    else:
+        # clearing from the size/color side: the products are unknown here
+        invalidate_tags(TAXONOMY_TAG)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Color)
+@receiver(post_delete, sender=Color)
+@receiver(post_save, sender=Size)
+@receiver(post_delete, sender=Size)
+def invalidate_taxonomy(sender, raw=False, **kwargs):
+    """Names, slugs and images of these are rendered into every listing"""
+    if not raw:
+        invalidate_tags(TAXONOMY_TAG)
+
+
+@receiver(post_save, sender=FlashSale)
+@receiver(post_delete, sender=FlashSale)
+@receiver(post_save, sender=FlashSaleItem)
+@receiver(post_delete, sender=FlashSaleItem)
+def invalidate_flash_sales(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_tags(FLASH_SALES_TAG)
+        # other processes pick the change up within FLASH_SALE_INDEX_MAX_AGE
+        flash_sale_index.invalidate()
+
+
+# ==================== REFERENCE DATA ====================
+
+@receiver(post_save, sender=Product)
+def invalidate_reference_counts(sender, instance, created, raw=False, **kwargs):
+    """Category and brand product counts are part of the reference bundle"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_placement', None)
+    if created or (previous and tuple(previous[:2]) != (instance.category_id, instance.brand_id)):
+        bump_version(REFERENCE_VERSION)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Color)
+@receiver(post_delete, sender=Color)
+@receiver(post_save, sender=Size)
+@receiver(post_delete, sender=Size)
+def invalidate_reference_data(sender, raw=False, **kwargs):
+    if not raw:
+        bump_version(REFERENCE_VERSION)
+
+
+# ==================== SEARCH INDEX ====================
+
+# Product fields the search document is built from
+SEARCH_DOCUMENT_FIELDS = {'name', 'description', 'category', 'brand'}
+
+
+def _search_document(name, description, category_id, brand_id):
+    return name, description, category_id, brand_id
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Re-index only when the document changed: rating, stock and sales saves skip it"""
+    if raw or (update_fields is not None and not SEARCH_DOCUMENT_FIELDS & set(update_fields)):
+        return
+    previous = getattr(instance, '_previous_document', None)
+    current = _search_document(instance.name, instance.description, instance.category_id, instance.brand_id)
+    if created or previous is None or previous != current:
+        get_search_backend().index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Category)
+def reindex_products_of(sender, instance, created, raw=False, **kwargs):
+    """Brand and category names are part of the product documents"""
+    if created or raw:
+        return
+    product_ids = list(instance.products.values_list('id', flat=True))
+    get_search_backend().index_products(product_ids)
+
+
+@receiver(pre_delete, sender=Brand)
+def remember_brand_products(sender, instance, **kwargs):
+    instance._product_ids = list(instance.products.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Brand)
+def reindex_brand_products(sender, instance, **kwargs):
+    # products keep existing with brand set to NULL
+    get_search_backend().index_products(getattr(instance, '_product_ids', []))
+
+
+# ==================== ATTRIBUTE INDEX ====================
+
+@receiver(post_save, sender=Product)
+def index_product_attributes(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'specifications' not in update_fields):
+        return
+    sync_product_attributes(instance)
+
+
+# ==================== SEARCH SUGGESTIONS ====================
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Brand)
+def remember_suggestion_row(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        instance._previous_suggestion_row = suggestion_index.stored_row(instance, update_fields)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Brand)
+def update_suggestions(sender, instance, raw=False, **kwargs):
+    if not raw:
+        suggestion_index.update(instance, getattr(instance, '_previous_suggestion_row', None))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Brand)
+def remove_suggestion(sender, instance, **kwargs):
+    suggestion_index.remove(instance)
@@ -0,0 +1,214 @@
+# products/suggestions.py
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from .cache import get_version, bump_version
+from .models import Category, Brand, Product
+
+SUGGESTIONS_VERSION = 'suggestions'
+# How often a process checks the shared version for writes made by other processes
+VERSION_CHECK_INTERVAL = 30
+# Upper bound of prefix matches looked at per kind before ranking
+MAX_CANDIDATES = 500
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text):
+    """Case- and accent-insensitive form used for both keys and queries"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(text))
+
+
+class _SortedTokens:
+    """Sorted array of (token, id) pairs answering prefix queries with bisect"""
+
+    def __init__(self, pairs=()):
+        self.keys = sorted(pairs)
+
+    def add(self, token, obj_id):
+        index = bisect_left(self.keys, (token, obj_id))
+        if index == len(self.keys) or self.keys[index] != (token, obj_id):
+            self.keys.insert(index, (token, obj_id))
+
+    def remove(self, token, obj_id):
+        index = bisect_left(self.keys, (token, obj_id))
+        if index < len(self.keys) and self.keys[index] == (token, obj_id):
+            del self.keys[index]
+
+    def prefix(self, prefix, limit):
+        ids = []
+        seen = set()
+        index = bisect_left(self.keys, (prefix,))
+        while index < len(self.keys) and len(ids) < limit:
+            token, obj_id = self.keys[index]
+            if not token.startswith(prefix):
+                break
+            if obj_id not in seen:
+                seen.add(obj_id)
+                ids.append(obj_id)
+            index += 1
+        return ids
+
+
+class SuggestionIndex:
+    """In-process prefix index over product, category and brand names.
+
+    Built lazily with one query per model, patched from model signals in the
+    writing process and rebuilt in other processes once the shared
+    ``suggestions`` version moves (checked every ``VERSION_CHECK_INTERVAL``
+    seconds), so a keystroke never touches the database.
+    """
+    sources = {
+        'products': (Product, ('id', 'name', 'slug')),
+        'categories': (Category, ('id', 'name', 'slug')),
+        'brands': (Brand, ('id', 'name', 'slug', 'image')),
+    }
+    types = {'products': 'product', 'categories': 'category', 'brands': 'brand'}
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._kinds = None
+        self._version = None
+        self._checked_at = 0
+
+    # ---- building ----
+
+    def _load(self, kind):
+        model, fields = self.sources[kind]
+        entries = {}
+        pairs = []
+        for row in model.objects.values(*fields).iterator():
+            entry = self._entry(kind, row)
+            entries[row['id']] = entry
+            pairs.extend((token, row['id']) for token in entry['tokens'])
+        return {'entries': entries, 'tokens': _SortedTokens(pairs)}
+
+    def _entry(self, kind, row):
+        payload = dict(row, type=self.types[kind])
+        return {'payload': payload, 'name': normalize(row['name']), 'tokens': set(tokenize(row['name']))}
+
+    def rebuild(self):
+        version = get_version(SUGGESTIONS_VERSION)
+        kinds = {kind: self._load(kind) for kind in self.sources}
+        with self._lock:
+            self._kinds = kinds
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._kinds is None:
+            self.rebuild()
+            return
+        now = time.monotonic()
+        if now - self._checked_at < VERSION_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        if get_version(SUGGESTIONS_VERSION) != self._version:
+            self.rebuild()
+
+    # ---- incremental updates ----
+
+    def kind_for(self, model):
+        for kind, (source, _) in self.sources.items():
+            if issubclass(model, source):
+                return kind
+        return None
+
+    def indexed_row(self, instance):
+        """The fields of ``instance`` the index keeps, as ``_load`` reads them"""
+        _, fields = self.sources[self.kind_for(type(instance))]
+        row = {field: getattr(instance, field) for field in fields}
+        if 'image' in row:
+            row['image'] = row['image'].name if row['image'] else ''
+        return row
+
+    def stored_row(self, instance, update_fields=None):
+        """The indexed fields as stored before a save; None for new rows.
+
+        Saves limited to other fields skip the query and return the current
+        row, so they count as unchanged.
+        """
+        kind = self.kind_for(type(instance))
+        model, fields = self.sources[kind]
+        if update_fields is not None and not set(update_fields) & set(fields):
+            return self.indexed_row(instance)
+        if instance._state.adding:
+            return None
+        row = model.objects.filter(pk=instance.pk).values(*fields).first()
+        if row is not None and 'image' in row:
+            row['image'] = row['image'] or ''
+        return row
+
+    def update(self, instance, previous=None):
+        """Patch the entry of a saved instance and bump the shared version.
+
+        ``previous`` is ``stored_row`` from before the save: saves that leave
+        the name and slug alone (price, stock, rating, ...) do neither, so
+        other processes do not reload the index for them.
+        """
+        kind = self.kind_for(type(instance))
+        row = self.indexed_row(instance)
+        if previous is not None and previous == row:
+            return
+        with self._lock:
+            if self._kinds is not None:
+                self._remove(kind, instance.pk)
+                entry = self._entry(kind, row)
+                self._kinds[kind]['entries'][instance.pk] = entry
+                for token in entry['tokens']:
+                    self._kinds[kind]['tokens'].add(token, instance.pk)
+        self._bump()
+
+    def remove(self, instance):
+        kind = self.kind_for(type(instance))
+        with self._lock:
+            if self._kinds is not None:
+                self._remove(kind, instance.pk)
+        self._bump()
+
+    def _remove(self, kind, obj_id):
+        entry = self._kinds[kind]['entries'].pop(obj_id, None)
+        if entry:
+            for token in entry['tokens']:
+                self._kinds[kind]['tokens'].remove(token, obj_id)
+
+    def _bump(self):
+        version = bump_version(SUGGESTIONS_VERSION)
+        with self._lock:
+            # Only adopt the new version if nobody else wrote in between,
+            # otherwise the next freshness check rebuilds
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+
+    # ---- queries ----
+
+    def suggest(self, query, limit=2):
+        tokens = tokenize(query)
+        results = {kind: [] for kind in self.sources}
+        if not tokens:
+            return results
+        self._ensure_fresh()
+        normalized = normalize(query).strip()
+        with self._lock:
+            kinds = self._kinds
+            for kind, index in kinds.items():
+                entries = index['entries']
+                candidates = []
+                for obj_id in index['tokens'].prefix(tokens[0], MAX_CANDIDATES):
+                    entry = entries[obj_id]
+                    if all(any(t.startswith(q) for t in entry['tokens']) for q in tokens[1:]):
+                        candidates.append(entry)
+                # whole-name prefix matches first, then shorter names
+                candidates.sort(key=lambda e: (not e['name'].startswith(normalized), len(e['name']), e['name']))
+                results[kind] = [dict(entry['payload']) for entry in candidates[:limit]]
+        return results
+
+
+suggestion_index = SuggestionIndex()
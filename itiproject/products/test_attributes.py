@@ -0,0 +1,68 @@
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from products.attributes import normalize_value
+from products.models import Category, Product, ProductAttribute
+from products.test_categories import LOCMEM_CACHE
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ProductAttributeTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.phones = Category.objects.create(name="Phones", slug="phones")
+        self.small = self.create("P-1", {"RAM": "8 GB", "Display": "6.1 inch OLED", "5G": True})
+        self.large = self.create("P-2", {"RAM": "16 GB", "Display": "6.7 inch OLED", "5G": True})
+        self.old = self.create("P-3", {"RAM": "8 GB", "Display": "6.1 inch LCD", "5G": False})
+
+    def create(self, sku, specifications):
+        return Product.objects.create(
+            name=sku, sku=sku, category=self.phones, price=100, description="-", specifications=specifications
+        )
+
+    def pairs(self, product):
+        return set(ProductAttribute.objects.filter(product=product).values_list('key', 'value'))
+
+    def test_index_follows_saves(self):
+        self.assertEqual(self.pairs(self.small), {('ram', '8-gb'), ('display', '6.1-inch-oled'), ('5g', 'yes')})
+        self.assertEqual(normalize_value(6.10), '6.1')
+        self.small.specifications = {"RAM": ["8 GB", "12 GB"]}
+        self.small.save()
+        self.assertEqual(self.pairs(self.small), {('ram', '8-gb'), ('ram', '12-gb')})
+        # saves that leave the specifications alone do not touch the index
+        with self.assertNumQueries(0):
+            from products.signals import index_product_attributes
+            index_product_attributes(Product, self.small, update_fields={'stock_quantity'})
+
+        ProductAttribute.objects.all().delete()
+        call_command('rebuild_product_attributes', stdout=open('/dev/null', 'w'))
+        self.assertEqual(ProductAttribute.objects.count(), 8)
+
+    def facet(self, data, key):
+        facet = next(facet for facet in data['facets']['attributes'] if facet['key'] == key)
+        return {value['slug']: value['count'] for value in facet['values']}
+
+    def test_filters_and_facets(self):
+        data = self.client.get('/api/category/phones/products/', {'spec.ram': '8 GB', 'spec.5g': 'yes'}).data
+        self.assertEqual([product['sku'] for product in data['products']], ['P-1'])
+        # a selected key keeps the counts of its other values
+        self.assertEqual(self.facet(data, 'ram'), {'8-gb': 1, '16-gb': 1})
+        self.assertEqual(self.facet(data, '5g'), {'yes': 1, 'no': 1})
+        self.assertEqual(self.facet(data, 'display'), {'6.1-inch-oled': 1})
+
+        data = self.client.get('/api/products/', {'category': 'phones', 'spec.RAM': '8-gb,16-gb'}).data
+        self.assertEqual(data['products_count'], 3)
+        self.assertEqual(self.facet(data, 'display'), {'6.1-inch-oled': 1, '6.7-inch-oled': 1, '6.1-inch-lcd': 1})
+        # no catalog-wide specification facets
+        self.assertEqual(self.client.get('/api/products/').data['facets']['attributes'], [])
+
+    def test_search_skips_specification_facets(self):
+        for params in ({'q': 'P-1', 'category': 'phones'}, {'q': 'P', 'spec.ram': '8-gb'}):
+            with self.subTest(**params):
+                response = self.client.get('/api/products/', params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['facets']['attributes'], [])
+        self.assertEqual(
+            [product['sku'] for product in self.client.get('/api/products/', {'q': 'P-1', 'spec.ram': '8-gb'}).data['products']],
+            ['P-1']
+        )
@@ -0,0 +1,147 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from products.catalog import get_category_tree
+from products.models import Brand, Category, CategoryClosure, Product
+from products.serializers import BrandListSerializer
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class CategoryClosureTestCase(TestCase):
+    def setUp(self):
+        self.electronics = Category.objects.create(name="Electronics", slug="electronics")
+        self.phones = Category.objects.create(name="Phones", slug="phones", parent=self.electronics)
+        self.android = Category.objects.create(name="Android", slug="android", parent=self.phones)
+        self.fashion = Category.objects.create(name="Fashion", slug="fashion")
+
+    def test_descendants_and_ancestors(self):
+        self.assertCountEqual(
+            self.electronics.get_descendant_ids(),
+            [self.electronics.id, self.phones.id, self.android.id]
+        )
+        self.assertEqual(
+            list(self.android.get_ancestors()),
+            [self.electronics, self.phones]
+        )
+        self.assertEqual(
+            CategoryClosure.objects.get(ancestor=self.electronics, descendant=self.android).depth, 2
+        )
+
+    def test_move_subtree(self):
+        self.phones.parent = self.fashion
+        self.phones.save()
+        self.assertCountEqual(self.electronics.get_descendant_ids(), [self.electronics.id])
+        self.assertCountEqual(
+            self.fashion.get_descendant_ids(),
+            [self.fashion.id, self.phones.id, self.android.id]
+        )
+        self.assertEqual(list(self.android.get_ancestors()), [self.fashion, self.phones])
+
+    def test_delete_removes_links(self):
+        self.phones.delete()
+        self.assertFalse(CategoryClosure.objects.filter(descendant_id=self.android.id).exists())
+        self.assertCountEqual(self.electronics.get_descendant_ids(), [self.electronics.id])
+
+    def test_rebuild_matches_incremental(self):
+        expected = set(CategoryClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+        CategoryClosure.rebuild()
+        self.assertEqual(set(CategoryClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth')), expected)
+
+
+class CategoryProductCountTestCase(TestCase):
+    def setUp(self):
+        self.electronics = Category.objects.create(name="Electronics", slug="electronics")
+        self.phones = Category.objects.create(name="Phones", slug="phones", parent=self.electronics)
+        self.fashion = Category.objects.create(name="Fashion", slug="fashion")
+
+    def create_product(self, sku, category):
+        return Product.objects.create(
+            name=f"Product {sku}", sku=sku, category=category, price=100, description="-"
+        )
+
+    def assertCounts(self, **expected):
+        for slug, count in expected.items():
+            self.assertEqual(Category.objects.get(slug=slug).product_count, count, slug)
+
+    def test_counts_follow_product_writes(self):
+        phone = self.create_product("P-1", self.phones)
+        self.create_product("E-1", self.electronics)
+        self.assertCounts(electronics=2, phones=1, fashion=0)
+
+        phone.category = self.fashion
+        phone.save()
+        self.assertCounts(electronics=1, phones=0, fashion=1)
+
+        phone.delete()
+        self.assertCounts(electronics=1, phones=0, fashion=0)
+
+    def test_counts_follow_category_moves(self):
+        self.create_product("P-1", self.phones)
+        self.phones.parent = self.fashion
+        self.phones.save()
+        self.assertCounts(electronics=0, phones=1, fashion=1)
+
+    def test_recount_repairs_drift(self):
+        self.create_product("P-1", self.phones)
+        Category.objects.update(product_count=0)
+        self.assertEqual(Category.recount_products(), 2)
+        self.assertCounts(electronics=1, phones=1, fashion=0)
+
+
+class BrandProductCountTestCase(TestCase):
+    def setUp(self):
+        self.phones = Category.objects.create(name="Phones", slug="phones")
+        self.nokia = Brand.objects.create(name="Nokia", slug="nokia")
+        self.apple = Brand.objects.create(name="Apple", slug="apple")
+
+    def assertCounts(self, **expected):
+        self.assertEqual(dict(Brand.objects.values_list('slug', 'product_count')), expected)
+
+    def test_counts_follow_product_writes(self):
+        phone = Product.objects.create(
+            name="Phone", sku="P-1", category=self.phones, brand=self.nokia, price=100, description="-"
+        )
+        self.assertCounts(nokia=1, apple=0)
+        # a stale brand instance must not write its old count back
+        self.nokia.name = "Nokia Mobile"
+        self.nokia.save()
+        self.assertCounts(nokia=1, apple=0)
+
+        phone.brand = self.apple
+        phone.save()
+        self.assertCounts(nokia=0, apple=1)
+        phone.delete()
+        self.assertCounts(nokia=0, apple=0)
+
+    def test_listing_is_one_query_and_recount_repairs_drift(self):
+        Product.objects.create(name="Phone", sku="P-1", category=self.phones, brand=self.apple, price=100, description="-")
+        with self.assertNumQueries(1):
+            data = BrandListSerializer(Brand.objects.all(), many=True).data
+        self.assertEqual([(b['slug'], b['product_count']) for b in data], [('apple', 1), ('nokia', 0)])
+
+        Brand.objects.update(product_count=5)
+        self.assertEqual(Brand.recount_products(), 2)
+        self.assertCounts(nokia=0, apple=1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CategoryTreeTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.electronics = Category.objects.create(name="Electronics", slug="electronics")
+        self.phones = Category.objects.create(name="Phones", slug="phones", parent=self.electronics)
+        Category.objects.create(name="Hidden", slug="hidden", parent=self.electronics, is_active=False)
+
+    def test_tree_is_built_in_one_query_and_cached(self):
+        with self.assertNumQueries(1):
+            tree = get_category_tree()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_category_tree(), tree)
+        self.assertEqual([node['slug'] for node in tree], ['electronics'])
+        self.assertEqual([node['slug'] for node in tree[0]['children']], ['phones'])
+
+    def test_category_write_invalidates_tree(self):
+        get_category_tree()
+        self.phones.name = "Mobiles"
+        self.phones.save()
+        self.assertEqual(get_category_tree()[0]['children'][0]['name'], "Mobiles")
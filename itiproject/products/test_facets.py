@@ -0,0 +1,119 @@
+from django.test import TestCase
+from products.facets import FacetEngine
+from products.models import Category, CategoryPriceSummary, Brand, Product, Color, Size
+from products.price_summary import rebuild_price_summaries
+from products.query import ProductQuery
+
+
+class FacetEngineTestCase(TestCase):
+    def setUp(self):
+        self.shoes = Category.objects.create(name="Shoes", slug="shoes")
+        self.running = Category.objects.create(name="Running", slug="running", parent=self.shoes)
+        self.nike = Brand.objects.create(name="Nike", slug="nike")
+        self.adidas = Brand.objects.create(name="Adidas", slug="adidas")
+        self.red = Color.objects.create(name="Red")
+        self.blue = Color.objects.create(name="Blue")
+        self.size_m = Size.objects.create(name="M")
+
+        self.create("N-1", self.nike, 80, 4.5, [self.red])
+        self.create("N-2", self.nike, 300, 3.2, [self.blue])
+        self.create("A-1", self.adidas, 120, 4.8, [self.red, self.blue], category=self.running)
+
+    def create(self, sku, brand, price, rating, colors, category=None):
+        product = Product.objects.create(
+            name=sku, sku=sku, category=category or self.shoes, brand=brand,
+            price=price, rating_average=rating, description="-"
+        )
+        product.colors.set(colors)
+        product.sizes.set([self.size_m])
+        return product
+
+    def facets(self, **selected):
+        base = Product.objects.filter(category__ancestor_links__ancestor_id=self.shoes.id)
+        with self.assertNumQueries(4):
+            return FacetEngine(base, **selected).compute()
+
+    def counts(self, entries):
+        return {entry['slug']: entry['count'] for entry in entries}
+
+    def test_unfiltered_counts(self):
+        facets = self.facets()
+        self.assertEqual(facets['count'], 3)
+        self.assertEqual(self.counts(facets['brands']), {'adidas': 1, 'nike': 2})
+        self.assertEqual(self.counts(facets['colors']), {'red': 2, 'blue': 2})
+        self.assertEqual(self.counts(facets['sizes']), {'m': 3})
+        self.assertEqual([(b['min'], b['count']) for b in facets['price']], [(0, 1), (100, 1), (250, 1)])
+        self.assertEqual(facets['rating'][0], {'stars': 4, 'count': 2})
+
+    def test_multi_select_keeps_own_facet_counts(self):
+        facets = self.facets(brands=frozenset({'nike'}), colors=frozenset({'red'}))
+        self.assertEqual(facets['count'], 1)
+        # brand counts ignore the brand selection but honour the color one
+        self.assertEqual(self.counts(facets['brands']), {'adidas': 1, 'nike': 1})
+        # color counts ignore the color selection but honour the brand one
+        self.assertEqual(self.counts(facets['colors']), {'red': 1, 'blue': 1})
+
+    def test_price_range_ignores_price_filter(self):
+        facets = self.facets(min_price=100, min_stars=4)
+        self.assertEqual(facets['count'], 1)
+        self.assertEqual((facets['min_price'], facets['max_price']), (80, 120))
+        # rating buckets ignore the rating filter but honour the price one
+        self.assertEqual([bucket['count'] for bucket in facets['rating']], [1, 2, 2, 2])
+        # brands ruled out by the other selections stay listed with a zero count
+        self.assertEqual(self.counts(facets['brands']), {'adidas': 1, 'nike': 0})
+
+    def test_category_products_view(self):
+        response = self.client.get('/api/category/shoes/products/', {'brand': 'nike,adidas', 'color': 'blue'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['products_count'], 2)
+        self.assertEqual(len(response.data['products']), 2)
+        self.assertEqual(self.counts(response.data['colors']), {'red': 2, 'blue': 2})
+
+
+class CategoryPriceSummaryTestCase(TestCase):
+    def setUp(self):
+        self.shoes = Category.objects.create(name="Shoes", slug="shoes")
+        self.running = Category.objects.create(name="Running", slug="running", parent=self.shoes)
+        self.nike = Brand.objects.create(name="Nike", slug="nike")
+        self.adidas = Brand.objects.create(name="Adidas", slug="adidas")
+        for sku, brand, price, category in [("N-1", self.nike, 80, self.shoes), ("N-2", self.nike, 300, self.shoes),
+                                            ("A-1", self.adidas, 120, self.running)]:
+            Product.objects.create(name=sku, sku=sku, category=category, brand=brand, price=price, description="-")
+
+    def range_of(self, params, **scope):
+        return ProductQuery.from_params(params, **scope).price_range()
+
+    def test_summaries_follow_product_writes(self):
+        shoes = CategoryPriceSummary.objects.get(category=self.shoes)
+        self.assertEqual((shoes.product_count, shoes.min_price, shoes.max_price), (2, 80, 300))
+        self.assertEqual(shoes.histogram[:4], [1, 0, 1, 0])
+
+        product = Product.objects.get(sku="N-2")
+        product.price = 60
+        product.save()
+        product.category = self.running
+        product.save()
+        shoes.refresh_from_db()
+        self.assertEqual((shoes.product_count, shoes.min_price, shoes.max_price), (1, 80, 80))
+        self.assertEqual(self.range_of({}, category_ids={self.running.id})['min_price'], 60)
+
+        Product.objects.filter(category=self.shoes).delete()
+        self.assertFalse(CategoryPriceSummary.objects.filter(category=self.shoes).exists())
+
+    def test_category_only_requests_skip_the_products_table(self):
+        with self.assertNumQueries(1):
+            unfiltered = self.range_of({'ordering': 'price_low'})
+        self.assertEqual((unfiltered['min_price'], unfiltered['max_price']), (80, 300))
+        self.assertEqual(unfiltered['price_histogram'], [
+            {'min': 0, 'max': 100, 'count': 1}, {'min': 100, 'max': 250, 'count': 1},
+            {'min': 250, 'max': 500, 'count': 1},
+        ])
+        # the stored summaries and the aggregate agree
+        with self.assertNumQueries(1):
+            filtered = self.range_of({'brand': 'nike,adidas'})
+        self.assertEqual(filtered, unfiltered)
+        self.assertEqual(self.range_of({'category': 'running'})['max_price'], 120)
+
+        CategoryPriceSummary.objects.all().delete()
+        self.assertEqual(rebuild_price_summaries(), 2)
+        self.assertEqual(self.range_of({}), unfiltered)
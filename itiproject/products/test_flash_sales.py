@@ -0,0 +1,136 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from orders.models import OrderItem
+from products.flash_sales import flash_sale_index, release_expired_reservations
+from products.models import Category, Product, FlashSale, FlashSaleItem, FlashSaleReservation
+from products.test_categories import LOCMEM_CACHE
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class FlashSaleIndexTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client = APIClient()
+        self.customer = User.objects.create_user(username="customer", email="customer@example.com", password="secret")
+        category = Category.objects.create(name="Phones", slug="phones")
+        self.phone = Product.objects.create(
+            name="Phone", sku="P-1", category=category, price=200, sale_price=190, description="-"
+        )
+        self.case = Product.objects.create(name="Case", sku="C-1", category=category, price=20, description="-")
+        now = timezone.now()
+        self.sale = FlashSale.objects.create(
+            name="Friday", slug="friday", start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1)
+        )
+        self.item = FlashSaleItem.objects.create(
+            flash_sale=self.sale, product=self.phone, discount_percentage=25, quantity_limit=3
+        )
+
+    def test_lookups_between_boundaries_are_free(self):
+        flash_sale_index.invalidate()
+        with self.assertNumQueries(2):
+            self.assertEqual(flash_sale_index.get(self.phone.pk).discount_percentage, 25)
+        with self.assertNumQueries(0):
+            self.assertIsNone(flash_sale_index.get(self.case.pk))
+        # the end of the sale is a boundary: the next lookup after it reloads
+        later = self.sale.end_time + timedelta(seconds=1)
+        with self.assertNumQueries(2):
+            self.assertEqual(flash_sale_index.entries(now=later), {})
+
+    def listing(self):
+        return {product['id']: product for product in self.client.get('/api/products/').data['products']}
+
+    def test_listing_and_detail_show_the_flash_price(self):
+        products = self.listing()
+        phone = products[str(self.phone.pk)]
+        self.assertEqual((phone['effective_price'], phone['discount_percentage']), ('150.00', 25))
+        self.assertEqual(phone['flash_sale']['slug'], 'friday')
+        self.assertIsNone(products[str(self.case.pk)]['flash_sale'])
+
+        detail = self.client.get(f'/api/products/{self.phone.pk}/')
+        self.assertEqual(detail.data['effective_price'], '150.00')
+        # removing the sale changes the page, its ETag and the cached listing
+        self.item.delete()
+        again = self.client.get(f'/api/products/{self.phone.pk}/', HTTP_IF_NONE_MATCH=detail['ETag'])
+        self.assertEqual((again.status_code, again.data['effective_price']), (200, '190.00'))
+        self.assertEqual(self.listing()[str(self.phone.pk)]['effective_price'], '190.00')
+
+    def test_last_modified_comes_from_persisted_moments(self):
+        from unittest import mock
+        from products.flash_sales import FlashSaleIndex
+        from products.response_cache import product_validators
+        from products.sale_scheduler import apply_boundaries
+        self.phone.refresh_from_db()
+        _, last_modified = product_validators(self.phone)
+        self.assertEqual(last_modified, max(self.phone.updated_at, self.sale.updated_at, self.item.updated_at))
+        # another process loading its index later agrees on it
+        with mock.patch('products.response_cache.flash_sale_index', FlashSaleIndex()):
+            self.assertEqual(product_validators(self.phone)[1], last_modified)
+
+        # the end of the sale moves the page forward, never back to the product's own edits
+        ended = self.sale.end_time + timedelta(seconds=1)
+        apply_boundaries(self.sale.end_time - timedelta(seconds=1), ended)
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.updated_at, ended)
+        self.assertGreater(self.phone.updated_at, last_modified)
+
+    def checkout(self, quantity):
+        self.client.force_authenticate(self.customer)
+        response = self.client.post('/api/orders/checkout/', {
+            'shipping_address': 'Cairo', 'payment_method': 'cod',
+            'cart_items': [{'product': {'id': str(self.phone.pk)}, 'quantity': quantity}],
+        }, format='json')
+        return OrderItem.objects.get(order_id=response.data['order_ids'][0])
+
+    def test_checkout_claims_the_quantity_limit(self):
+        self.assertEqual(self.checkout(2).unit_price, 150)
+        # one unit left under the limit: two more are charged the regular price
+        self.assertEqual(self.checkout(2).unit_price, 190)
+        self.assertEqual(self.checkout(1).unit_price, 150)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity_sold, 3)
+        self.assertIsNone(flash_sale_index.get(self.phone.pk))
+
+    def test_checkout_ignores_an_expired_sale_price(self):
+        self.item.delete()
+        self.phone.sale_price = 100
+        self.phone.sale_end_date = timezone.now() - timedelta(days=1)
+        self.phone.save()
+        self.assertEqual(self.checkout(1).unit_price, 200)
+        # the flash price is taken off the regular price, as the listing shows it
+        FlashSaleItem.objects.create(flash_sale=self.sale, product=self.phone, discount_percentage=25)
+        self.assertEqual(self.listing()[str(self.phone.pk)]['effective_price'], '150.00')
+        self.assertEqual(self.checkout(1).unit_price, 150)
+
+    def reserve(self, user, quantity):
+        self.client.force_authenticate(user)
+        return self.client.post('/api/flash-sales/reservations/', {'product': str(self.phone.pk), 'quantity': quantity},
+                                format='json')
+
+    def test_reservations_hold_units_up_to_the_limit(self):
+        other = User.objects.create_user(username="other", email="other@example.com", password="secret")
+        self.assertEqual(self.reserve(self.customer, 2).status_code, 201)
+        self.assertEqual(self.reserve(other, 2).status_code, 409)
+        # the held units are charged the flash price at checkout and become sold
+        self.assertEqual(self.checkout(2).unit_price, 150)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.quantity_sold, self.item.quantity_reserved), (2, 0))
+        self.assertEqual(FlashSaleReservation.objects.get(user=self.customer).status, FlashSaleReservation.CLAIMED)
+        self.assertEqual(self.reserve(other, 1).status_code, 201)
+
+    def test_released_and_expired_units_go_back(self):
+        reservation = self.reserve(self.customer, 3).data
+        self.assertEqual(self.client.delete(f"/api/flash-sales/reservations/{reservation['id']}/").status_code, 204)
+        self.assertEqual(self.client.delete(f"/api/flash-sales/reservations/{reservation['id']}/").status_code, 409)
+
+        self.reserve(self.customer, 3)
+        later = timezone.now() + timedelta(minutes=30)
+        self.assertEqual(release_expired_reservations(at=later), 1)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity_reserved, 0)
+        self.assertEqual(FlashSaleReservation.objects.filter(status=FlashSaleReservation.EXPIRED).count(), 1)
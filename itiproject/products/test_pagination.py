@@ -0,0 +1,58 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from products.models import Category, Product
+
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Books", slug="books")
+        for index in range(30):
+            Product.objects.create(
+                name=f"Book {index}", sku=f"B-{index}", category=self.category, description="-",
+                price=10 + index % 4,  # plenty of ties to exercise the id tiebreaker
+                quantity_sold=index % 5,
+            )
+
+    def walk(self, url, **params):
+        params['pagination'] = 'cursor'
+        seen = []
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            page = response.data.get('products') or response.data.get('results')
+            seen.extend(product['sku'] for product in page)
+            cursor = response.data['pagination']['next_cursor']
+            if cursor is None:
+                return seen
+            params['cursor'] = cursor
+
+    def test_walks_every_product_once_in_order(self):
+        for ordering in ['popularity', 'price_asc', 'price_desc', 'newest', 'rating']:
+            skus = self.walk('/api/products/', ordering=ordering)
+            self.assertEqual(len(skus), 30, ordering)
+            self.assertEqual(len(set(skus)), 30, ordering)
+
+        skus = self.walk('/api/products/', ordering='price_asc')
+        prices = [Product.objects.get(sku=sku).price for sku in skus]
+        self.assertEqual(prices, sorted(prices))
+
+    def test_category_pages(self):
+        skus = self.walk('/api/category/books/products/', ordering='popularity')
+        self.assertEqual(len(set(skus)), 30)
+        sold = [Product.objects.get(sku=sku).quantity_sold for sku in skus]
+        self.assertEqual(sold, sorted(sold, reverse=True))
+
+    def test_newest_keeps_microseconds(self):
+        # rows a few microseconds apart, all inside one millisecond
+        base = timezone.now().replace(microsecond=500000)
+        for index, product in enumerate(Product.objects.order_by('sku')):
+            Product.objects.filter(pk=product.pk).update(created_at=base + timedelta(microseconds=index * 10))
+        skus = self.walk('/api/products/', ordering='newest')
+        self.assertEqual(len(set(skus)), 30)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/products/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
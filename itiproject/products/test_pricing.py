@@ -0,0 +1,120 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from products.cache import get_versions
+from products.models import Category, Product, FlashSale, FlashSaleItem
+from products.response_cache import product_tag
+from products.sale_scheduler import SaleScheduler
+from products.test_categories import LOCMEM_CACHE
+
+
+class EffectivePriceTestCase(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Audio", slug="audio")
+
+    def create(self, sku, **kwargs):
+        return Product.objects.create(
+            name=sku, sku=sku, category=self.category, description="-", price=200, **kwargs
+        )
+
+    def test_stored_on_save(self):
+        product = self.create("A-1", sale_price=150)
+        self.assertEqual(product.effective_price, Decimal('150'))
+        self.assertEqual(product.discount_percentage, Decimal('25.00'))
+        product.sale_price = None
+        product.save(update_fields=['sale_price'])
+        product.refresh_from_db()
+        self.assertEqual((product.effective_price, product.discount_percentage), (Decimal('200'), Decimal('0')))
+
+    def test_sale_window(self):
+        now = timezone.now()
+        upcoming = self.create("A-2", sale_price=100, sale_start_date=now + timedelta(hours=1))
+        ending = self.create("A-3", sale_price=100, sale_end_date=now + timedelta(hours=1))
+        self.assertEqual(upcoming.effective_price, Decimal('200'))
+        self.assertEqual(ending.effective_price, Decimal('100'))
+
+        changed = Product.refresh_stale_pricing(at=now + timedelta(hours=2))
+        self.assertCountEqual([product.sku for product in changed], ["A-2", "A-3"])
+        upcoming.refresh_from_db()
+        ending.refresh_from_db()
+        self.assertEqual(upcoming.effective_price, Decimal('100'))
+        self.assertEqual(ending.effective_price, Decimal('200'))
+        self.assertEqual(Product.refresh_stale_pricing(at=now + timedelta(hours=2)), [])
+
+    def test_refresh_command_queries_do_not_grow_with_changes(self):
+        from django.core.management import call_command
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        counts = []
+        for count in (2, 10):
+            Product.objects.all().delete()
+            for index in range(count):
+                product = self.create(f"R-{index}", sale_price=100)
+                # the sale ended without the stored price being refreshed
+                Product.objects.filter(pk=product.pk).update(sale_end_date=timezone.now() - timedelta(hours=1))
+            with CaptureQueriesContext(connection) as queries:
+                call_command('refresh_product_prices', stdout=open('/dev/null', 'w'))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_discount_filter_and_price_sort(self):
+        self.create("A-4", sale_price=180)
+        self.create("A-5", sale_price=50)
+        self.create("A-6")
+        response = self.client.get('/api/products/', {'discount_min': 20, 'ordering': 'price_asc'})
+        self.assertEqual([p['sku'] for p in response.data['products']], ["A-5"])
+        response = self.client.get('/api/products/', {'ordering': 'price_asc'})
+        self.assertEqual([p['sku'] for p in response.data['products']], ["A-5", "A-4", "A-6"])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SaleSchedulerTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.now = timezone.now()
+        category = Category.objects.create(name="Audio", slug="audio")
+        self.upcoming = Product.objects.create(
+            name="Speaker", sku="S-1", category=category, description="-", price=200, sale_price=100,
+            sale_start_date=self.now + timedelta(minutes=20)
+        )
+        self.other = Product.objects.create(name="Cable", sku="C-1", category=category, description="-", price=10)
+        self.flash = Product.objects.create(name="Mic", sku="M-1", category=category, description="-", price=50)
+        sale = FlashSale.objects.create(
+            name="Lunch", slug="lunch", start_time=self.now - timedelta(minutes=5),
+            end_time=self.now + timedelta(minutes=40)
+        )
+        FlashSaleItem.objects.create(flash_sale=sale, product=self.flash, discount_percentage=10, quantity_limit=0)
+
+    def versions(self):
+        return get_versions([product_tag(product.pk) for product in (self.upcoming, self.other, self.flash)])
+
+    def test_boundaries_fire_in_order_and_purge_only_affected_products(self):
+        scheduler = SaleScheduler(reload_interval=timedelta(hours=2), now=self.now)
+        self.assertIsNone(scheduler.tick(self.now))
+        self.assertEqual(scheduler.next_wakeup(), self.upcoming.sale_start_date)
+
+        before = self.versions()
+        repriced, flash_product_ids = scheduler.tick(self.upcoming.sale_start_date)
+        self.assertEqual(([product.pk for product in repriced], flash_product_ids), ([self.upcoming.pk], set()))
+        self.upcoming.refresh_from_db()
+        self.assertEqual(self.upcoming.effective_price, Decimal('100'))
+        after = self.versions()
+        self.assertNotEqual(after[product_tag(self.upcoming.pk)], before[product_tag(self.upcoming.pk)])
+        self.assertEqual(after[product_tag(self.other.pk)], before[product_tag(self.other.pk)])
+
+        # the flash sale end is next; a late wake-up still processes it
+        repriced, flash_product_ids = scheduler.tick(self.now + timedelta(minutes=45))
+        self.assertEqual((repriced, flash_product_ids), ([], {self.flash.pk}))
+        self.assertIsNone(scheduler.tick(self.now + timedelta(minutes=50)))
+
+    def test_boundaries_passed_between_reloads_still_fire(self):
+        scheduler = SaleScheduler(reload_interval=timedelta(minutes=1), now=self.now)
+        scheduler.tick(self.now)
+        # edited after the load, its window opens before the next reload
+        self.other.sale_price = 5
+        self.other.sale_start_date = self.now + timedelta(seconds=30)
+        self.other.save()
+        repriced, _ = scheduler.tick(self.now + timedelta(minutes=2))
+        self.assertEqual([product.pk for product in repriced], [self.other.pk])
@@ -0,0 +1,105 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from products.management.commands.explain_catalog_queries import canonical_query_shapes, plan_problems
+from products.flash_sales import flash_sale_index
+from products.models import Category, Brand, Product, ProductImage, Size, Color, RecentlyViewedProduct
+from products.test_categories import LOCMEM_CACHE
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ListingQueryCountTestCase(TestCase):
+    """Listing endpoints issue a fixed number of queries whatever the page size (cold cache)"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = User.objects.create_user(
+            username="vendor", email="vendor@example.com", password="secret", is_staff=True
+        )
+        self.category = Category.objects.create(name="Phones", slug="phones")
+        self.brand = Brand.objects.create(name="Nokia", slug="nokia")
+        self.size = Size.objects.create(name="M")
+        self.color = Color.objects.create(name="Black")
+        # loaded once per process and boundary, not per request
+        flash_sale_index.invalidate()
+        flash_sale_index.entries()
+
+    def add_products(self, count):
+        for index in range(count):
+            product = Product.objects.create(
+                name=f"Phone {index}", sku=f"P-{Product.objects.count()}", category=self.category,
+                brand=self.brand, seller=self.vendor, price=100, description="-",
+                specifications={"RAM": "8 GB", "Model": f"N{index}"}
+            )
+            product.sizes.add(self.size)
+            product.colors.add(self.color)
+            ProductImage.objects.create(product=product, image='product_images/default.jpg')
+            RecentlyViewedProduct.objects.create(user=self.vendor, product=product)
+
+    def assertConstantQueries(self, expected, url, params=None, authenticate=False):
+        if authenticate:
+            self.client.force_authenticate(self.vendor)
+        for count in (2, 10):
+            self.add_products(count)
+            # counted on a miss, a cached page would hide what the build costs
+            cache.clear()
+            with self.assertNumQueries(expected):
+                response = self.client.get(url, params or {})
+            self.assertEqual(response.status_code, 200)
+
+    def test_product_list(self):
+        self.assertConstantQueries(6, '/api/products/')
+        self.assertConstantQueries(5, '/api/products/', {'pagination': 'cursor'})
+
+    def test_sparse_fieldsets(self):
+        # no prefetches (and no joins) for fields that are not requested
+        self.assertConstantQueries(3, '/api/products/', {'fields': 'id,name,effective_price'})
+        response = self.client.get('/api/products/', {'fields': 'id,name,colors', 'exclude': 'colors'})
+        self.assertEqual(set(response.data['products'][0]), {'id', 'name'})
+        # the id is always part of a sparse fieldset
+        for url in ('/api/products/', '/api/category/phones/products/'):
+            response = self.client.get(url, {'fields': 'name,price', 'exclude': 'id'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(set(response.data['products'][0]), {'id', 'name', 'price'})
+        product = Product.objects.first()
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/products/{product.pk}/', {'exclude': 'description,product_images,sizes'})
+        self.assertNotIn('description', response.data)
+        self.assertIn('colors', response.data)
+
+    def test_category_products(self):
+        self.assertConstantQueries(12, '/api/category/phones/products/')
+        self.assertConstantQueries(11, '/api/category/phones/products/', {'pagination': 'cursor'})
+        self.assertConstantQueries(13, '/api/category/phones/products/', {'spec.ram': '8 GB'})
+
+    def test_vendor_products(self):
+        self.assertConstantQueries(6, '/api/vendor/products/', authenticate=True)
+        self.assertConstantQueries(5, '/api/vendor/products/', {'pagination': 'cursor'}, authenticate=True)
+
+    def test_recently_viewed(self):
+        self.assertConstantQueries(5, '/api/products/recently-viewed/', authenticate=True)
+
+    def test_product_detail(self):
+        self.add_products(1)
+        product = Product.objects.get()
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/products/{product.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+
+class CatalogQueryPlanTestCase(TestCase):
+    """Every canonical catalog query is served by an index, without a temp sort"""
+
+    def test_canonical_shapes_use_indexes(self):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest('no plan markers for this database')
+        ListingQueryCountTestCase.setUp(self)
+        ListingQueryCountTestCase.add_products(self, 3)
+        for name, queryset in canonical_query_shapes():
+            with self.subTest(name):
+                self.assertEqual(plan_problems(queryset.explain()), [])
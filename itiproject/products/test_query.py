@@ -0,0 +1,50 @@
+from django.http import QueryDict
+from django.test import TestCase
+from rest_framework.test import APIClient
+from products.models import Category, Brand, Product, Color
+from products.query import ProductQuery, RELEVANCE
+
+
+class ProductQueryTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Shirts", slug="shirts")
+        self.brand = Brand.objects.create(name="Acme", slug="acme")
+        self.red = Color.objects.create(name="Red")
+        self.blue = Color.objects.create(name="Blue")
+        for index in range(4):
+            product = Product.objects.create(
+                name=f"Linen shirt {index}", sku=f"S-{index}", category=self.category, brand=self.brand,
+                price=100 + index, description="-", quantity_sold=index,
+            )
+            product.colors.add(self.red, self.blue)
+
+    def spec(self, query_string, **kwargs):
+        return ProductQuery.from_params(QueryDict(query_string), **kwargs).spec
+
+    def test_equivalent_requests_share_a_spec(self):
+        first = self.spec('brand=b,a&min_price=100&color=red')
+        second = self.spec('color=red&min_price=100.00&brand=a,b&ordering=bogus')
+        self.assertEqual(first, second)
+        self.assertEqual(first.cache_key, second.cache_key)
+        self.assertNotEqual(first.cache_key, self.spec('brand=a').cache_key)
+
+    def test_ordering_defaults(self):
+        self.assertEqual(self.spec('').ordering, 'popularity')
+        self.assertEqual(self.spec('q=linen').ordering, RELEVANCE)
+        self.assertIsNone(self.spec('q=linen').keyset_ordering)
+        self.assertEqual(self.spec('q=linen', default_ordering='newest', search='icontains').ordering, 'newest')
+
+    def test_m2m_filters_do_not_duplicate_rows(self):
+        products = ProductQuery.from_params(QueryDict('color=red,blue')).queryset()
+        self.assertEqual(len(products), 4)
+        response = self.client.get('/api/category/shirts/products/', {'color': 'red,blue'})
+        self.assertEqual(response.data['products_count'], 4)
+        self.assertEqual(len(response.data['products']), 4)
+
+    def test_views_agree(self):
+        listing = self.client.get('/api/products/', {'brand': 'acme', 'max_price': '102'})
+        category = self.client.get('/api/category/shirts/products/', {'brand': 'acme', 'max_price': '102'})
+        skus = [product['sku'] for product in listing.data['products']]
+        self.assertEqual(skus, ['S-2', 'S-1', 'S-0'])
+        self.assertEqual(skus, [product['sku'] for product in category.data['products']])
@@ -0,0 +1,143 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from products.models import Category, Product
+from products.test_categories import LOCMEM_CACHE
+
+User = get_user_model()
+
+
+class RecentlyViewedHistoryTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", email="buyer@example.com", password="secret")
+        category = Category.objects.create(name="Phones", slug="phones")
+        self.product = Product.objects.create(name="Phone", sku="P-1", category=category, price=100, description="-")
+
+    def test_history_is_capped(self):
+        from products.models import RecentlyViewedProduct
+        from products.recently_viewed import record_view, MAX_RECENTLY_VIEWED
+        products = [
+            Product.objects.create(name=f"Item {i}", sku=f"I-{i}", category=self.product.category, price=1, description="-")
+            for i in range(MAX_RECENTLY_VIEWED + 3)
+        ]
+        for product in products:
+            record_view(self.user.pk, product.pk)
+        record_view(self.user.pk, products[0].pk)
+        kept = set(RecentlyViewedProduct.objects.filter(user=self.user).values_list('product_id', flat=True))
+        self.assertEqual(len(kept), MAX_RECENTLY_VIEWED)
+        self.assertIn(products[0].pk, kept)
+        self.assertIn(products[-1].pk, kept)
+
+    def test_flush_writes_histories_in_bulk(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from products.models import RecentlyViewedProduct
+        from products.recently_viewed import _write_histories, MAX_RECENTLY_VIEWED
+        now = timezone.now()
+        products = [
+            Product.objects.create(name=f"Item {i}", sku=f"I-{i}", category=self.product.category, price=1, description="-")
+            for i in range(MAX_RECENTLY_VIEWED)
+        ]
+        RecentlyViewedProduct.objects.create(user=self.user, product=self.product)
+        history = {product.pk: now - timedelta(minutes=i) for i, product in enumerate(products)}
+        with self.assertNumQueries(7):
+            _write_histories({self.user.pk: history, 999: history})
+        rows = dict(RecentlyViewedProduct.objects.filter(user=self.user).values_list('product_id', 'viewed_at'))
+        # a full history replaces the older database rows
+        self.assertEqual(rows, history)
+
+
+class FakeRedis:
+    """The few sorted-set and set commands recently_viewed.py uses, in memory"""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update({member.encode(): score for member, score in mapping.items()})
+
+    def _ranked(self, key):
+        return sorted(self.data.get(key, {}).items(), key=lambda item: item[1])
+
+    def zremrangebyrank(self, key, start, end):
+        ranked = self._ranked(key)
+        for member, _ in ranked[start:len(ranked) + end + 1 if end < 0 else end + 1]:
+            del self.data[key][member]
+
+    def zrange(self, key, start, end, withscores=False):
+        ranked = self._ranked(key)[start:None if end == -1 else end + 1]
+        return ranked if withscores else [member for member, _ in ranked]
+
+    def zrevrange(self, key, start, end):
+        return [member for member, _ in reversed(self._ranked(key))][start:end + 1]
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def expire(self, key, seconds):
+        pass
+
+    def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(str(member).encode() for member in members)
+
+    def spop(self, key, count):
+        members = self.data.get(key, set())
+        return [members.pop() for _ in range(min(count, len(members)))]
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client, self.calls = client, []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RecentlyViewedRedisTestCase(TestCase):
+    def setUp(self):
+        from unittest import mock
+        self.redis = FakeRedis()
+        patcher = mock.patch('products.recently_viewed._redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username="buyer", email="buyer@example.com", password="secret")
+        category = Category.objects.create(name="Phones", slug="phones")
+        self.products = [
+            Product.objects.create(name=f"Item {i}", sku=f"I-{i}", category=category, price=1, description="-")
+            for i in range(3)
+        ]
+
+    def test_views_go_to_redis_and_are_flushed(self):
+        from products.models import RecentlyViewedProduct
+        from products.recently_viewed import flush_dirty_histories, recently_viewed_ids, track_view
+        for product in self.products + self.products[:1]:
+            track_view(self.user.pk, product.pk)
+        # tracking writes nothing to the database until the flush
+        self.assertFalse(RecentlyViewedProduct.objects.exists())
+        with self.assertNumQueries(0):
+            ids = recently_viewed_ids(self.user.pk, 2)
+        self.assertEqual(ids, [self.products[0].pk, self.products[2].pk])
+
+        self.assertEqual(flush_dirty_histories(), 1)
+        self.assertEqual(flush_dirty_histories(), 0)
+        self.assertEqual(RecentlyViewedProduct.objects.filter(user=self.user).count(), 3)
+
+    def test_missing_history_is_warmed_from_the_database(self):
+        from products.recently_viewed import record_view, recently_viewed_ids, HISTORY_KEY
+        record_view(self.user.pk, self.products[1].pk)
+        self.assertEqual(recently_viewed_ids(self.user.pk, 5), [self.products[1].pk])
+        self.assertIn(HISTORY_KEY.format(self.user.pk), self.redis.data)
+
+    def test_product_page_tracks_after_the_response(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.get(f'/api/products/{self.products[2].pk}/')
+        from products.recently_viewed import recently_viewed_ids
+        self.assertEqual(recently_viewed_ids(self.user.pk, 5), [self.products[2].pk])
@@ -0,0 +1,48 @@
+import gzip
+import json
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from itiproject.middleware import CompressionMiddleware, choose_encoding, brotli
+from itiproject.renderers import FastJSONRenderer
+
+
+class FastJSONRendererTestCase(SimpleTestCase):
+    def test_matches_the_stock_renderer(self):
+        data = {
+            'id': uuid.uuid4(), 'price': Decimal('12.50'), 'name': 'café  ',
+            'created_at': datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc),
+            'items': [{'stars': 4, 'count': None}], 'flag': True,
+        }
+        fast = FastJSONRenderer().render(data)
+        stock = JSONRenderer().render(data)
+        self.assertEqual(json.loads(fast), json.loads(stock))
+        self.assertIn(b'\\u2028', fast)
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionMiddlewareTestCase(SimpleTestCase):
+    def respond(self, body, accept_encoding, content_type='application/json'):
+        middleware = CompressionMiddleware(lambda request: HttpResponse(body, content_type=content_type))
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return middleware(request)
+
+    def test_negotiation(self):
+        self.assertEqual(choose_encoding('gzip, deflate'), 'gzip')
+        self.assertIsNone(choose_encoding('identity'))
+        self.assertIsNone(choose_encoding('gzip;q=0'))
+        self.assertEqual(choose_encoding('br;q=1.0, gzip;q=0.5'), 'br' if brotli else 'gzip')
+
+    def test_compresses_above_the_threshold(self):
+        body = b'{"products": [' + b'{"name": "Phone"},' * 50 + b'{}]}'
+        response = self.respond(body, 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), body)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        self.assertFalse(self.respond(b'{}', 'gzip').has_header('Content-Encoding'))
+        self.assertFalse(self.respond(body, 'gzip', 'image/png').has_header('Content-Encoding'))
@@ -0,0 +1,171 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from products.models import Category, Brand, Product, Color
+from products.test_categories import LOCMEM_CACHE
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = User.objects.create_user(
+            username="vendor", email="vendor@example.com", password="secret", is_staff=True
+        )
+        self.phones = Category.objects.create(name="Phones", slug="phones")
+        self.smart = Category.objects.create(name="Smartphones", slug="smartphones", parent=self.phones)
+        self.laptops = Category.objects.create(name="Laptops", slug="laptops")
+        self.brand = Brand.objects.create(name="Nokia", slug="nokia")
+        self.product = Product.objects.create(
+            name="Phone", sku="P-1", category=self.smart, brand=self.brand, seller=self.vendor,
+            price=100, description="-"
+        )
+
+    def test_hits_are_served_without_queries(self):
+        first = self.client.get('/api/category/phones/products/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/category/phones/products/')
+        self.assertEqual(first.data, second.data)
+        # equivalent query strings share the entry
+        self.client.get('/api/products/', {'brand': 'nokia', 'min_price': '10'})
+        with self.assertNumQueries(0):
+            self.client.get('/api/products/', {'min_price': '10.00', 'brand': 'nokia', 'ordering': 'unknown'})
+
+    def test_product_save_invalidates_its_listings(self):
+        self.client.force_authenticate(self.vendor)
+        for url in ['/api/products/', '/api/category/phones/products/', '/api/vendor/products/']:
+            self.client.get(url)
+        self.product.price = 80
+        self.product.save()
+        self.assertEqual(self.client.get('/api/products/').data['products'][0]['price'], '80.00')
+        self.assertEqual(self.client.get('/api/category/phones/products/').data['products'][0]['price'], '80.00')
+        self.assertEqual(self.client.get('/api/vendor/products/').data['results'][0]['price'], '80.00')
+
+    def test_moved_product_leaves_old_category(self):
+        self.assertEqual(self.client.get('/api/category/phones/products/').data['products_count'], 1)
+        self.assertEqual(self.client.get('/api/category/laptops/products/').data['products_count'], 0)
+        self.product.category = self.laptops
+        self.product.save()
+        self.assertEqual(self.client.get('/api/category/phones/products/').data['products_count'], 0)
+        self.assertEqual(self.client.get('/api/category/laptops/products/').data['products_count'], 1)
+
+    def test_unrelated_writes_keep_entries(self):
+        self.client.get('/api/category/phones/products/')
+        Product.objects.create(name="Laptop", sku="L-1", category=self.laptops, price=900, description="-")
+        with self.assertNumQueries(0):
+            self.client.get('/api/category/phones/products/')
+
+    def test_variant_and_taxonomy_changes(self):
+        self.client.get('/api/category/phones/products/')
+        red = Color.objects.create(name="Red")
+        self.product.colors.add(red)
+        self.assertEqual(self.client.get('/api/category/phones/products/').data['products'][0]['colors'][0]['name'], 'Red')
+        red.name = "Crimson"
+        red.save()
+        self.assertEqual(
+            self.client.get('/api/category/phones/products/').data['products'][0]['colors'][0]['name'], 'Crimson'
+        )
+
+
+    def test_reference_data_bundle(self):
+        first = self.client.get('/api/vendor/')
+        self.assertEqual([b['product_count'] for b in first.data['brands']], [1])
+        self.assertEqual(first.data['categories'][0]['children'][0]['slug'], 'smartphones')
+        with self.assertNumQueries(0):
+            again = self.client.get('/api/vendor/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+        Color.objects.create(name="Red")
+        changed = self.client.get('/api/vendor/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+        self.assertEqual([c['name'] for c in changed.data['colors']], ["Red"])
+
+        # a product moving to another brand changes the counts
+        other = Brand.objects.create(name="Apple", slug="apple")
+        self.product.brand = other
+        self.product.save()
+        counts = {b['slug']: b['product_count'] for b in self.client.get('/api/vendor/').data['brands']}
+        self.assertEqual(counts, {'nokia': 0, 'apple': 1})
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ProductDetailValidatorsTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="buyer", email="buyer@example.com", password="secret")
+        category = Category.objects.create(name="Phones", slug="phones")
+        self.product = Product.objects.create(name="Phone", sku="P-1", category=category, price=100, description="-")
+        self.url = f'/api/products/{self.product.pk}/'
+
+    def test_revisit_is_answered_with_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(1):
+            revisit = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revisit.status_code, 304)
+        revisit = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(revisit.status_code, 304)
+
+    def test_changes_move_the_validators(self):
+        etag = self.client.get(self.url)['ETag']
+        self.product.colors.add(Color.objects.create(name="Red"))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['colors'][0]['name'], 'Red')
+        Brand.objects.create(name="Nokia", slug="nokia")
+        self.assertNotEqual(self.client.get(self.url)['ETag'], response['ETag'])
+
+    def test_views_are_tracked(self):
+        from products.models import RecentlyViewedProduct
+        self.client.force_authenticate(self.user)
+        etag = self.client.get(self.url)['ETag']
+        self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(RecentlyViewedProduct.objects.filter(user=self.user).count(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ProductFragmentCacheTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        category = Category.objects.create(name="Phones", slug="phones")
+        for index in range(3):
+            Product.objects.create(name=f"Phone {index}", sku=f"P-{index}", category=category, price=100, description="-")
+
+    def serialize(self):
+        from products.serializers import ProductListSerializer
+        return ProductListSerializer(list(Product.objects.for_listing().order_by('sku')), many=True).data
+
+    def test_only_misses_are_prefetched(self):
+        first = self.serialize()
+        with self.assertNumQueries(1):  # the page rows only
+            self.assertEqual(self.serialize(), first)
+        product = Product.objects.get(sku="P-1")
+        product.colors.add(Color.objects.create(name="Red"))
+        with self.assertNumQueries(4):  # rows plus the prefetches of the changed product
+            data = self.serialize()
+        self.assertEqual(data[1]['colors'][0]['name'], 'Red')
+        self.assertEqual(data[0], first[0])
+
+    def test_taxonomy_changes_refresh_fragments(self):
+        self.serialize()
+        category = Category.objects.get(slug="phones")
+        category.name = "Mobiles"
+        category.save()
+        self.assertEqual(self.serialize()[0]['category_name'], 'Mobiles')
+
+    def test_bulk_updates_refresh_fragments(self):
+        from products.admin import ProductAdmin
+        from django.contrib.admin.sites import site
+        self.serialize()
+        ProductAdmin(Product, site).mark_featured(None, Product.objects.filter(sku="P-1"))
+        self.assertEqual([product['is_featured'] for product in self.serialize()], [False, True, False])
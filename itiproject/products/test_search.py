@@ -0,0 +1,120 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from products.models import Category, Brand, Product
+from products.search import get_search_backend
+from products.suggestions import SuggestionIndex, SUGGESTIONS_VERSION
+from products.test_categories import LOCMEM_CACHE
+
+
+class ProductSearchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.phones = Category.objects.create(name="Phones", slug="phones")
+        self.samsung = Brand.objects.create(name="Samsung", slug="samsung")
+        self.galaxy = Product.objects.create(
+            name="Galaxy S24", sku="GAL-1", category=self.phones, brand=self.samsung,
+            price=900, description="Flagship phone"
+        )
+        self.case = Product.objects.create(
+            name="Silicone case", sku="CASE-1", category=self.phones,
+            price=10, description="Fits the Galaxy S24"
+        )
+
+    def search(self, query):
+        products = get_search_backend().search(Product.objects.all(), query)
+        return list(products.order_by('-search_rank').values_list('sku', flat=True))
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.search("galaxy"), ["GAL-1", "CASE-1"])
+
+    def test_only_document_changes_reindex(self):
+        from unittest import mock
+        with mock.patch('products.signals.get_search_backend') as backend:
+            self.galaxy.rating_average = 4.5
+            self.galaxy.stock_quantity = 3
+            self.galaxy.save()
+            self.galaxy.save(update_fields=['quantity_sold'])
+            self.assertFalse(backend.return_value.index_products.called)
+            self.galaxy.description = "Flagship phone with a titanium frame"
+            self.galaxy.save()
+            backend.return_value.index_products.assert_called_once_with([self.galaxy.pk])
+        self.galaxy.name = "Galaxy S24 Titanium"
+        self.galaxy.save(update_fields=['name'])
+        self.assertEqual(self.search("titanium"), ["GAL-1"])
+
+    def test_prefix_and_related_names(self):
+        self.assertEqual(self.search("sams"), ["GAL-1"])
+        self.assertEqual(self.search("phones silicone"), ["CASE-1"])
+
+    def test_index_follows_writes(self):
+        self.case.name = "Leather cover"
+        self.case.save()
+        self.assertEqual(self.search("leather"), ["CASE-1"])
+        self.samsung.name = "Samsung Electronics"
+        self.samsung.save()
+        self.assertEqual(self.search("electronics"), ["GAL-1"])
+        self.galaxy.delete()
+        self.assertEqual(self.search("galaxy"), ["CASE-1"])
+
+    def test_syntax_is_not_injected(self):
+        self.assertEqual(self.search('galaxy" OR "case'), [])
+        self.assertEqual(self.search('"*'), [])
+
+    def test_product_list_view_orders_by_relevance(self):
+        response = self.client.get('/api/products/', {'q': 'galaxy'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['sku'] for p in response.data['products']], ["GAL-1", "CASE-1"])
+        self.assertEqual(response.data['products_count'], 2)
+
+
+class SuggestionIndexTestCase(TestCase):
+    def setUp(self):
+        self.phones = Category.objects.create(name="Phones", slug="phones")
+        self.samsung = Brand.objects.create(name="Samsung", slug="samsung")
+        self.galaxy = Product.objects.create(
+            name="Galaxy S24 Ultra", sku="GAL-1", category=self.phones, brand=self.samsung,
+            price=900, description="-"
+        )
+        self.index = SuggestionIndex()
+        self.index.rebuild()
+
+    def names(self, query, kind):
+        return [entry['name'] for entry in self.index.suggest(query)[kind]]
+
+    def test_prefix_lookup_without_queries(self):
+        with self.assertNumQueries(0):
+            suggestions = self.index.suggest("ULT")
+        self.assertEqual(suggestions['products'][0]['slug'], self.galaxy.slug)
+        self.assertEqual(suggestions['products'][0]['type'], 'product')
+        self.assertEqual(self.names("sam", 'brands'), ["Samsung"])
+        self.assertEqual(self.names("galaxy ul", 'products'), ["Galaxy S24 Ultra"])
+        self.assertEqual(self.names("galaxy note", 'products'), [])
+
+    def test_patched_from_model_writes(self):
+        self.galaxy.name = "Pixel 9"
+        self.index.update(self.galaxy)
+        self.assertEqual(self.names("galaxy", 'products'), [])
+        self.assertEqual(self.names("pix", 'products'), ["Pixel 9"])
+        self.index.remove(self.phones)
+        self.assertEqual(self.names("pho", 'categories'), [])
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_only_name_changes_move_the_version(self):
+        from products.cache import get_version
+        version = get_version(SUGGESTIONS_VERSION)
+        self.galaxy.price = 800
+        self.galaxy.save()
+        self.samsung.save()
+        self.galaxy.save(update_fields=['stock_quantity'])
+        self.assertEqual(get_version(SUGGESTIONS_VERSION), version)
+        self.galaxy.name = "Galaxy S25"
+        self.galaxy.save()
+        self.assertEqual(get_version(SUGGESTIONS_VERSION), version + 1)
+
+    def test_view_response_shape(self):
+        from products.suggestions import suggestion_index
+        suggestion_index.rebuild()
+        response = self.client.get('/api/search-suggestions/', {'q': 'sam'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['brands'][0]['slug'], 'samsung')
+        self.assertEqual(set(response.data), {'products', 'categories', 'brands'})
@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from orders.models import OrderItem
+from products.models import Category, Product, VendorStats
+from products.test_categories import LOCMEM_CACHE
+from products.vendor_stats import rebuild_vendor_stats
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class VendorStatsTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = User.objects.create_user(
+            username="vendor", email="vendor@example.com", password="secret", is_staff=True
+        )
+        self.customer = User.objects.create_user(username="customer", email="customer@example.com", password="secret")
+        category = Category.objects.create(name="Phones", slug="phones")
+        self.phone = Product.objects.create(
+            name="Phone", sku="P-1", category=category, seller=self.vendor, price=100, sale_price=80,
+            stock_quantity=5, description="-"
+        )
+        self.case = Product.objects.create(
+            name="Case", sku="C-1", category=category, seller=self.vendor, price=20, description="-"
+        )
+
+    def stats(self):
+        return VendorStats.objects.get(vendor=self.vendor)
+
+    def checkout(self, quantity):
+        self.client.force_authenticate(self.customer)
+        response = self.client.post('/api/orders/checkout/', {
+            'shipping_address': 'Cairo', 'payment_method': 'cod',
+            'cart_items': [{'product': {'id': str(self.phone.pk)}, 'quantity': quantity}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return OrderItem.objects.get(order_id=response.data['order_ids'][0])
+
+    def test_catalog_columns_follow_product_writes(self):
+        stats = self.stats()
+        self.assertEqual((stats.product_count, stats.in_stock_count, stats.min_price, stats.max_price), (2, 1, 20, 100))
+        self.case.stock_quantity = 3
+        self.case.save()
+        self.phone.delete()
+        stats = self.stats()
+        self.assertEqual((stats.product_count, stats.in_stock_count, stats.min_price, stats.max_price), (1, 1, 20, 20))
+
+    def test_revenue_uses_the_price_paid(self):
+        item = self.checkout(2)
+        self.assertEqual(item.unit_price, 80)
+        # later price changes do not rewrite realized revenue
+        self.phone.sale_price = None
+        self.phone.price = 500
+        self.phone.save()
+        self.assertEqual((self.stats().units_sold, self.stats().revenue), (2, 160))
+
+        self.client.force_authenticate(self.vendor)
+        self.client.patch(f'/api/orders/vendor-items/{item.pk}/', {'status': 'cancelled'}, format='json')
+        self.assertEqual((self.stats().units_sold, self.stats().revenue), (0, 0))
+
+        VendorStats.objects.all().delete()
+        self.checkout(1)
+        self.assertEqual(rebuild_vendor_stats(), 1)
+        self.assertEqual((self.stats().units_sold, self.stats().revenue), (1, 500))
+
+    def test_dashboard_header_is_one_row(self):
+        self.checkout(1)
+        self.client.force_authenticate(self.vendor)
+        data = self.client.get('/api/vendor/products/').data
+        self.assertEqual(
+            [data[key] for key in ('total_products', 'in_stock_products', 'units_sold', 'total_revenue', 'min_price')],
+            [2, 1, 1, 80, 20],
+        )
+        # filtered requests keep the vendor-wide header but narrow the price range
+        data = self.client.get('/api/vendor/products/', {'min_price': 50}).data
+        self.assertEqual((data['total_products'], data['min_price']), (2, 100))
+
+        # a sale invalidates the cached dashboard
+        self.checkout(1)
+        self.client.force_authenticate(self.vendor)
+        self.assertEqual(self.client.get('/api/vendor/products/').data['units_sold'], 2)
+
+    def test_legacy_items_count_at_the_product_price(self):
+        item = self.checkout(2)
+        # an item from before unit_price was recorded
+        OrderItem.objects.filter(pk=item.pk).update(unit_price=None)
+        rebuild_vendor_stats()
+        self.assertEqual((self.stats().units_sold, self.stats().revenue), (2, 200))
+        item.refresh_from_db()
+        item.status = 'cancelled'
+        item.save()
+        self.assertEqual((self.stats().units_sold, self.stats().revenue), (0, 0))
+        self.assertEqual(rebuild_vendor_stats(), 1)
+        self.assertEqual((self.stats().units_sold, self.stats().revenue), (0, 0))
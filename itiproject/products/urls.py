@@ -35,6 +35,10 @@ urlpatterns = [
     path('search/', ProductListView.as_view(), name='product-list'),
     path('search-suggestions/', SearchSuggestionsView.as_view(), name='search-suggestions'),
 
+    # Flash sale reservations: hold units until checkout, release early with DELETE
+    path('flash-sales/reservations/', FlashSaleReservationView.as_view(), name='flash-sale-reserve'),
+    path('flash-sales/reservations/<uuid:pk>/', FlashSaleReservationDetailView.as_view(), name='flash-sale-reservation'),
+
     # Vendor endpoints
     path('vendor/products/', VendorProductsView.as_view(), name='vendor-products'),
     path('vendor/', getsizecolor.as_view(), name='vendor-product-detail'),
@@ -0,0 +1,100 @@
+# products/vendor_stats.py
+from django.apps import apps
+from django.db.models import Q, F, Min, Max, Sum, Count, DecimalField, ExpressionWrapper
+from django.db.models.functions import Coalesce
+from .models import Product, VendorStats
+
+# Order item statuses whose units and revenue are not (or no longer) realized
+UNREALIZED_ITEM_STATUSES = ('rejected', 'cancelled')
+
+CATALOG_FIELDS = ['product_count', 'in_stock_count', 'min_price', 'max_price']
+SALES_FIELDS = ['units_sold', 'revenue']
+
+
+def item_contribution(vendor_id, quantity, unit_price, status, product_price=None):
+    """(vendor_id, units, revenue) an order item adds to its vendor's stats.
+
+    Items from before unit_price was recorded count at the product's current
+    price, the same fallback as ``refresh_vendor_stats``.
+    """
+    if vendor_id is None or status in UNREALIZED_ITEM_STATUSES:
+        return vendor_id, 0, 0
+    quantity = int(quantity or 0)
+    price = unit_price if unit_price is not None else product_price
+    return vendor_id, quantity, (price or 0) * quantity
+
+
+def refresh_vendor_stats(vendor_ids, sales=True):
+    """Recompute the stats of the given vendors: catalog columns with one grouped
+    aggregate over products, plus units and revenue from order items when ``sales``
+    is set (always for vendors without a row yet)."""
+    vendor_ids = {vendor_id for vendor_id in vendor_ids if vendor_id is not None}
+    if not vendor_ids:
+        return
+    if not sales and VendorStats.objects.filter(vendor_id__in=vendor_ids).count() < len(vendor_ids):
+        sales = True
+
+    stats = {vendor_id: VendorStats(vendor_id=vendor_id) for vendor_id in vendor_ids}
+    catalog = (
+        Product.objects.filter(seller_id__in=vendor_ids).order_by().values('seller_id').annotate(
+            products=Count('id'), in_stock=Count('id', filter=Q(stock_quantity__gt=0)),
+            low=Min('price'), high=Max('price'),
+        )
+    )
+    for row in catalog:
+        vendor = stats[row['seller_id']]
+        vendor.product_count, vendor.in_stock_count = row['products'], row['in_stock']
+        vendor.min_price, vendor.max_price = row['low'], row['high']
+
+    update_fields = CATALOG_FIELDS + ['updated_at']
+    if sales:
+        OrderItem = apps.get_model('orders', 'OrderItem')
+        # items from before unit_price was recorded fall back to the product's current price
+        paid = ExpressionWrapper(
+            Coalesce('unit_price', 'product__price') * F('quantity'),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        )
+        sold = (
+            OrderItem.objects.filter(vendor_id__in=vendor_ids).exclude(status__in=UNREALIZED_ITEM_STATUSES)
+            .order_by().values('vendor_id').annotate(units=Sum('quantity'), revenue=Sum(paid))
+        )
+        for row in sold:
+            stats[row['vendor_id']].units_sold = row['units'] or 0
+            stats[row['vendor_id']].revenue = row['revenue'] or 0
+        update_fields += SALES_FIELDS
+
+    VendorStats.objects.bulk_create(
+        stats.values(), update_conflicts=True, unique_fields=['vendor'], update_fields=update_fields,
+    )
+
+
+def adjust_vendor_sales(vendor_id, units, revenue):
+    """Add units and revenue of an order item event to the vendor's row"""
+    if vendor_id is None or (not units and not revenue):
+        return
+    updated = VendorStats.objects.filter(vendor_id=vendor_id).update(
+        units_sold=F('units_sold') + units, revenue=F('revenue') + revenue
+    )
+    if not updated:
+        # no row yet: seed it from the tables, which already include this event
+        refresh_vendor_stats([vendor_id])
+
+
+def get_vendor_stats(vendor_id):
+    """The vendor's stats row, created from the tables on first use"""
+    stats = VendorStats.objects.filter(vendor_id=vendor_id).first()
+    if stats is None:
+        refresh_vendor_stats([vendor_id])
+        stats = VendorStats.objects.get(vendor_id=vendor_id)
+    return stats
+
+
+def rebuild_vendor_stats():
+    """Recompute every vendor that has products or sales; returns the number of rows"""
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    vendor_ids = set(Product.objects.order_by().values_list('seller_id', flat=True).distinct())
+    vendor_ids |= set(OrderItem.objects.order_by().values_list('vendor_id', flat=True).distinct())
+    vendor_ids.discard(None)
+    VendorStats.objects.exclude(vendor_id__in=vendor_ids).delete()
+    refresh_vendor_stats(vendor_ids)
+    return len(vendor_ids)
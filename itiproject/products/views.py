@@ -1,14 +1,29 @@
-from django.shortcuts import render
+from dataclasses import replace
+import logging
+import uuid
+from django.shortcuts import render, get_object_or_404
+from django.db.models import prefetch_related_objects
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.db.models import Q, F, ExpressionWrapper, FloatField, Min, Max
 from itertools import chain
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
-from .models import Category, Product, Brand, Color, Size, RecentlyViewedProduct
+from .models import Category, Product, Brand, Color, Size, RecentlyViewedProduct, FlashSaleReservation
 from .serializers import (
     ProductListSerializer, CategoryListSerializer, CategoryDetailSerializer, CategoryCreateUpdateSerializer,
     ProductCreateUpdateSerializer, ProductImageSerializer, SizeSerializer, ColorSerializer, BrandListSerializer,
-    RecentlyViewedProductSerializer)
+    RecentlyViewedProductSerializer, ProductFieldset, FlashSaleReservationSerializer)
+from .catalog import get_category_tree
+from .suggestions import suggestion_index
+from .reference import reference_data
+from .pagination import paginate
+from .query import ProductQuery, SEARCH_ICONTAINS
+from .response_cache import cached_listing, listing_key, listing_tags, product_validators
+from .recently_viewed import recently_viewed_ids, track_view, track_after_response
+from .vendor_stats import get_vendor_stats
+from .flash_sales import flash_sale_index, reserve_flash_sale_units, release_reservation
 from rest_framework import generics
 from rest_framework import status
 # modules to handle auth
@@ -20,143 +35,78 @@ from django.db.models import Q, F, ExpressionWrapper, FloatField, Min, Max, Sum
 from users.models import User
 # Add caching imports
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from django.views.decorators.cache import cache_page, cache_control
 from django.views.decorators.vary import vary_on_cookie, vary_on_headers
 # Create your views here.
 
-def get_descendant_ids(category):
-    """Recursively get all descendant category IDs."""
-    ids = [category.id]
-    for child in category.children.all():
-        ids.extend(get_descendant_ids(child))
-    return ids
+logger = logging.getLogger(__name__)
+
 
 class CategoryProductsView(APIView):
+    """Products of a category subtree with facets.
+
+    Queries per request, independent of page size: category, descendant ids,
+    4 for facets, 1 for specification facets (plus 1 per spec.<key>= filter),
+    page count, page rows and 3 prefetches (12; 11 in cursor mode).
+    """
     # No permission_classes needed - publicly accessible
     def get(self, request, slug):
-        try:
-            category = Category.objects.get(slug=slug)
-            category_ids = get_descendant_ids(category)
-            products = Product.objects.filter(category_id__in=category_ids)
-
-            # Apply filters (all in DB, not Python)
-            brand = request.GET.get('brand')
-            if brand:
-                brand_slugs = brand.split(',')
-                products = products.filter(brand__slug__in=brand_slugs)
-
-            color = request.GET.get('color')
-            if color:
-                color_slugs = color.split(',')
-                products = products.filter(colors__slug__in=color_slugs)
-
-            min_price = request.GET.get('min_price')
-            if min_price:
-                products = products.filter(price__gte=min_price)
-            max_price = request.GET.get('max_price')
-            if max_price:
-                products = products.filter(price__lte=max_price)
-            
-            products = products.annotate(
-                discount_percentage=ExpressionWrapper(
-                    (F('price') - F('sale_price')) / F('price') * 100,
-                    output_field=FloatField()
-                )
-            )
+        # no free-text search on category pages
+        query = ProductQuery.from_params(request.GET, search=None)
+        fieldset = ProductFieldset.from_request(request)
+        key = listing_key(f'category:{slug}', query.spec, request, 'page', 'cursor', 'pagination', 'fields', 'exclude')
 
-            discount = request.GET.get('discount_min')
-            if discount:
-                products = products.filter(discount_percentage__gte=float(discount))
+        def build():
+            category = Category.objects.get(slug=slug)
+            # one indexed query against the closure table
+            category_query = ProductQuery(replace(query.spec, category_ids=frozenset(category.get_descendant_ids())))
 
-            featured = request.GET.get('is_featured')
-            if featured:
-                products = products.filter(is_featured=True)
+            # Brand, color, size, price-bucket and rating counts plus the total, aggregated
+            # in the database; facets are counted on the non-facet filters and min/max price ignore the
+            # price filter itself so the slider keeps its range
+            facets = category_query.facet_engine().compute()
 
-            # Filter by minimum rating stars unless sponsored is present
-            min_stars = request.GET.get('min_stars')
-            if min_stars:
-                try:
-                    min_stars_value = float(min_stars)
-                    products = products.filter(Q(rating_average__gte=min_stars_value) | Q(is_sponsored=True))
-                except ValueError:
-                    pass
-
-            # Ordering logic (same as ProductListView)
-            ordering = request.GET.get('ordering')
-            if ordering == 'popularity':
-                products = products.order_by('-quantity_sold')
-            elif ordering == 'newest':
-                products = products.order_by('-created_at')
-            elif ordering == 'price_asc':
-                products = products.order_by('price')
-            elif ordering == 'price_desc':
-                products = products.order_by('-price')
-            elif ordering == 'rating':
-                products = products.order_by('-rating_average')
-            else:
-                products = products.order_by('-quantity_sold')
-
-            products = products.distinct()  # Avoid duplicates if filtering by M2M
-            
-            # total number of products to show in the response
-            products_count = products.count()
-
-            # Get all unique brands for this category and its subcategories
-            category_brands = Brand.objects.filter(
-                products__category_id__in=category_ids
-            ).distinct().values('name', 'slug', 'image')
-
-            # Get all unique colors for this category and its subcategories
-            # category_colors = products.values('colors__name', 'colors__slug').distinct()
-            # colors_list = [
-            #     {'name': c['colors__name'], 'slug': c['colors__slug']}
-            #     for c in category_colors if c['colors__name'] and c['colors__slug']
-            # ]
-
-            # Get the minimum and maximum price for the filtered products
-            price_range = products.aggregate(
-                min_price=Min('price'),
-                max_price=Max('price')
+            paginated_products, pagination_data = paginate(
+                fieldset.optimize(category_query.queryset()), request, query.spec.keyset_ordering
             )
 
-            # Pagination
-            paginator = PageNumberPagination()
-            paginator.page_size = 12 # You can adjust this or make it configurable
-            paginated_products = paginator.paginate_queryset(products, request)
-            
-            # Serialize the data
-            product_serializer = ProductListSerializer(paginated_products, many=True)
+            # Serialize the data (only the ?fields= selected, if any)
+            product_serializer = ProductListSerializer(paginated_products, many=True, **fieldset.serializer_kwargs())
             
-            # Get pagination data
-            pagination_data = {
-                'count': paginator.page.paginator.count,
-                'next': paginator.get_next_link(),
-                'previous': paginator.get_previous_link(),
-                'current_page': paginator.page.number,
-                'total_pages': paginator.page.paginator.num_pages,
-            }
-            
-            response_data = {
-                'products_count': products_count,
+            return {
+                'products_count': facets['count'],
                 'products': product_serializer.data,
-                'brands': list(category_brands),
-                # 'colors': colors_list,
-                'min_price': price_range['min_price'],
-                'max_price': price_range['max_price'],
+                'brands': facets['brands'],
+                'colors': facets['colors'],
+                'sizes': facets['sizes'],
+                'facets': {
+                    'price': facets['price'],
+                    'rating': facets['rating'],
+                    # spec.<key>= values and counts from the attribute index
+                    'attributes': category_query.attribute_facets(),
+                },
+                'min_price': facets['min_price'],
+                'max_price': facets['max_price'],
                 'pagination': pagination_data
             }
 
+        try:
+            # served from the tag cache until a product, category or taxonomy write touches it
+            response_data, _ = cached_listing(key, listing_tags(query.spec, category_slug=slug), build)
             return Response(response_data)
 
         except Category.DoesNotExist:
             return Response({"error": "Category not found"}, status=404)
 
 # List all categories as a tree
-@method_decorator(cache_page(60 * 10), name='get')  # Cache for 15 minutes
+@method_decorator(cache_control(max_age=0, must_revalidate=True), name='get')
 class CategoryTreeView(generics.ListAPIView):
     queryset = Category.objects.filter(parent__isnull=True)
     serializer_class = CategoryListSerializer
 
+    def list(self, request, *args, **kwargs):
+        return Response(get_category_tree(request))
+
 # Retrieve category details by pk
 class CategoryDetailView(generics.RetrieveAPIView):
     queryset = Category.objects.all()
@@ -193,77 +143,42 @@ class CategoryDeleteView(generics.DestroyAPIView):
 #     serializer_class = ProductListSerializer
 
 class ProductDetailView(generics.RetrieveAPIView):
-    queryset = Product.objects.all()
+    """Single product with real validators.
+
+    The row (with category and brand) is one query; a matching If-None-Match /
+    If-Modified-Since is answered with a 304 right after it, otherwise the 3
+    prefetches run and the product is serialized (4 queries).
+    """
+    queryset = Product.objects.select_related('category', 'brand')
     serializer_class = ProductListSerializer
     lookup_field = 'pk'
     permission_classes = []  # Make authentication optional for viewing products
     
+    def get_queryset(self):
+        # ?fields= / ?exclude= skip the joins and columns of dropped fields
+        return ProductFieldset.from_request(self.request).optimize(super().get_queryset())
+
     def retrieve(self, request, *args, **kwargs):
-        import time
-        from django.db import connection
-        
-        current_time = int(time.time())  # Current Unix timestamp
+        fieldset = ProductFieldset.from_request(request)
         instance = self.get_object()
-        
-        # Track this product view if user is authenticated
-        if request.user.is_authenticated:
-            print(f"User {request.user.username} is viewing product {instance.name} at {current_time}")
-            
-            # Check if this product is already in recently viewed
-            existing = RecentlyViewedProduct.objects.filter(
-                user=request.user,
-                product=instance
-            ).first()
-            
-            if existing:
-                print(f"Product was previously viewed at {existing.viewed_at}, updating timestamp")
-                # Delete and recreate to ensure timestamp is updated
-                existing.delete()
-                # Force database to flush changes
-                connection.commit()
-            
-            # Create a new entry
-            viewed_product = RecentlyViewedProduct.objects.create(
-                user=request.user,
-                product=instance
-            )
-            # Force database to flush changes
-            connection.commit()
-            
-            print(f"Created new view record for {instance.name}")
-            
-            # Verify the entry was created
-            verify = RecentlyViewedProduct.objects.filter(
-                user=request.user,
-                product=instance
-            ).exists()
-            print(f"Verification: Entry exists in database: {verify}")
-            
-            # Count total recently viewed products for this user
-            user_viewed_products = RecentlyViewedProduct.objects.filter(user=request.user)
-            print(f"User has viewed {user_viewed_products.count()} products")
-            
-            # Limit to most recent 20 products per user (optional)
-            if user_viewed_products.count() > 20:
-                # Delete the oldest entries beyond the limit
-                to_delete = user_viewed_products.order_by('-viewed_at')[20:]
-                for item in to_delete:
-                    item.delete()
-                # Force database to flush changes
-                connection.commit()
-        else:
-            print("User is not authenticated, not tracking product view")
-        
-        serializer = self.get_serializer(instance)
-        response = Response(serializer.data)
-        
-        # Add cache-busting headers
-        response['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
-        response['Pragma'] = 'no-cache'
-        response['Expires'] = '0'
-        response['ETag'] = f'W/"{current_time}"'
-        
-        return response
+        etag, last_modified = product_validators(instance)
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified.timestamp())
+        )
+        if response is None:
+            lookups = fieldset.prefetch_lookups(fieldset.selected())
+            if lookups:
+                prefetch_related_objects([instance], *lookups)
+            serializer = self.get_serializer(instance, **fieldset.serializer_kwargs())
+            response = Response(serializer.data)
+
+        # Clients may keep the payload but must revalidate it on every visit
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+        patch_cache_control(response, public=True, no_cache=True)
+        # Views are tracked after the response is sent, see products/recently_viewed.py
+        return track_after_response(response, request.user, instance.pk)
 
 class ProductCreateView(generics.CreateAPIView):
     queryset = Product.objects.all()
@@ -282,164 +197,53 @@ class ProductDeleteView(generics.DestroyAPIView):
 
 class SearchSuggestionsView(APIView):
     # No permission_classes needed - publicly accessible
+    # Answered from the in-process prefix index, no database round-trip per keystroke
     def get(self, request):
         query = request.GET.get('q', '').strip()
 
         # Limit results per category
         limit = 2
 
-        # Get matching products
-        products = Product.objects.filter(
-            name__icontains=query
-        ).values('id', 'name', 'slug')[:limit]
-
-        # Get matching categories
-        categories = Category.objects.filter(
-            name__icontains=query
-        ).values('id', 'name', 'slug')[:limit]
-
-        # Get matching brands
-        brands = Brand.objects.filter(
-            name__icontains=query
-        ).values('id', 'name', 'slug', 'image')[:limit]
-
-        # Prepare response with type identification
-        suggestions = {
-            'products': [{
-                'id': p['id'],
-                'name': p['name'],
-                'slug': p['slug'],
-                'type': 'product',
-            } for p in products],
-            
-            'categories': [{
-                'id': c['id'],
-                'name': c['name'],
-                'slug': c['slug'],
-                'type': 'category',
-            } for c in categories],
-            
-            'brands': [{
-                'id': b['id'],
-                'name': b['name'],
-                'slug': b['slug'],
-                'image': b['image'],
-                'type': 'brand',
-            } for b in brands]
-        }
-
-        return Response(suggestions)
+        return Response(suggestion_index.suggest(query, limit=limit))
 
 # converted product search into a general view for listing, searching, and filtering by recentlyadded, sponsered
 # , brand-slug, minprice, highprice and color in products
 # Removing all decorators for caching and authentication
 class ProductListView(APIView):
+    """Queries per request, independent of page size: price range, page count,
+    page rows and 3 prefetches (6; 5 in cursor mode or for best_sellers). The
+    price range reads the stored category summaries when no filter is applied.
+    Specification facets add 1 query (plus 1 per spec.<key>= filter) when a
+    category or specification filter narrows the set."""
     # No permission_classes needed - publicly accessible
     def get(self, request):
-        products = Product.objects.all()
-        # Search functionality
-        search_query = request.GET.get('q', '')
-        if search_query:
-            products = products.filter(
-                Q(name__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(brand__name__icontains=search_query) |
-                Q(category__name__icontains=search_query)
-            ).distinct()
-        
-        # Apply filters
-        brand = request.GET.get('brand')
-        if brand:
-            brand_slugs = brand.split(',')
-            products = products.filter(brand__slug__in=brand_slugs)
-
-        color = request.GET.get('color')
-        if color:
-            color_slugs = color.split(',')
-            products = products.filter(colors__slug__in=color_slugs)
-
-        min_price = request.GET.get('min_price')
-        if min_price:
-            products = products.filter(price__gte=min_price)
-        
-        max_price = request.GET.get('max_price')
-        if max_price:
-            products = products.filter(price__lte=max_price)
-
-        # Calculate discount percentage (derived field)
-        products = products.annotate(
-            discount_percentage=ExpressionWrapper(
-                (F('price') - F('sale_price')) / F('price') * 100,
-                output_field=FloatField()
-            )
+        # search, filters and ordering are parsed and compiled by ProductQuery
+        query = ProductQuery.from_params(request.GET)
+        key = listing_key(
+            'products', query.spec, request, 'page', 'cursor', 'pagination', 'best_sellers', 'recent', 'fields', 'exclude'
         )
+        # served from the tag cache until a write touches the listing's scope
+        response_data, _ = cached_listing(key, listing_tags(query.spec), lambda: self.build(request, query))
+        return Response(response_data)
 
-        # Filter by minimum discount percentage
-        discount = request.GET.get('discount_min')
-        if discount:
-            products = products.filter(discount_percentage__gte=float(discount))
-
-        # Filter for products with discounts only
-        has_discount = request.GET.get('has_discount')
-        if has_discount:
-            products = products.filter(sale_price__isnull=False, sale_price__lt=F('price'))
-
-        # filter by is_featured 
-        featured = request.GET.get('is_featured')
-        if featured:
-            products = products.filter(is_featured=True)   
-
-        # Filter by minimum rating stars unless sponsored is present
-        min_stars = request.GET.get('min_stars')
-        if min_stars:
-            try:
-                min_stars_value = float(min_stars)
-                products = products.filter(Q(rating_average__gte=min_stars_value) | Q(is_sponsored=True))
-            except ValueError:
-                pass
+    def build(self, request, query):
+        fieldset = ProductFieldset.from_request(request)
+        products = fieldset.optimize(query.queryset())
 
-        # Filter sponsored products
-        sponsored = request.GET.get('sponsored')
-        if sponsored:
-            products = products.filter(is_sponsored=True)
-
-        # Ordering logic
-        ordering = request.GET.get('ordering')
-        if ordering == 'popularity':
-            products = products.order_by('-quantity_sold')
-        elif ordering == 'newest':
-            products = products.order_by('-created_at')
-        elif ordering == 'price_asc':
-            products = products.order_by('price')
-        elif ordering == 'price_desc':
-            products = products.order_by('-price')
-        elif ordering == 'rating':
-            products = products.order_by('-rating_average')
-        # Default ordering (optional)
-        else:
-            products = products.order_by('-quantity_sold')
-
-        # Get all unique colors for the filtered products
-        # category_colors = products.values('colors__name', 'colors__slug').distinct()
-        # colors_list = [
-        #     {'name': c['colors__name'], 'slug': c['colors__slug']}
-        #     for c in category_colors if c['colors__name'] and c['colors__slug']
-        # ]
-
-        # Get the minimum and maximum price for the filtered products
-        price_range = products.aggregate(
-            min_price=Min('price'),
-            max_price=Max('price')
-        )
+        # Slider bounds and histogram; stored per category unless filters narrow the set
+        price_range = query.price_range()
+        # specification keys only make sense within a category, not across the whole catalog
+        spec = query.spec
+        attributes = query.attribute_facets() if spec.category or spec.category_ids or spec.attributes else []
 
         # Handle best_sellers and recent products after all filters
         best_sellers = request.GET.get('best_sellers')
         if best_sellers:
             try:
                 limit = int(best_sellers)
-                products = products.order_by('-quantity_sold')[:limit]
-                total_count = products.count()
-                serializer = ProductListSerializer(products, many=True)
+                products = list(products.order_by('-quantity_sold', '-id')[:limit])
+                total_count = len(products)
+                serializer = ProductListSerializer(products, many=True, **fieldset.serializer_kwargs())
                 pagination_data = {
                     'count': total_count,
                     'next': None,
@@ -451,161 +255,94 @@ class ProductListView(APIView):
                 pass
         else:
             # Get recently added products
+            keyset_ordering = query.spec.keyset_ordering
             recent = request.GET.get('recent')
             if recent:
                 try:
                     limit = int(recent)
-                    products = products.order_by('-created_at')[:limit]
+                    products = products.order_by('-created_at', '-id')[:limit]
+                    keyset_ordering = None
                 except ValueError:
                     pass
 
-            total_count = products.count()
-            # Pagination
-            paginator = PageNumberPagination()
-            paginator.page_size = 12
-            paginated_products = paginator.paginate_queryset(products, request)
-            serializer = ProductListSerializer(paginated_products, many=True)
-            pagination_data = {
-                'count': paginator.page.paginator.count,
-                'next': paginator.get_next_link(),
-                'previous': paginator.get_previous_link(),
-                'current_page': paginator.page.number,
-                'total_pages': paginator.page.paginator.num_pages,
-            }
+            # keyset pages for infinite scroll: no COUNT(*) and no OFFSET scan
+            paginated_products, pagination_data = paginate(products, request, keyset_ordering)
+            total_count = pagination_data['count']
+            serializer = ProductListSerializer(paginated_products, many=True, **fieldset.serializer_kwargs())
         
-        response_data = {
+        return {
             'products_count': total_count,
             'products': serializer.data,
-            # 'colors': colors_list,
             'min_price': price_range['min_price'],
             'max_price': price_range['max_price'],
+            'price_histogram': price_range['price_histogram'],
+            'facets': {'attributes': attributes},
             'pagination': pagination_data
         }
-        
-        return Response(response_data)
 
 class VendorProductsView(APIView):
     """
     API endpoint to list products for the currently logged-in vendor (staff user)
+
+    Queries per request, independent of page size: the vendor stats row, page
+    count, page rows and 3 prefetches (6; 5 in cursor mode). Filtered requests
+    add one aggregate for the price range of the filtered set.
     """
     permission_classes = [IsAuthenticated]  # Ensures only authenticated staff users can access
     
     def get(self, request):
-        # Get products for the current vendor
-        products = Product.objects.filter(seller=request.user)
-        
-        # Apply filters if provided
-        search_query = request.GET.get('q', '')
-        if search_query:
-            products = products.filter(
-                Q(name__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(sku__icontains=search_query)
-            )
-        
-        # Filter by category
-        category = request.GET.get('category')
-        if category:
-            products = products.filter(category__slug=category)
-        
-        # Filter by brand
-        brand = request.GET.get('brand')
-        if brand:
-            products = products.filter(brand__slug=brand)
-        
-        # Filter by price range
-        min_price = request.GET.get('min_price')
-        if min_price:
-            products = products.filter(price__gte=min_price)
-        
-        max_price = request.GET.get('max_price')
-        if max_price:
-            products = products.filter(price__lte=max_price)
-        
-        # Filter by stock status
-        in_stock = request.GET.get('in_stock')
-        if in_stock:
-            products = products.filter(stock_quantity__gt=0)
-        
-        # Calculate discount percentage
-        products = products.annotate(
-            discount_percentage=ExpressionWrapper(
-                (F('price') - F('sale_price')) / F('price') * 100,
-                output_field=FloatField()
-            )
+        # Products of the current vendor; search also matches the sku, newest first by default
+        query = ProductQuery.from_params(
+            request.GET, default_ordering='newest', search=SEARCH_ICONTAINS, seller_id=request.user.pk
         )
+        key = listing_key('vendor', query.spec, request, 'page', 'cursor', 'pagination', 'fields', 'exclude')
+        # served from the tag cache until one of the vendor's products or order items changes
+        response_data, _ = cached_listing(key, listing_tags(query.spec), lambda: self.build(request, query), 'results')
+        return Response(response_data)
+
+    def build(self, request, query):
+        # dashboard header: product, stock and sales figures kept up to date by signals
+        stats = get_vendor_stats(request.user.pk)
+        price_range = {'min_price': stats.min_price, 'max_price': stats.max_price}
+        if not query.spec.vendor_only:
+            price_range = query.summary()
         
-        # Filter by discount
-        discount = request.GET.get('discount_min')
-        if discount:
-            products = products.filter(discount_percentage__gte=float(discount))
-        
-        # Ordering
-        ordering = request.GET.get('ordering')
-        if ordering == 'popularity':
-            products = products.order_by('-quantity_sold')
-        elif ordering == 'newest':
-            products = products.order_by('-created_at')
-        elif ordering == 'price_asc':
-            products = products.order_by('price')
-        elif ordering == 'price_desc':
-            products = products.order_by('-price')
-        elif ordering == 'rating':
-            products = products.order_by('-rating_average')
-        else:
-            products = products.order_by('-created_at')  # Default ordering
-        
-        # Get price range for filtered products
-        price_range = products.aggregate(
-            min_price=Min('price'),
-            max_price=Max('price')
+        fieldset = ProductFieldset.from_request(request)
+        paginated_products, pagination_data = paginate(
+            fieldset.optimize(query.queryset()), request, query.spec.keyset_ordering
         )
-        
-        # Pagination
-        paginator = PageNumberPagination()
-        paginator.page_size = 12
-        paginated_products = paginator.paginate_queryset(products, request)
-        
+
         # Serialize the data
-        serializer = ProductListSerializer(paginated_products, many=True)
-        
-        # Prepare pagination data
-        pagination_data = {
-            'count': paginator.page.paginator.count,
-            'next': paginator.get_next_link(),
-            'previous': paginator.get_previous_link(),
-            'current_page': paginator.page.number,
-            'total_pages': paginator.page.paginator.num_pages,
-        }
+        serializer = ProductListSerializer(paginated_products, many=True, **fieldset.serializer_kwargs())
         
         # Prepare response data
-        response_data = {
+        return {
             'results': serializer.data,
             'min_price': price_range['min_price'],
             'max_price': price_range['max_price'],
             'pagination': pagination_data,
-            'total_products': products.count(),
-            'total_revenue': products.aggregate(
-                total=Sum(F('price') * F('quantity_sold'))
-            )['total'] or 0
+            'total_products': stats.product_count,
+            'in_stock_products': stats.in_stock_count,
+            'units_sold': stats.units_sold,
+            'total_revenue': stats.revenue
         }
-        
-        return Response(response_data)
 
 
 class getsizecolor(APIView):
+    """Colors, sizes, categories and brands for the vendor dashboard.
+
+    Served from an in-process bundle rebuilt only when one of those models is
+    written; revisits with a matching If-None-Match get a 304.
+    """
     def get(self, request):
-        colors = Color.objects.all()
-        sizes = Size.objects.all()
-        categories = Category.objects.all()
-        brands = Brand.objects.all()
-        print('colors')
-        return Response({
-            'colors': ColorSerializer(colors, many=True).data,
-            'sizes': SizeSerializer(sizes, many=True).data,
-            'categories': CategoryListSerializer(categories, many=True).data,
-            'brands': BrandListSerializer(brands, many=True).data
-        })
+        data, etag = reference_data.get()
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(data)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
 class updateProduct(APIView):
     def put(self, request, id):
         try:
@@ -638,7 +375,11 @@ class updateProduct(APIView):
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 class RecentlyViewedProductsView(APIView):
-    """API endpoint to get recently viewed products for the logged-in user"""
+    """API endpoint to get recently viewed products for the logged-in user
+
+    Queries per request: products and 3 prefetches (4), plus the viewed ids
+    when Redis is unavailable (5)
+    """
     permission_classes = [IsAuthenticated]
     
     @method_decorator(vary_on_headers("Authorization"))
@@ -647,37 +388,17 @@ class RecentlyViewedProductsView(APIView):
         import time
         current_time = int(time.time())  # Current Unix timestamp
         
-        print(f"Getting recently viewed products for user: {request.user.username} (ID: {request.user.id})")
-        print(f"Request time: {current_time}")
-        
         # Get limit parameter from query string (default to 11)
         limit = int(request.GET.get('limit', 11))
-        print(f"Limit set to: {limit}")
         
         try:
-            # Add a timestamp parameter to prevent caching
-            timestamp = request.GET.get('timestamp', str(current_time))
-            print(f"Request timestamp: {timestamp}")
-            
-            # First, check how many recently viewed products exist for this user
-            total_count = RecentlyViewedProduct.objects.filter(user=request.user).count()
-            print(f"Total recently viewed products in database for this user: {total_count}")
-            
-            # List all recently viewed product IDs and timestamps
-            all_viewed = RecentlyViewedProduct.objects.filter(user=request.user).order_by('-viewed_at')
-            print("All recently viewed products:")
-            for i, viewed in enumerate(all_viewed):
-                print(f"{i+1}. {viewed.product.name} (ID: {viewed.product.id}) - Viewed at: {viewed.viewed_at}")
-            
-            # Get recently viewed products for this user - use select_related to optimize queries
-            recently_viewed = RecentlyViewedProduct.objects.filter(
-                user=request.user
-            ).select_related('product').order_by('-viewed_at')[:limit]
-            
-            print(f"Found {len(recently_viewed)} recently viewed products for response (limit: {limit})")
+            # Ids in viewing order from the Redis history (database without Redis),
+            # then the products in one listing query
+            product_ids = recently_viewed_ids(request.user.pk, limit)
+            products_by_id = Product.objects.for_listing().in_bulk(product_ids)
+            products = [products_by_id[pk] for pk in product_ids if pk in products_by_id]
             
-            # Extract just the products
-            products = [item.product for item in recently_viewed]
+            logger.debug("%s recently viewed products for user %s (limit %s)", len(products), request.user.pk, limit)
             
             # Serialize the products
             serializer = ProductListSerializer(products, many=True)
@@ -699,7 +420,7 @@ class RecentlyViewedProductsView(APIView):
             return response
             
         except Exception as e:
-            print(f"Error in RecentlyViewedProductsView: {e}")
+            logger.exception("Error in RecentlyViewedProductsView")
             return Response({
                 'error': str(e)
             }, status=500)
@@ -711,37 +432,50 @@ class TrackProductViewAPI(APIView):
     def post(self, request, pk):
         try:
             # Find the product
-            product = Product.objects.get(pk=pk)
+            product = Product.objects.only('id', 'name').get(pk=pk)
             
-            # Track this product view
-            print(f"User {request.user.username} is tracking view for product {product.name}")
-            
-            # Get or create a RecentlyViewedProduct entry
-            viewed_product, created = RecentlyViewedProduct.objects.get_or_create(
-                user=request.user,
-                product=product
-            )
-            
-            # If it already existed, update the timestamp
-            if not created:
-                viewed_product.save()  # This will update the auto_now field
-                print(f"Updated existing view record for {product.name}")
-            else:
-                print(f"Created new view record for {product.name}")
-                
-            # Limit to most recent 20 products per user (optional)
-            user_viewed_products = RecentlyViewedProduct.objects.filter(user=request.user)
-            print(f"User has viewed {user_viewed_products.count()} products")
-            if user_viewed_products.count() > 20:
-                # Delete the oldest entries beyond the limit
-                to_delete = user_viewed_products.order_by('-viewed_at')[20:]
-                for item in to_delete:
-                    item.delete()
-                    
+            # Track this product view in the Redis history, flushed to the database in batches
+            track_view(request.user.pk, product.pk)
+
             return Response({"status": "success", "message": "Product view tracked"})
             
         except Product.DoesNotExist:
             return Response({"error": "Product not found"}, status=404)
         except Exception as e:
-            print(f"Error tracking product view: {e}")
+            logger.exception("Error tracking product view")
             return Response({"error": str(e)}, status=500)
+
+
+class FlashSaleReservationView(APIView):
+    """Hold flash-sale units of a product for the logged-in buyer until checkout.
+
+    Units are taken with a conditional update, so concurrent buyers can never
+    hold more than the item's limit; holds expire after
+    FLASH_SALE_RESERVATION_SECONDS or when the sale ends.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            product_id = uuid.UUID(str(request.data.get('product')))
+            quantity = int(request.data.get('quantity', 1))
+        except (TypeError, ValueError):
+            return Response({"error": "product must be a product id and quantity a number"}, status=400)
+        entry = flash_sale_index.get(product_id)
+        if entry is None:
+            return Response({"error": "Product is not in a running flash sale"}, status=404)
+        reservation = reserve_flash_sale_units(entry, request.user, quantity)
+        if reservation is None:
+            return Response({"error": "Not enough flash sale units left"}, status=409)
+        return Response(FlashSaleReservationSerializer(reservation).data, status=201)
+
+
+class FlashSaleReservationDetailView(APIView):
+    """Release a held reservation before it expires"""
+    permission_classes = [IsAuthenticated]
+
+    def delete(self, request, pk):
+        reservation = get_object_or_404(FlashSaleReservation, pk=pk, user=request.user)
+        if not release_reservation(reservation):
+            return Response({"error": f"Reservation is already {reservation.status}"}, status=409)
+        return Response(status=204)